@@ -0,0 +1,199 @@
+"""
+Detecção de anomalias nas métricas diárias e nos tempos de resolução.
+
+Para cada colaborador, a média diária de productivity, efficiency e
+resolution_rate e o resolution_time dos contratos (em ordem de criação) são
+comparados com a média e o desvio padrão exponencialmente ponderados (EWMA)
+dos valores anteriores. Quedas nas taxas e aumentos no tempo de resolução
+além de ANOMALY_Z_THRESHOLD desvios viram alertas; alertas iguais ainda
+abertos (resolved_at nulo) não são repetidos.
+"""
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import String, insert, select, type_coerce
+from sqlalchemy.orm import sessionmaker
+
+from models import Alert, Contract, DailyMetric, init_db
+
+load_dotenv()
+
+# Span da EWMA e quantidade mínima de valores anteriores para avaliar um ponto
+ANOMALY_SPAN = int(os.getenv("ANOMALY_SPAN", "30"))
+ANOMALY_MIN_PERIODS = int(os.getenv("ANOMALY_MIN_PERIODS", "14"))
+# |z| a partir do qual o ponto é anômalo e a partir do qual o alerta é crítico
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.5"))
+ANOMALY_Z_CRITICAL = float(os.getenv("ANOMALY_Z_CRITICAL", "5"))
+
+# Métrica -> (descrição, sentido do problema: -1 queda, 1 aumento)
+DAILY_METRICS = {
+    'productivity': ('Produtividade', -1),
+    'efficiency': ('Eficiência', -1),
+    'resolution_rate': ('Taxa de resolução', -1),
+}
+RESOLUTION_TIME = ('Tempo de resolução', 1)
+
+
+def rolling_zscores(df, key, value, span=ANOMALY_SPAN, min_periods=ANOMALY_MIN_PERIODS):
+    """
+    Média EWMA dos valores anteriores do mesmo `key` e z-score de cada valor em
+    relação a ela (df ordenado por key e tempo). Retorna (media, z) alinhados a df.
+    """
+    janelas = df.groupby(key, sort=False)[value].ewm(span=span, min_periods=min_periods)
+    estatisticas = pd.DataFrame({
+        'media': janelas.mean().reset_index(level=0, drop=True),
+        'desvio': janelas.std().reset_index(level=0, drop=True)
+    }).reindex(df.index)
+    # Cada ponto é comparado apenas com os valores anteriores a ele
+    anteriores = estatisticas.groupby(df[key].to_numpy(), sort=False).shift(1)
+    desvio = anteriores['desvio'].where(anteriores['desvio'] > 0)
+    return anteriores['media'], (df[value] - anteriores['media']) / desvio
+
+
+def _anomalies(df, key, value, sentido):
+    """Linhas de df cujo z-score indica problema no sentido informado, com media e z"""
+    media, z = rolling_zscores(df, key, value)
+    anomalo = (sentido * z >= ANOMALY_Z_THRESHOLD).to_numpy()
+    return df.loc[anomalo].assign(media=media[anomalo], z=z[anomalo])
+
+
+def load_daily_metrics(db):
+    # As datas vêm como texto e são convertidas de uma vez pelo pandas
+    rows = db.execute(
+        select(
+            DailyMetric.contract_id, Contract.collaborator, type_coerce(DailyMetric.date, String),
+            *[getattr(DailyMetric, metrica) for metrica in DAILY_METRICS]
+        ).join(Contract, DailyMetric.contract_id == Contract.id)
+    ).all()
+    df = pd.DataFrame(rows, columns=['contract_id', 'collaborator', 'date', *DAILY_METRICS])
+    df['day'] = pd.to_datetime(df['date']).dt.normalize()
+    return df
+
+
+def load_resolution_times(db):
+    rows = db.execute(
+        select(Contract.id, Contract.collaborator, type_coerce(Contract.created_at, String), Contract.resolution_time)
+        .where(Contract.resolution_time.is_not(None))
+    ).all()
+    df = pd.DataFrame(rows, columns=['contract_id', 'collaborator', 'created_at', 'resolution_time'])
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df.sort_values(['collaborator', 'created_at'], kind='stable', ignore_index=True)
+
+
+def find_anomalies(metricas, contratos):
+    """
+    Alertas candidatos (contract_id, type, message) a partir das métricas diárias
+    por contrato e dos tempos de resolução dos contratos
+    """
+    candidatos = []
+
+    if not metricas.empty:
+        diario = metricas.groupby(['collaborator', 'day'], sort=True)[list(DAILY_METRICS)].mean().reset_index()
+        for metrica, (descricao, sentido) in DAILY_METRICS.items():
+            anomalias = _anomalies(diario, 'collaborator', metrica, sentido)
+            if anomalias.empty:
+                continue
+            # O alerta aponta para o contrato com o pior valor do colaborador no dia
+            piores = (
+                metricas.dropna(subset=[metrica])
+                .sort_values(metrica, ascending=sentido < 0, kind='stable')
+                .drop_duplicates(['collaborator', 'day'])[['collaborator', 'day', 'contract_id']]
+            )
+            anomalias = anomalias.merge(piores, on=['collaborator', 'day'])
+            candidatos.append(pd.DataFrame({
+                'contract_id': anomalias['contract_id'],
+                'collaborator': anomalias['collaborator'],
+                'day': anomalias['day'],
+                'value': anomalias[metrica],
+                'media': anomalias['media'],
+                'z': anomalias['z'],
+                'descricao': descricao,
+                'sentido': sentido
+            }))
+
+    if not contratos.empty:
+        descricao, sentido = RESOLUTION_TIME
+        anomalias = _anomalies(contratos, 'collaborator', 'resolution_time', sentido)
+        candidatos.append(pd.DataFrame({
+            'contract_id': anomalias['contract_id'],
+            'collaborator': anomalias['collaborator'],
+            'day': anomalias['created_at'],
+            'value': anomalias['resolution_time'],
+            'media': anomalias['media'],
+            'z': anomalias['z'],
+            'descricao': descricao,
+            'sentido': sentido
+        }))
+
+    if not candidatos:
+        return pd.DataFrame(columns=['contract_id', 'type', 'message'])
+
+    anomalias = pd.concat(candidatos, ignore_index=True)
+    tipos = np.where(anomalias['z'].abs() >= ANOMALY_Z_CRITICAL, 'critical', 'warning')
+    mensagens = [
+        f"{descricao} {'abaixo' if sentido < 0 else 'acima'} do esperado para {colaborador} "
+        f"em {dia:%d/%m/%Y}: {valor:.2f} (média {media:.2f}, z={z:+.1f})"
+        for descricao, sentido, colaborador, dia, valor, media, z in zip(
+            anomalias['descricao'], anomalias['sentido'], anomalias['collaborator'],
+            anomalias['day'], anomalias['value'], anomalias['media'], anomalias['z']
+        )
+    ]
+    return pd.DataFrame({
+        'contract_id': anomalias['contract_id'].astype(int),
+        'type': tipos,
+        'message': mensagens
+    }).drop_duplicates(ignore_index=True)
+
+
+def detect_anomalies(db, commit=True):
+    """
+    Analisa o histórico inteiro e insere os alertas novos de uma vez.
+    Retorna a contagem de pontos analisados, anomalias e alertas inseridos.
+    """
+    inicio = time.perf_counter()
+    metricas = load_daily_metrics(db)
+    contratos = load_resolution_times(db)
+    candidatos = find_anomalies(metricas, contratos)
+
+    # Alertas iguais ainda abertos não são repetidos
+    abertos = set(map(tuple, db.execute(
+        select(Alert.contract_id, Alert.type, Alert.message).where(Alert.resolved_at.is_(None))
+    ).all()))
+    novos = [
+        alerta for alerta in zip(candidatos['contract_id'].tolist(), candidatos['type'], candidatos['message'])
+        if alerta not in abertos
+    ]
+
+    if novos:
+        agora = datetime.utcnow()
+        db.execute(insert(Alert), [
+            {'contract_id': contract_id, 'type': tipo, 'message': mensagem, 'created_at': agora}
+            for contract_id, tipo, mensagem in novos
+        ])
+        if commit:
+            db.commit()
+
+    return {
+        'metricas': len(metricas),
+        'contratos': len(contratos),
+        'anomalias': len(candidatos),
+        'alertas_inseridos': len(novos),
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
+
+
+if __name__ == "__main__":
+    DB_PATH = os.getenv("DB_PATH", "relatorio_dashboard.db")
+    engine = init_db(f"sqlite:///{DB_PATH}")
+    db = sessionmaker(bind=engine)()
+    try:
+        resultado = detect_anomalies(db)
+    finally:
+        db.close()
+    print(f"Métricas analisadas: {resultado['metricas']} | Contratos: {resultado['contratos']}")
+    print(f"Anomalias: {resultado['anomalias']} | Alertas novos: {resultado['alertas_inseridos']} "
+          f"({resultado['segundos']:.3f}s)")
@@ -1,13 +1,18 @@
 from sqlalchemy import create_engine, func, text, inspect, case
 from sqlalchemy.orm import sessionmaker
-from models import Contract, DailyMetric, Alert, Base
+from models import Contract, DailyMetric, Alert, upgrade_db
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from pathlib import Path
 import sys
 import time
 import psutil
 
+# O vocabulário de status fica em static/, junto da análise
+sys.path.append(str(Path(__file__).resolve().parent / "static"))
+from status_contratos import STATUS_CONTRATOS
+
 # Load environment variables
 load_dotenv()
 
@@ -109,8 +114,8 @@ class HealthCheck:
     def check_tables_exist(self):
         """Verifica se todas as tabelas necessárias existem e sua integridade"""
         try:
-            # Criar as tabelas se não existirem
-            Base.metadata.create_all(self.engine)
+            # Criar as tabelas se não existirem e adicionar colunas novas (status_code)
+            upgrade_db(self.engine)
             
             # Verificar se as tabelas foram criadas
             inspector = inspect(self.engine)
@@ -175,13 +180,9 @@ class HealthCheck:
                 self.warnings.append("Data not distributed between both groups (JULIO and LEANDRO)")
                 print("⚠️ Group distribution: INCONSISTENT")
             
-            # Verificar status inválidos
+            # Verificar status inválidos: código ausente ou fora do vocabulário (0 = outros)
             invalid_status = self.session.query(Contract).filter(
-                ~Contract.status.in_([
-                    'verified', 'analysis', 'approved', 'pending',
-                    'paid', 'seized', 'priority', 'high_priority',
-                    'cancelled', 'other'
-                ])
+                Contract.status_code.is_(None) | ~Contract.status_code.between(0, len(STATUS_CONTRATOS))
             ).count()
 
             if invalid_status > 0:
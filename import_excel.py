@@ -1,32 +1,187 @@
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import sessionmaker
 from models import Contract, DailyMetric, Alert, init_db
+from anomaly_detection import detect_anomalies
 import os
+import sys
+import time
+from pathlib import Path
 from dotenv import load_dotenv
 import numpy as np
-from sqlalchemy import func
+from sqlalchemy import delete, func, insert, select, update
+
+# O vocabulário de status fica em static/, junto da análise
+sys.path.append(str(Path(__file__).resolve().parent / "static"))
+from status_contratos import normalizar_status, codigos_status, nomes_status_banco, contar_status
 
 # Load environment variables
 load_dotenv()
 
-# Initialize database
 DB_PATH = os.getenv("DB_PATH", "relatorio_dashboard.db")
-engine = init_db(f"sqlite:///{DB_PATH}")
-SessionLocal = sessionmaker(bind=engine)
-db = SessionLocal()
-
-def convert_to_days(value):
-    if pd.isna(value):
-        return None
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, (datetime, pd.Timestamp)):
-        today = pd.Timestamp.now()
-        return (today - pd.Timestamp(value)).days
-    return None
-
-def process_excel_file(file_path, grupo):
+
+# Quantidade de linhas inseridas (e confirmadas) por vez
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+# 'upsert' atualiza apenas o que mudou; 'reload' apaga tudo e reimporta
+IMPORT_MODE = os.getenv("IMPORT_MODE", "upsert").lower()
+if IMPORT_MODE not in ("upsert", "reload"):
+    raise ValueError(f"IMPORT_MODE inválido: {IMPORT_MODE}")
+
+# Contratos que sumiram de uma aba importada no modo 'upsert': 'keep' os mantém;
+# 'delete' os apaga junto com suas métricas e alertas. Abas e arquivos que
+# deixaram de existir não são tocados em nenhum dos casos.
+IMPORT_MISSING = os.getenv("IMPORT_MISSING", "keep").lower()
+if IMPORT_MISSING not in ("keep", "delete"):
+    raise ValueError(f"IMPORT_MISSING inválido: {IMPORT_MISSING}")
+
+# Campos comparados para decidir se um contrato mudou
+HASH_FIELDS = ['collaborator', 'status', 'status_code', 'resolution_time']
+
+def convert_series_to_days(series):
+    """Converte a coluna de resolução em dias: números passam direto, datas viram a idade em dias"""
+    today = pd.Timestamp.now()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return (today - series).dt.days.astype(float)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    # Coluna com tipos mistos: classificar pelo tipo de cada valor
+    tipos = series.map(type)
+    classes = {t: 'numero' if issubclass(t, (int, float)) else 'data' if issubclass(t, datetime) else None
+               for t in tipos.unique()}
+    classe = tipos.map(classes)
+    dias = pd.Series(np.nan, index=series.index)
+    numeros = classe == 'numero'
+    datas = classe == 'data'
+    if numeros.any():
+        dias[numeros] = series[numeros].astype(float)
+    if datas.any():
+        dias[datas] = (today - pd.to_datetime(series[datas])).dt.days.astype(float)
+    return dias
+
+def build_contract_rows(df, grupo, sheet_name):
+    """Monta as linhas de contratos da aba de forma vetorizada"""
+    situacao = normalizar_status(df['SITUAÇÃO'])
+    codigos = codigos_status(situacao)
+    resolucao = convert_series_to_days(df['RESOLUÇÃO'])
+    agora = datetime.now()
+    created_at = pd.Series(agora - pd.to_timedelta(np.random.randint(0, 30, len(df)), unit='D'))
+
+    contratos = pd.DataFrame({
+        'contract_number': [f"{grupo}-{sheet_name}-{idx}" for idx in df.index],
+        'collaborator': sheet_name,  # Usar o nome da aba como colaborador
+        'status': nomes_status_banco(codigos),  # 'other' para status fora do vocabulário
+        'status_code': codigos.astype(object),
+        'resolution_time': resolucao.astype(object).where(resolucao.notna(), None).to_numpy(),
+        'created_at': created_at.dt.to_pydatetime()
+    })
+    return contratos, situacao
+
+def build_metric_rows(contract_ids):
+    """Monta as linhas de métricas diárias para os contratos inseridos"""
+    n = len(contract_ids)
+    agora = datetime.now()
+    return [
+        {'contract_id': contract_id, 'date': agora, 'productivity': p, 'efficiency': e, 'resolution_rate': r}
+        for contract_id, p, e, r in zip(
+            contract_ids,
+            np.random.uniform(0.6, 1.0, n).tolist(),
+            np.random.uniform(0.7, 1.0, n).tolist(),
+            np.random.uniform(0.5, 1.0, n).tolist()
+        )
+    ]
+
+def insert_chunk(db, rows):
+    """Insere um bloco de contratos e suas métricas (sem confirmar a transação)"""
+    resultado = db.execute(
+        insert(Contract).returning(Contract.id, sort_by_parameter_order=True),
+        rows
+    )
+    contract_ids = resultado.scalars().all()
+    db.execute(insert(DailyMetric), build_metric_rows(contract_ids))
+    return len(contract_ids)
+
+def hash_rows(df):
+    """Hash por linha dos campos comparados no upsert"""
+    campos = pd.DataFrame({
+        'collaborator': df['collaborator'].astype(str).to_numpy(),
+        'status': df['status'].astype(str).to_numpy(),
+        'status_code': pd.to_numeric(df['status_code'], errors='coerce').astype(float).to_numpy(),
+        'resolution_time': pd.to_numeric(df['resolution_time'], errors='coerce').astype(float).to_numpy()
+    })
+    return pd.util.hash_pandas_object(campos, index=False).to_numpy()
+
+def load_existing(db, contract_numbers, chunk_size=IMPORT_CHUNK_SIZE):
+    """Carrega os contratos já gravados com os números informados"""
+    registros = []
+    for start in range(0, len(contract_numbers), chunk_size):
+        lote = contract_numbers[start:start + chunk_size]
+        registros.extend(db.execute(
+            select(Contract.id, Contract.contract_number, *[getattr(Contract, campo) for campo in HASH_FIELDS])
+            .where(Contract.contract_number.in_(lote))
+        ).all())
+    return pd.DataFrame(registros, columns=['id', 'contract_number'] + HASH_FIELDS)
+
+def upsert_sheet(db, contratos, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Insere os contratos novos e atualiza os que mudaram, comparando o hash de
+    cada linha com o do registro gravado. Retorna (inseridos, atualizados, inalterados).
+    """
+    colunas = list(contratos.columns)
+    existentes = load_existing(db, contratos['contract_number'].tolist(), chunk_size)
+    existentes['hash'] = hash_rows(existentes)
+    contratos = contratos.assign(hash=hash_rows(contratos)).merge(
+        existentes[['id', 'contract_number', 'hash']],
+        on='contract_number', how='left', suffixes=('', '_atual')
+    )
+
+    novos = contratos['id'].isna()
+    alterados = ~novos & (contratos['hash'] != contratos['hash_atual'])
+
+    rows = contratos.loc[novos, colunas].to_dict('records')
+    for start in range(0, len(rows), chunk_size):
+        insert_chunk(db, rows[start:start + chunk_size])
+
+    if alterados.any():
+        agora = datetime.now()
+        atualizacoes = contratos.loc[alterados, ['id'] + HASH_FIELDS].astype({'id': int}).to_dict('records')
+        for row in atualizacoes:
+            row['updated_at'] = agora
+        for start in range(0, len(atualizacoes), chunk_size):
+            db.execute(update(Contract), atualizacoes[start:start + chunk_size])
+
+    inserted, updated = int(novos.sum()), int(alterados.sum())
+    return inserted, updated, len(contratos) - inserted - updated
+
+def delete_missing(db, grupo, sheet_name, contract_numbers, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Apaga os contratos da aba que não estão em `contract_numbers`, com suas
+    métricas e alertas. Retorna a quantidade de contratos apagados.
+    """
+    gravados = db.execute(
+        select(Contract.id, Contract.contract_number).where(
+            Contract.collaborator == sheet_name,
+            Contract.contract_number.startswith(f"{grupo}-{sheet_name}-", autoescape=True)
+        )
+    ).all()
+    presentes = set(contract_numbers)
+    ids = [contract_id for contract_id, numero in gravados if numero not in presentes]
+    for start in range(0, len(ids), chunk_size):
+        lote = ids[start:start + chunk_size]
+        db.execute(delete(Alert).where(Alert.contract_id.in_(lote)))
+        db.execute(delete(DailyMetric).where(DailyMetric.contract_id.in_(lote)))
+        db.execute(delete(Contract).where(Contract.id.in_(lote)))
+    return len(ids)
+
+def process_excel_file(db, file_path, grupo, chunk_size=IMPORT_CHUNK_SIZE, mode=IMPORT_MODE, missing=IMPORT_MISSING):
+    """
+    Importa as abas do arquivo. No modo 'reload' cada bloco é confirmado ao ser
+    inserido; no modo 'upsert' nada é confirmado aqui e qualquer erro é propagado,
+    para que a importação inteira ocorra em uma única transação.
+    Retorna a contagem de contratos inseridos, atualizados, inalterados e
+    apagados (ausentes da aba, com missing='delete').
+    """
     print(f"\nProcessando arquivo: {file_path}")
     try:
         # Tentar ler todas as abas do Excel
@@ -34,7 +189,9 @@ def process_excel_file(file_path, grupo):
         print(f"Abas encontradas: {xlsx.sheet_names}")
         
         total_imported = 0
+        total_time = 0.0
         status_counts = {}
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
         
         for sheet_name in xlsx.sheet_names:
             print(f"\nLendo aba: {sheet_name}")
@@ -51,62 +208,45 @@ def process_excel_file(file_path, grupo):
                 print(f"Aviso: Coluna 'RESOLUÇÃO' não encontrada na aba {sheet_name}")
                 continue
             
-            # Mapear status
-            status_map = {
-                'VERIFICADO': 'verified',
-                'ANÁLISE': 'analysis',
-                'PENDENTE': 'pending',
-                'PRIORIDADE': 'priority',
-                'PRIORIDADE TOTAL': 'high_priority',
-                'APROVADO': 'approved',
-                'QUITADO': 'paid',
-                'APREENDIDO': 'seized',
-                'CANCELADO': 'cancelled'
-            }
+            inicio = time.perf_counter()
+            contratos, situacao = build_contract_rows(df, grupo, sheet_name)
             
-            # Processar cada linha do Excel
-            for idx, row in df.iterrows():
-                situacao = str(row['SITUAÇÃO']).strip().upper() if pd.notna(row['SITUAÇÃO']) else ''
-                resolucao = convert_to_days(row['RESOLUÇÃO'])
-                
-                # Contar status para estatísticas
-                if situacao:
-                    if situacao not in status_counts:
-                        status_counts[situacao] = 0
-                    status_counts[situacao] += 1
-                
-                # Criar contrato para todos os status
-                try:
-                    # Criar contrato
-                    contract = Contract(
-                        contract_number=f"{grupo}-{sheet_name}-{idx}",
-                        collaborator=sheet_name,  # Usar o nome da aba como colaborador
-                        status=status_map.get(situacao, 'other'),  # Usar 'other' para status não mapeados
-                        resolution_time=resolucao,
-                        created_at=datetime.now() - timedelta(days=np.random.randint(0, 30))
-                    )
-                    db.add(contract)
-                    db.flush()
-                    
-                    # Criar métricas
-                    metrics = DailyMetric(
-                        contract_id=contract.id,
-                        date=datetime.now(),
-                        productivity=np.random.uniform(0.6, 1.0),
-                        efficiency=np.random.uniform(0.7, 1.0),
-                        resolution_rate=np.random.uniform(0.5, 1.0)
-                    )
-                    db.add(metrics)
-                    total_imported += 1
-                    
-                except Exception as e:
-                    print(f"Erro ao processar linha {idx}: {str(e)}")
-                    continue
+            # Contar status para estatísticas
+            for status, count in contar_status(situacao).items():
+                status_counts[status] = status_counts.get(status, 0) + int(count)
             
-            db.commit()
-            print(f"Importados {total_imported} registros da aba {sheet_name}")
+            if mode == 'upsert':
+                inserted, updated, unchanged = upsert_sheet(db, contratos, chunk_size)
+                sheet_imported = inserted + updated
+                counts['inserted'] += inserted
+                counts['updated'] += updated
+                counts['unchanged'] += unchanged
+                print(f"Aba {sheet_name}: {inserted} inseridos, {updated} atualizados, {unchanged} inalterados")
+                if missing == 'delete':
+                    deleted = delete_missing(db, grupo, sheet_name, contratos['contract_number'].tolist(), chunk_size)
+                    counts['deleted'] += deleted
+                    print(f"Aba {sheet_name}: {deleted} contratos ausentes da planilha apagados")
+            else:
+                # Inserir em blocos, confirmando cada bloco
+                rows = contratos.to_dict('records')
+                sheet_imported = 0
+                for start in range(0, len(rows), chunk_size):
+                    try:
+                        sheet_imported += insert_chunk(db, rows[start:start + chunk_size])
+                        db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Erro ao inserir linhas {start} a {start + chunk_size - 1}: {str(e)}")
+                counts['inserted'] += sheet_imported
+            
+            elapsed = time.perf_counter() - inicio
+            total_imported += sheet_imported
+            total_time += elapsed
+            rate = sheet_imported / elapsed if elapsed > 0 else 0
+            print(f"Importados {sheet_imported} registros da aba {sheet_name} em {elapsed:.2f}s ({rate:,.0f} linhas/s)")
         
-        print(f"\nTotal de registros importados do arquivo {file_path}: {total_imported}")
+        rate = total_imported / total_time if total_time > 0 else 0
+        print(f"\nTotal de registros importados do arquivo {file_path}: {total_imported} ({rate:,.0f} linhas/s)")
         print("\nContagem de status:")
         for status, count in status_counts.items():
             print(f"{status}: {count}")
@@ -114,41 +254,83 @@ def process_excel_file(file_path, grupo):
     except Exception as e:
         print(f"Erro ao processar arquivo {file_path}: {str(e)}")
         db.rollback()
+        if mode == 'upsert':
+            raise
+    
+    return counts
+
+def clear_data(db):
+    """Apaga contratos, métricas e alertas (modo 'reload')"""
+    db.query(Alert).delete()
+    db.query(DailyMetric).delete()
+    db.query(Contract).delete()
+    db.commit()
 
-# Limpar dados existentes
-print("Limpando dados existentes...")
-db.query(Alert).delete()
-db.query(DailyMetric).delete()
-db.query(Contract).delete()
-db.commit()
+def import_files(db, excel_files, data_dir="data", mode=IMPORT_MODE, chunk_size=IMPORT_CHUNK_SIZE,
+                 missing=IMPORT_MISSING):
+    """
+    Importa os arquivos (nome, grupo) de `data_dir`. No modo 'upsert' a
+    importação é confirmada uma única vez ao final, ou desfeita por inteiro em
+    caso de erro. Retorna a contagem de inseridos, atualizados, inalterados e
+    apagados.
+    """
+    print(f"Modo de importação: {mode}")
+    if mode == 'reload':
+        # Limpar dados existentes
+        print("Limpando dados existentes...")
+        clear_data(db)
 
-# Importar dados dos arquivos Excel
-excel_files = [
+    run_counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+    try:
+        for file_name, grupo in excel_files:
+            file_path = os.path.join(data_dir, file_name)
+            if os.path.exists(file_path):
+                for key, value in process_excel_file(db, file_path, grupo, chunk_size, mode, missing).items():
+                    run_counts[key] += value
+            else:
+                print(f"Arquivo não encontrado: {file_path}")
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Importação cancelada, nenhuma alteração gravada: {str(e)}")
+
+    print(f"\nInseridos: {run_counts['inserted']} | Atualizados: {run_counts['updated']} | "
+          f"Inalterados: {run_counts['unchanged']} | Apagados: {run_counts['deleted']}")
+    return run_counts
+
+def print_summary(db):
+    """Totais gravados por colaborador e por status"""
+    print("\nVerificando dados importados:")
+    total_contracts = db.query(Contract).count()
+    print(f"Total de contratos: {total_contracts}")
+
+    print("\nContratos por colaborador:")
+    collaborator_counts = db.query(Contract.collaborator, func.count(Contract.id)).group_by(Contract.collaborator).all()
+    for collaborator, count in collaborator_counts:
+        print(f"{collaborator}: {count} contratos")
+
+    print("\nContratos por status:")
+    status_counts = db.query(Contract.status_code, func.count(Contract.id)).group_by(Contract.status_code).all()
+    for status_code, count in status_counts:
+        status = nomes_status_banco(status_code) if status_code is not None else "sem código"
+        print(f"{status}: {count} contratos")
+
+# Arquivos Excel importados e o grupo de cada um
+EXCEL_FILES = [
     ("(JULIO) LISTAS INDIVIDUAIS.xlsx", "JULIO"),
     ("(LEANDRO_ADRIANO) LISTAS INDIVIDUAIS.xlsx", "LEANDRO")
 ]
 
-for file_name, grupo in excel_files:
-    file_path = os.path.join("data", file_name)
-    if os.path.exists(file_path):
-        process_excel_file(file_path, grupo)
-    else:
-        print(f"Arquivo não encontrado: {file_path}")
-
-# Verificar dados importados
-print("\nVerificando dados importados:")
-total_contracts = db.query(Contract).count()
-print(f"Total de contratos: {total_contracts}")
-
-print("\nContratos por colaborador:")
-collaborator_counts = db.query(Contract.collaborator, func.count(Contract.id)).group_by(Contract.collaborator).all()
-for collaborator, count in collaborator_counts:
-    print(f"{collaborator}: {count} contratos")
-
-print("\nContratos por status:")
-status_counts = db.query(Contract.status, func.count(Contract.id)).group_by(Contract.status).all()
-for status, count in status_counts:
-    print(f"{status}: {count} contratos")
-
-db.close()
-print("\nImportação concluída!") 
\ No newline at end of file
+if __name__ == "__main__":
+    engine = init_db(f"sqlite:///{DB_PATH}")
+    db = sessionmaker(bind=engine)()
+    try:
+        import_files(db, EXCEL_FILES)
+        print_summary(db)
+
+        # Alertas de anomalias sobre o histórico atualizado
+        anomalias = detect_anomalies(db)
+        print(f"\nAnomalias: {anomalias['anomalias']} | Alertas novos: {anomalias['alertas_inseridos']} ({anomalias['segundos']:.3f}s)")
+    finally:
+        db.close()
+    print("\nImportação concluída!") 
\ No newline at end of file
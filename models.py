@@ -1,7 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, ForeignKey, create_engine, inspect, text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
+from pathlib import Path
+import sys
+
+# O vocabulário de status fica em static/, junto da análise
+sys.path.append(str(Path(__file__).resolve().parent / "static"))
+from status_contratos import CODIGOS_STATUS_BANCO
 
 class Contract(Base):
     __tablename__ = "contracts"
@@ -10,6 +16,7 @@ class Contract(Base):
     contract_number = Column(String, unique=True, index=True)
     collaborator = Column(String, index=True)
     status = Column(String, index=True)
+    status_code = Column(SmallInteger, index=True)  # código do vocabulário em static/status_contratos.py
     resolution_time = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
@@ -44,5 +51,25 @@ class Alert(Base):
 
 def init_db(db_url):
     engine = create_engine(db_url)
+    upgrade_db(engine)
+    return engine
+
+def upgrade_db(engine):
+    """Cria as tabelas que faltam e atualiza as existentes para o modelo atual"""
     Base.metadata.create_all(engine)
-    return engine 
\ No newline at end of file
+    _add_missing_columns(engine)
+
+def _add_missing_columns(engine):
+    """Adiciona a bancos existentes as colunas criadas depois da tabela"""
+    columns = {column['name'] for column in inspect(engine).get_columns(Contract.__tablename__)}
+    if 'status_code' not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE contracts ADD COLUMN status_code SMALLINT"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_contracts_status_code ON contracts (status_code)"))
+            # Preenche o código a partir do nome gravado, para que o upsert não
+            # considere alterados todos os contratos já importados
+            conn.execute(
+                text("UPDATE contracts SET status_code = :codigo WHERE status = :nome"),
+                [{'codigo': codigo, 'nome': nome} for nome, codigo in CODIGOS_STATUS_BANCO.items()]
+            )
+            conn.execute(text("UPDATE contracts SET status_code = 0 WHERE status_code IS NULL")) 
\ No newline at end of file
@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import sessionmaker
 from models import Contract, DailyMetric, Alert, init_db
+from pathlib import Path
 import random
 import os
+import sys
 from dotenv import load_dotenv
 
+# O vocabulário de status fica em static/, junto da análise
+sys.path.append(str(Path(__file__).resolve().parent / "static"))
+from status_contratos import CODIGOS_STATUS_BANCO
+
 # Load environment variables
 load_dotenv()
 
@@ -15,15 +21,17 @@ SessionLocal = sessionmaker(bind=engine)
 db = SessionLocal()
 
 # Sample data
-statuses = ["pending", "analyzing", "completed"]
+statuses = ["pending", "analysis", "approved"]
 collaborators = ["João Silva", "Maria Santos", "Pedro Oliveira", "Ana Costa"]
 
 # Create contracts
 for i in range(20):
+    status = random.choice(statuses)
     contract = Contract(
         contract_number=f"CONT-{2024}-{i+1:03d}",
         collaborator=random.choice(collaborators),
-        status=random.choice(statuses),
+        status=status,
+        status_code=CODIGOS_STATUS_BANCO[status],
         resolution_time=random.uniform(1, 48) if random.random() > 0.3 else None,
         created_at=datetime.now() - timedelta(days=random.randint(0, 30))
     )
@@ -0,0 +1,189 @@
+"""
+Agregados persistentes por colaborador e dia.
+
+Cada aba processada contribui com a contagem de registros e a soma dos tempos
+de processamento por status. O banco guarda os totais atuais de cada
+colaborador e, por dia, as variações aplicadas nesse dia. A cada execução só
+as diferenças entre a contribuição nova e a registrada são gravadas, então o
+custo acompanha o que mudou nas planilhas e não o histórico inteiro.
+"""
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+def somar_tempo_por_status(df):
+    """{status: [soma, quantidade]} dos tempos de processamento válidos da aba"""
+    if 'TEMPO_PROCESSAMENTO' not in df.columns:
+        return {}
+    tempo = pd.to_numeric(df['TEMPO_PROCESSAMENTO'], errors='coerce').to_numpy(dtype=float)
+    validos = ~np.isnan(tempo)
+    codigos = df['STATUS'].cat.codes.to_numpy()[validos]
+    categorias = df['STATUS'].cat.categories
+    soma = np.bincount(codigos[codigos >= 0], weights=tempo[validos][codigos >= 0], minlength=len(categorias))
+    quantidade = np.bincount(codigos[codigos >= 0], minlength=len(categorias))
+    return {
+        categorias[i]: [float(soma[i]), int(quantidade[i])]
+        for i in np.flatnonzero(quantidade)
+    }
+
+
+def acumular_tempo_por_status(acumulado, parcial):
+    """Soma ao acumulado o tempo por status de mais um bloco"""
+    for status, (soma, quantidade) in parcial.items():
+        anterior = acumulado.get(status, [0.0, 0])
+        acumulado[status] = [anterior[0] + soma, anterior[1] + quantidade]
+    return acumulado
+
+
+def contribuicao(metricas):
+    """{status: (quantidade, soma_tempo, n_tempo)} de uma aba a partir das suas métricas"""
+    tempos = metricas.get('tempo_status', {})
+    resultado = {}
+    for status, quantidade in metricas['status_counts'].items():
+        soma, n = tempos.get(status, (0.0, 0))
+        resultado[status] = (int(quantidade), float(soma), int(n))
+    return resultado
+
+
+class AgregadosIncrementais:
+    """Banco SQLite com os totais por colaborador e as variações diárias"""
+
+    def __init__(self, caminho_db):
+        self.caminho_db = str(caminho_db)
+        self.criar_tabelas()
+
+    def conectar(self):
+        return sqlite3.connect(self.caminho_db)
+
+    def criar_tabelas(self):
+        with self.conectar() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS totais_colaboradores (
+                grupo TEXT NOT NULL,
+                colaborador TEXT NOT NULL,
+                status TEXT NOT NULL,
+                quantidade INTEGER NOT NULL,
+                soma_tempo REAL NOT NULL,
+                n_tempo INTEGER NOT NULL,
+                PRIMARY KEY (grupo, colaborador, status)
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS agregados_diarios (
+                grupo TEXT NOT NULL,
+                colaborador TEXT NOT NULL,
+                dia DATE NOT NULL,
+                status TEXT NOT NULL,
+                quantidade INTEGER NOT NULL,
+                soma_tempo REAL NOT NULL,
+                n_tempo INTEGER NOT NULL,
+                PRIMARY KEY (grupo, colaborador, dia, status)
+            )
+            ''')
+        conn.close()
+
+    def aplicar(self, dia, grupos, contribuicoes):
+        """
+        Atualiza os agregados dos `grupos` lidos nesta execução.
+
+        `contribuicoes` mapeia (grupo, colaborador) para {status: (quantidade,
+        soma_tempo, n_tempo)}; colaboradores desses grupos que não aparecem mais
+        têm a contribuição removida. As variações são somadas ao `dia` e os totais
+        substituídos em uma única transação. Retorna os colaboradores alterados.
+        """
+        grupos = list(grupos)
+        if not grupos:
+            return set()
+
+        conn = self.conectar()
+        try:
+            marcadores = ','.join('?' * len(grupos))
+            atuais = defaultdict(dict)
+            for grupo, colaborador, status, *valores in conn.execute(
+                f'SELECT grupo, colaborador, status, quantidade, soma_tempo, n_tempo '
+                f'FROM totais_colaboradores WHERE grupo IN ({marcadores})', grupos
+            ):
+                atuais[(grupo, colaborador)][status] = tuple(valores)
+
+            variacoes = []
+            alterados = set()
+            for chave in set(atuais) | set(contribuicoes):
+                anterior = atuais.get(chave, {})
+                nova = contribuicoes.get(chave, {})
+                if anterior == nova:
+                    continue
+                alterados.add(chave)
+                for status in set(anterior) | set(nova):
+                    antes = anterior.get(status, (0, 0.0, 0))
+                    depois = nova.get(status, (0, 0.0, 0))
+                    if antes != depois:
+                        variacoes.append((*chave, dia, status, *(d - a for a, d in zip(antes, depois))))
+
+            if variacoes:
+                with conn:
+                    conn.executemany('''
+                    INSERT INTO agregados_diarios (grupo, colaborador, dia, status, quantidade, soma_tempo, n_tempo)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (grupo, colaborador, dia, status) DO UPDATE SET
+                        quantidade = quantidade + excluded.quantidade,
+                        soma_tempo = soma_tempo + excluded.soma_tempo,
+                        n_tempo = n_tempo + excluded.n_tempo
+                    ''', variacoes)
+                    conn.executemany(
+                        'DELETE FROM totais_colaboradores WHERE grupo = ? AND colaborador = ?',
+                        sorted(alterados)
+                    )
+                    conn.executemany(
+                        'INSERT INTO totais_colaboradores VALUES (?, ?, ?, ?, ?, ?)',
+                        [
+                            (*chave, status, *valores)
+                            for chave in sorted(alterados)
+                            for status, valores in contribuicoes.get(chave, {}).items()
+                        ]
+                    )
+            return alterados
+        finally:
+            conn.close()
+
+    def totais(self, grupos=None):
+        """
+        Métricas atuais por colaborador: {(grupo, colaborador): {'total_registros',
+        'status_counts', 'soma_tempo', 'n_tempo'}}
+        """
+        consulta = 'SELECT grupo, colaborador, status, quantidade, soma_tempo, n_tempo FROM totais_colaboradores'
+        parametros = []
+        if grupos is not None:
+            grupos = list(grupos)
+            consulta += f" WHERE grupo IN ({','.join('?' * len(grupos))})"
+            parametros = grupos
+
+        conn = self.conectar()
+        try:
+            linhas = conn.execute(consulta + ' ORDER BY quantidade DESC', parametros).fetchall()
+        finally:
+            conn.close()
+
+        totais = {}
+        for grupo, colaborador, status, quantidade, soma_tempo, n_tempo in linhas:
+            metricas = totais.setdefault((grupo, colaborador), {
+                'total_registros': 0, 'status_counts': {}, 'soma_tempo': 0.0, 'n_tempo': 0
+            })
+            metricas['status_counts'][status] = quantidade
+            metricas['total_registros'] += quantidade
+            metricas['soma_tempo'] += soma_tempo
+            metricas['n_tempo'] += n_tempo
+        return totais
+
+    def diarios(self, inicio=None):
+        """Variações por colaborador, dia e status a partir de `inicio`"""
+        conn = self.conectar()
+        try:
+            return pd.read_sql_query(
+                'SELECT * FROM agregados_diarios WHERE dia >= ? ORDER BY dia, grupo, colaborador, status',
+                conn, params=[str(inicio or '')]
+            )
+        finally:
+            conn.close()
@@ -14,11 +14,42 @@ import jinja2
 import base64
 from io import BytesIO
 import json
+import logging
+import sys
 import traceback
 import xlrd  # Para arquivos .xls
 from openpyxl import load_workbook  # Para arquivos .xlsx
 import sqlite3
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from leitura_colunar import (
+    ler_colunas, ler_colunas_em_blocos, concatenar_blocos, formatar_cabecalho, formatar_cabecalho_xlrd,
+    TAMANHO_BLOCO_PADRAO
+)
+from cache_ingestao import ManifestoIngestao, CacheAbas
+from status_contratos import STATUS_CONTRATOS, normalizar_status, contar_status
+from motor_metricas import calcular_metricas_colaboradores
+from contexto_analise import ContextoAnalise, coluna_hora, coluna_resolucao
+from features_predicao import (
+    FEATURES_PREDICAO, PADRAO_DIA_SEMANA, PADRAO_HORA, montar_features, montar_features_contexto
+)
+from registro_modelos import RegistroModelos, fingerprint_treino
+import contexto_analise
+import dashboard_json
+import motor_metricas
+import status_contratos
+from executor_etapas import ExecutorEtapas, escrever_saida_etapa
+from agregados_incrementais import (
+    AgregadosIncrementais, acumular_tempo_por_status, contribuicao, somar_tempo_por_status
+)
+from log_analise import log
+from compactacao_tipos import compactar_dataframe, memoria_bytes
+from dashboard_json import ARQUIVO_DASHBOARD, gravar_dashboard_json, montar_dados_dashboard
+from previsao_backlog import HORIZONTE_PADRAO, STATUS_PENDENTES, gerar_previsao_backlog
+from consultas_em_blocos import TAMANHO_BLOCO_CONSULTA, descrever_medida, resumo_historico
+from previa_amostral import CONFIANCA_PREVIA, FRACAO_PREVIA, MINIMO_POR_ABA, amostrar_abas, estimar_previa
 
 class AnalisadorInteligente:
     def __init__(self):
@@ -42,11 +73,7 @@ class AnalisadorInteligente:
         }
         
         # Status específicos solicitados
-        self.status_especificos = [
-            'VERIFICADO', 'ANÁLISE', 'PENDENTE', 'PRIORIDADE', 
-            'PRIORIDADE TOTAL', 'APROVADO', 'APREENDIDO', 'CANCELADO',
-            'QUITADO', 'OUTROS ACORDOS', 'M.ENCAMINHADA'  # Adicionados novos status encontrados
-        ]
+        self.status_especificos = list(STATUS_CONTRATOS)
         
         # Status prioritários (mais importantes)
         self.status_prioritarios = ['APROVADO', 'VERIFICADO']
@@ -54,63 +81,161 @@ class AnalisadorInteligente:
         # Horas de trabalho por dia
         self.horas_trabalho = 8
         
+        # Linhas transpostas por bloco na leitura das abas
+        self.tamanho_bloco_leitura = TAMANHO_BLOCO_PADRAO
+        
+        # Leitura em blocos de N linhas com métricas acumuladas (None lê a aba inteira).
+        # manter_dataframes=None decide pelas etapas executadas: a análise completa e a
+        # prévia mantêm os DataFrames, executar_analise_completa(somente_metricas=True)
+        # fica só com as métricas das abas. True/False fixam a escolha.
+        self.linhas_por_bloco = None
+        self.manter_dataframes = None
+        
+        # Reduzir os tipos das colunas após a normalização (categóricas, datetime64,
+        # int32/float32 sem perda) e registrar a memória de cada aba antes e depois
+        self.compactar_tipos = True
+        
+        # Abas que não pertencem a colaboradores
+        self.abas_ignoradas = ["TESTE", "RELATÓRIO GERAL"]
+        
+        # Leitura das planilhas em vários processos
+        self.ingestao_paralela = True
+        self.processos_ingestao = os.cpu_count() or 1
+        
+        # Reaproveitar abas sem alteração entre execuções (manifesto + cache)
+        self.ingestao_incremental = True
+        self.diretorio_cache = None  # padrão: <diretório de trabalho>/.cache_analise
+        self.formato_cache = 'feather'  # 'feather', 'parquet' ou 'pickle'
+        
+        # Totais por colaborador e variações diárias mantidos em SQLite; os
+        # relatórios geral e de produtividade são gerados a partir deles
+        self.agregados_incrementais = True
+        self.caminho_agregados = None  # padrão: <diretório do cache>/agregados.db
+        self.agregados = None
+        
+        # Banco do dashboard gravado por exportar_para_sqlite (padrão: DB_PATH ou
+        # <diretório de trabalho>/relatorio_dashboard.db); o relatório TXT é opcional
+        self.caminho_db = os.getenv('DB_PATH')
+        self.gerar_txt = True
+        # Consultas ao histórico desse banco são lidas em blocos de N linhas
+        self.tamanho_bloco_consulta = TAMANHO_BLOCO_CONSULTA
+        # JSON com os dados do dashboard servido em /api/dashboard (padrão: <diretório do cache>/dashboard.json)
+        self.caminho_dashboard = None
+        
+        # Prévia (executar_analise_completa(previa=True)): só uma amostra de cada colaborador
+        # é analisada e os resultados são estimativas com intervalo de confiança
+        self.fracao_previa = FRACAO_PREVIA
+        self.minimo_previa = MINIMO_POR_ABA
+        self.confianca_previa = CONFIANCA_PREVIA
+        self.semente_previa = 42
+        
+        # Função chamada com um dicionário a cada evento de progresso (aba lida, etapa concluída)
+        self.callback_progresso = None
+        
+        # No terminal as tabelas dos relatórios são impressas; em lote (servidor,
+        # importação) as etapas só retornam os resultados e registram no logger `analise`
+        self.interativo = sys.stdout.isatty()
+        
+        # Etapas posteriores à validação rodam em paralelo conforme as dependências;
+        # as etapas sem efeitos colaterais guardam a saída em <diretório do cache>/etapas
+        self.etapas_paralelas = min(8, os.cpu_count() or 1)
+        self.cache_etapas = True
+        self.resultados_etapas = {}
+        
+        # Modelo de predição: parâmetros do RandomForest e registro em disco,
+        # indexado pelos dados de treino (padrão: <diretório do cache>/modelos)
+        self.parametros_predicao = {
+            'n_estimators': 100,
+            'max_depth': None,
+            'min_samples_split': 2,
+            'random_state': 42
+        }
+        self.diretorio_modelos = None
+        # Treinar (ou carregar do registro) o modelo ao final da análise completa
+        self.treinar_modelo = False
+        
+        # Previsão diária de pendentes por colaborador e grupo (GradientBoosting), gravada
+        # no banco do dashboard e refeita só quando as séries ou os parâmetros mudam
+        self.prever_backlog = True
+        self.horizonte_backlog = HORIZONTE_PADRAO
+        self.status_pendentes = list(STATUS_PENDENTES)
+        self.parametros_backlog = {
+            'n_estimators': 200,
+            'max_depth': 3,
+            'learning_rate': 0.05,
+            'random_state': 42
+        }
+        
         self.modelos = {}
         warnings.filterwarnings('ignore')
         
+    def __getstate__(self):
+        # O callback não acompanha o analisador para os processos de leitura; o
+        # progresso das abas lidas neles é enviado por _ler_arquivos_em_paralelo
+        estado = self.__dict__.copy()
+        estado['callback_progresso'] = None
+        return estado
+    
+    def _notificar_progresso(self, tipo, **dados):
+        """Envia um evento de progresso ao callback, se houver"""
+        if self.callback_progresso is None:
+            return
+        try:
+            self.callback_progresso({'tipo': tipo, 'momento': datetime.now().isoformat(), **dados})
+        except Exception as e:
+            print(f"Aviso: falha ao notificar progresso: {str(e)}")
+    
+    def _notificar_aba(self, caminho, aba, leitura):
+        """Evento 'aba_processada' com as linhas da aba e a taxa de leitura"""
+        linhas, segundos = leitura['linhas'], leitura['segundos']
+        self._notificar_progresso(
+            'aba_processada', arquivo=Path(caminho).name, aba=aba, linhas=linhas,
+            segundos=round(segundos, 3), linhas_por_segundo=round(linhas / segundos) if segundos > 0 else None
+        )
+    
+    def _detalhar(self):
+        """Se as tabelas do console devem ser montadas (modo interativo ou log em DEBUG)"""
+        return self.interativo or log.isEnabledFor(logging.DEBUG)
+    
+    def _exibir(self, texto='', nivel=logging.DEBUG):
+        """
+        Imprime no modo interativo (dentro de uma etapa do grafo, a saída é escrita
+        ao fim da etapa); em lote, registra no logger com o nível indicado
+        """
+        if self.interativo:
+            if not escrever_saida_etapa(texto):
+                print(texto)
+        elif texto.strip():
+            log.log(nivel, texto.strip('\n'))
+    
+    def _notificar_etapa(self, registro):
+        self._notificar_progresso(
+            'etapa_concluida',
+            etapa=registro['etapa'],
+            origem=registro['origem'],
+            segundos=round(registro['segundos'], 3),
+            memoria_mb=round(registro['memoria_mb'], 1) if registro['memoria_mb'] is not None else None
+        )
+    
+    def _executar_etapa(self, etapa, funcao, *args):
+        """Executa uma etapa da análise e notifica o tempo gasto"""
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        self._notificar_progresso('etapa_concluida', etapa=etapa, segundos=round(time.perf_counter() - inicio, 3))
+        return resultado
+    
     def calcular_metricas_avancadas(self, dados_grupos):
         """Calcula métricas avançadas de produtividade e eficiência"""
-        metricas_avancadas = []
-        
-        for grupo, dados in dados_grupos.items():
-            for colaborador, df in dados['colaboradores'].items():
-                if df.empty:
-                    continue
-                
-                # Contagem de status
-                status_counts = self.contar_status_especificos(df)
-                
-                # Calcular métricas de produtividade
-                total_registros = len(df)
-                total_prioritarios = status_counts.get('APROVADO', 0)
-                taxa_prioritarios = (total_prioritarios / total_registros * 100) if total_registros > 0 else 0
-                
-                # Calcular produtividade por hora
-                dias_unicos = len(df['DIA'].unique()) if 'DIA' in df.columns else 1
-                horas_totais = dias_unicos * self.horas_trabalho
-                produtividade_hora = total_registros / horas_totais if horas_totais > 0 else 0
-                produtividade_prioritarios = total_prioritarios / horas_totais if horas_totais > 0 else 0
-                
-                # Calcular tempo médio para aprovação
-                tempo_medio = 0
-                if 'TEMPO_PROCESSAMENTO' in df.columns:
-                    df_concluidos = df[df['STATUS'] == 'APROVADO']
-                    if not df_concluidos.empty:
-                        tempo_medio = df_concluidos['TEMPO_PROCESSAMENTO'].mean()
-                
-                # Adicionar métricas
-                metricas_avancadas.append({
-                    'grupo': grupo,
-                    'colaborador': colaborador,
-                    'total_registros': total_registros,
-                    'aprovados': status_counts.get('APROVADO', 0),
-                    'pendentes': status_counts.get('PENDENTE', 0),
-                    'taxa_prioritarios': taxa_prioritarios,
-                    'produtividade_hora': produtividade_hora,
-                    'produtividade_prioritarios': produtividade_prioritarios,
-                    'tempo_medio_dias': tempo_medio,
-                    'score_eficiencia': (taxa_prioritarios * 0.4 + 
-                                        produtividade_hora * 0.3 + 
-                                        produtividade_prioritarios * 0.3)
-                })
-        
-        return pd.DataFrame(metricas_avancadas)
+        # Um único groupby sobre todas as abas concatenadas (ver motor_metricas)
+        return calcular_metricas_colaboradores(dados_grupos, self.horas_trabalho)
     
     def contar_status_especificos(self, df):
         """Conta a ocorrência de cada status específico no DataFrame"""
         if df.empty or 'STATUS' not in df.columns:
             return {}
         
-        return {status: len(df[df['STATUS'] == status]) for status in self.status_especificos}
+        contagem = df['STATUS'].value_counts()
+        return {status: int(contagem.get(status, 0)) for status in self.status_especificos}
     
     def gerar_ranking_colaboradores(self, df_metricas):
         """Gera ranking de colaboradores baseado em eficiência"""
@@ -126,11 +251,18 @@ class AnalisadorInteligente:
         
         return df_ranking
     
-    def identificar_melhores_praticas(self, df_metricas, dados_grupos):
+    def criar_contexto(self, dados_grupos):
+        """Contexto compartilhado pelas etapas que usam colunas derivadas"""
+        return ContextoAnalise(dados_grupos, self.status_prioritarios)
+    
+    def identificar_melhores_praticas(self, df_metricas, dados_grupos, contexto=None):
         """Identifica as melhores práticas dos colaboradores mais eficientes"""
         if df_metricas.empty:
             return []
         
+        if contexto is None:
+            contexto = self.criar_contexto(dados_grupos)
+        
         # Selecionar top 3 colaboradores
         top_colaboradores = df_metricas.nlargest(3, 'score_eficiencia')
         
@@ -142,52 +274,40 @@ class AnalisadorInteligente:
             
             # Obter dados do colaborador
             df = dados_grupos[grupo]['colaboradores'].get(colaborador)
-            if df is None or df.empty:
+            fatia = contexto.fatia(grupo, colaborador)
+            if df is None or fatia is None:
                 continue
+            prioritario = contexto.prioritario[fatia]
             
             # Analisar padrões de sucesso
             # 1. Distribuição por dia da semana
             if 'DIA' in df.columns:
-                try:
-                    df['DIA'] = pd.to_datetime(df['DIA'])
-                    df['DIA_SEMANA'] = df['DIA'].dt.day_name()
-                    dias_produtivos = df[df['STATUS'].isin(self.status_prioritarios)]['DIA_SEMANA'].value_counts()
-                    if not dias_produtivos.empty:
-                        melhor_dia = dias_produtivos.idxmax()
-                        melhores_praticas.append(f"O colaborador {colaborador} tem melhor desempenho às {melhor_dia}s")
-                except Exception as e:
-                    print(f"Aviso: Não foi possível analisar dias da semana para {colaborador}: {str(e)}")
+                dias_produtivos = contexto.dia_semana[fatia][prioritario].value_counts()
+                if not dias_produtivos.empty:
+                    melhor_dia = dias_produtivos.idxmax()
+                    melhores_praticas.append(f"O colaborador {colaborador} tem melhor desempenho às {melhor_dia}s")
             
             # 2. Verificar se há padrão de horário (se houver coluna de hora)
-            hora_cols = [col for col in df.columns if 'HORA' in col]
-            if hora_cols:
-                try:
-                    df_hora = df[df['STATUS'].isin(self.status_prioritarios)]
-                    if not df_hora.empty and hora_cols[0] in df_hora.columns:
-                        df_hora['HORA'] = pd.to_datetime(df_hora[hora_cols[0]]).dt.hour
-                        horas_produtivas = df_hora['HORA'].value_counts()
-                        if not horas_produtivas.empty:
-                            melhor_hora = horas_produtivas.idxmax()
-                            melhores_praticas.append(f"O colaborador {colaborador} é mais produtivo por volta das {melhor_hora}h")
-                except Exception as e:
-                    print(f"Aviso: Não foi possível analisar horários para {colaborador}: {str(e)}")
+            if coluna_hora(df):
+                horas_produtivas = contexto.hora[fatia][prioritario].value_counts()
+                if not horas_produtivas.empty:
+                    melhor_hora = horas_produtivas.idxmax()
+                    melhores_praticas.append(f"O colaborador {colaborador} é mais produtivo por volta das {melhor_hora}h")
             
             # 3. Verificar tipos de contratos com maior taxa de sucesso
             tipo_cols = [col for col in df.columns if any(tipo in col.upper() for tipo in ['TIPO', 'CATEGORIA'])]
             if tipo_cols:
                 try:
-                    df_tipos = df[df['STATUS'].isin(self.status_prioritarios)]
-                    if not df_tipos.empty and tipo_cols[0] in df_tipos.columns:
-                        tipos_sucesso = df_tipos[tipo_cols[0]].value_counts()
-                        if not tipos_sucesso.empty:
-                            melhor_tipo = tipos_sucesso.idxmax()
-                            melhores_praticas.append(f"O colaborador {colaborador} tem maior sucesso com contratos do tipo '{melhor_tipo}'")
+                    tipos_sucesso = df[tipo_cols[0]][prioritario].value_counts()
+                    if not tipos_sucesso.empty:
+                        melhor_tipo = tipos_sucesso.idxmax()
+                        melhores_praticas.append(f"O colaborador {colaborador} tem maior sucesso com contratos do tipo '{melhor_tipo}'")
                 except Exception as e:
-                    print(f"Aviso: Não foi possível analisar tipos de contrato para {colaborador}: {str(e)}")
+                    self._exibir(f"Aviso: Não foi possível analisar tipos de contrato para {colaborador}: {str(e)}", logging.WARNING)
         
         return melhores_praticas
     
-    def gerar_recomendacoes_estrategicas(self, df_metricas, dados_grupos):
+    def gerar_recomendacoes_estrategicas(self, df_metricas, dados_grupos, contexto=None):
         """Gera recomendações estratégicas para melhorar a produtividade"""
         if df_metricas.empty:
             return []
@@ -195,54 +315,34 @@ class AnalisadorInteligente:
         recomendacoes = []
         
         try:
-            # Criar DataFrame consolidado com reset_index para evitar problemas de índice
-            todos_dados = []
-            for grupo, dados in dados_grupos.items():
-                for colaborador, df in dados['colaboradores'].items():
-                    if not df.empty:
-                        df_temp = df.copy()
-                        df_temp['GRUPO'] = grupo
-                        df_temp['COLABORADOR'] = colaborador
-                        df_temp = df_temp.reset_index(drop=True)
-                        todos_dados.append(df_temp)
-            
-            if todos_dados:
-                todos_dados = pd.concat(todos_dados, ignore_index=True)
+            if contexto is None:
+                contexto = self.criar_contexto(dados_grupos)
+            
+            if contexto.abas:
+                prioritario = contexto.prioritario
                 
                 # Análise de horários produtivos
-                if 'HORA' in todos_dados.columns:
-                    try:
-                        todos_dados['HORA'] = pd.to_datetime(todos_dados['HORA']).dt.hour
-                        horas_produtivas = todos_dados[
-                            todos_dados['STATUS'].isin(self.status_prioritarios)
-                        ]['HORA'].value_counts()
-                        
-                        if not horas_produtivas.empty:
-                            melhores_horas = horas_produtivas.nlargest(2).index.tolist()
-                            recomendacoes.append(
-                                f"Concentrar esforços de negociação nos horários mais "
-                                f"produtivos: {melhores_horas[0]}h e {melhores_horas[1]}h"
-                            )
-                    except Exception as e:
-                        print(f"Aviso: Não foi possível analisar horários produtivos: {str(e)}")
+                try:
+                    horas_produtivas = contexto.hora[prioritario].value_counts()
+                    
+                    if not horas_produtivas.empty:
+                        melhores_horas = horas_produtivas.nlargest(2).index.tolist()
+                        recomendacoes.append(
+                            f"Concentrar esforços de negociação nos horários mais "
+                            f"produtivos: {melhores_horas[0]}h e {melhores_horas[1]}h"
+                        )
+                except Exception as e:
+                    self._exibir(f"Aviso: Não foi possível analisar horários produtivos: {str(e)}", logging.WARNING)
                 
                 # Análise de dias produtivos
-                if 'DIA' in todos_dados.columns:
-                    try:
-                        todos_dados['DIA'] = pd.to_datetime(todos_dados['DIA'])
-                        todos_dados['DIA_SEMANA'] = todos_dados['DIA'].dt.day_name()
-                        dias_produtivos = todos_dados[
-                            todos_dados['STATUS'].isin(self.status_prioritarios)
-                        ]['DIA_SEMANA'].value_counts()
-                        
-                        if not dias_produtivos.empty:
-                            melhor_dia = dias_produtivos.idxmax()
-                            recomendacoes.append(
-                                f"Priorizar negociações complexas às {melhor_dia}s, "
-                                "dia com maior taxa de sucesso"
-                            )
-                    except Exception as e:
-                        print(f"Aviso: Não foi possível analisar dias produtivos: {str(e)}")
+                dias_produtivos = contexto.dia_semana[prioritario].value_counts()
+                
+                if not dias_produtivos.empty:
+                    melhor_dia = dias_produtivos.idxmax()
+                    recomendacoes.append(
+                        f"Priorizar negociações complexas às {melhor_dia}s, "
+                        "dia com maior taxa de sucesso"
+                    )
             
             # Recomendações baseadas em métricas gerais
             try:
@@ -277,120 +377,85 @@ class AnalisadorInteligente:
                         )
             
             except Exception as e:
-                print(f"Aviso: Erro ao gerar recomendações baseadas em métricas: {str(e)}")
+                self._exibir(f"Aviso: Erro ao gerar recomendações baseadas em métricas: {str(e)}", logging.WARNING)
         
         except Exception as e:
-            print(f"Aviso: Erro ao analisar padrões de dados: {str(e)}")
+            self._exibir(f"Aviso: Erro ao analisar padrões de dados: {str(e)}", logging.WARNING)
         
         return recomendacoes
     
-    def gerar_html_responsivo(self, dados_grupos):
+    def gerar_html_responsivo(self, dados_grupos, contexto=None):
         """
         Gera o dashboard HTML com os dados organizados e validados
         """
         try:
-            print("\n=== Iniciando Organização e Validação do Relatório ===")
+            self._exibir("\n=== Iniciando Organização e Validação do Relatório ===")
             
-            # DataFrame consolidado para relatório diário
-            relatorio_diario = []
+            if contexto is None:
+                contexto = self.criar_contexto(dados_grupos)
             
-            for grupo, dados in dados_grupos.items():
-                for colaborador, df in dados['colaboradores'].items():
-                    if df.empty:
-                        print(f"Debug: DataFrame vazio para {colaborador} do grupo {grupo}")
-                        continue
-                    
-                    # Identificar coluna de resolução
-                    coluna_resolucao = next(
-                        (col for col in df.columns 
-                         if 'RESOLUCAO' in col.upper() or 'DATA_CONCLUSAO' in col.upper()),
-                        None
-                    )
-                    
-                    if not coluna_resolucao:
-                        print(f"Debug: Coluna de resolução não encontrada para {colaborador}")
-                        continue
-                    
-                    try:
-                        # Converter e validar datas
-                        df['DATA_RESOLUCAO'] = pd.to_datetime(
-                            df[coluna_resolucao], 
-                            errors='coerce'
-                        )
-                        
-                        # Remover registros com datas inválidas
-                        registros_invalidos = df['DATA_RESOLUCAO'].isna().sum()
-                        if registros_invalidos > 0:
-                            print(f"Debug: {registros_invalidos} registros com data inválida para {colaborador}")
-                        
-                        df = df.dropna(subset=['DATA_RESOLUCAO'])
+            if self._detalhar():
+                for grupo, dados in dados_grupos.items():
+                    for colaborador, df in dados['colaboradores'].items():
+                        if df.empty:
+                            self._exibir(f"Debug: DataFrame vazio para {colaborador} do grupo {grupo}")
+                            continue
                         
-                        # Agrupar por data e status
-                        daily_stats = df.groupby([
-                            df['DATA_RESOLUCAO'].dt.date,
-                            'STATUS'
-                        ]).size().reset_index(name='quantidade')
+                        if not coluna_resolucao(df):
+                            self._exibir(f"Debug: Coluna de resolução não encontrada para {colaborador}")
+                            continue
                         
-                        # Criar estrutura para o dashboard
-                        for _, row in daily_stats.iterrows():
-                            relatorio_diario.append({
-                                'data': row['DATA_RESOLUCAO'],
-                                'colaborador': colaborador,
-                                'grupo': grupo,
-                                'status': row['STATUS'],
-                                'quantidade': row['quantidade']
-                            })
-                        
-                    except Exception as e:
-                        print(f"Debug: Erro ao processar dados de {colaborador}: {str(e)}")
-                        continue
-            
-            # Converter para DataFrame
-            df_relatorio = pd.DataFrame(relatorio_diario)
-            
-            # Validar estrutura final
-            if df_relatorio.empty:
-                print("Erro: Nenhum dado válido para o relatório diário")
-                return None
+                        # Registros com datas inválidas ficam fora do relatório
+                        registros_invalidos = contexto.data_resolucao[contexto.fatia(grupo, colaborador)].isna().sum()
+                        if registros_invalidos > 0:
+                            self._exibir(f"Debug: {registros_invalidos} registros com data inválida para {colaborador}")
             
-            # Validar campos necessários para o dashboard
-            campos_obrigatorios = ['data', 'colaborador', 'grupo', 'status', 'quantidade']
-            campos_faltantes = set(campos_obrigatorios) - set(df_relatorio.columns)
-            if campos_faltantes:
-                print(f"Erro: Campos obrigatórios faltantes: {campos_faltantes}")
+            # Registros por aba, data e status e listas dos filtros (ver dashboard_json)
+            dados_dashboard = montar_dados_dashboard(contexto)
+            if dados_dashboard is None:
+                self._exibir("Erro: Nenhum dado válido para o relatório diário", logging.ERROR)
                 return None
             
-            # Preparar dados para o dashboard
-            dados_dashboard = {
-                'dados_diarios': df_relatorio.to_dict('records'),
-                'resumo_status': df_relatorio.groupby('status')['quantidade'].sum().to_dict(),
-                'colaboradores': df_relatorio['colaborador'].unique().tolist(),
-                'grupos': df_relatorio['grupo'].unique().tolist(),
-                'datas_disponiveis': df_relatorio['data'].dt.date.unique().tolist()
-            }
-            
-            # Validar funcionalidade dos botões e menus
-            self.validar_elementos_dashboard(dados_dashboard)
-            
-            print("\n=== Validação do Relatório Concluída ===")
-            print(f"✓ Total de registros: {len(df_relatorio)}")
-            print(f"✓ Colaboradores: {len(dados_dashboard['colaboradores'])}")
-            print(f"✓ Grupos: {len(dados_dashboard['grupos'])}")
-            print(f"✓ Período: {min(dados_dashboard['datas_disponiveis'])} a {max(dados_dashboard['datas_disponiveis'])}")
+            self._exibir("\n=== Validação do Relatório Concluída ===")
+            self._exibir(f"✓ Total de registros: {len(dados_dashboard['dados_diarios'])}")
+            self._exibir(f"✓ Colaboradores: {len(dados_dashboard['colaboradores'])}")
+            self._exibir(f"✓ Grupos: {len(dados_dashboard['grupos'])}")
+            self._exibir(f"✓ Período: {min(dados_dashboard['datas_disponiveis'])} a {max(dados_dashboard['datas_disponiveis'])}")
             
             return dados_dashboard
             
         except Exception as e:
-            print(f"\nErro crítico na organização do relatório: {str(e)}")
+            self._exibir(f"\nErro crítico na organização do relatório: {str(e)}", logging.ERROR)
             traceback.print_exc()
             return None
 
+    def obter_caminho_dashboard(self):
+        """Caminho do JSON com os dados do dashboard"""
+        if self.caminho_dashboard:
+            return Path(self.caminho_dashboard)
+        return self.obter_diretorio_cache() / ARQUIVO_DASHBOARD
+
+    def gravar_dashboard(self, dados_dashboard):
+        """Grava os dados do dashboard como JSON; retorna o caminho ou None"""
+        if dados_dashboard is None:
+            return None
+        try:
+            caminho = gravar_dashboard_json(dados_dashboard, self.obter_caminho_dashboard())
+            self._exibir(f"Dados do dashboard gravados em: {caminho}", logging.INFO)
+            return caminho
+        except Exception as e:
+            self._exibir(f"Aviso: não foi possível gravar os dados do dashboard: {str(e)}", logging.WARNING)
+            return None
+
     def validar_elementos_dashboard(self, dados_dashboard):
         """
-        Valida a funcionalidade dos elementos interativos do dashboard
+        Valida a funcionalidade dos elementos interativos do dashboard e grava o
+        JavaScript de teste (dashboard_test.js)
         """
+        if dados_dashboard is None:
+            return
         try:
-            print("\n=== Validando Elementos do Dashboard ===")
+            self._exibir("\n=== Validando Elementos do Dashboard ===")
             
             # 1. Validar filtros
             elementos = {
@@ -401,15 +466,15 @@ class AnalisadorInteligente:
             
             for elemento, dados in elementos.items():
                 if not dados:
-                    print(f"⚠️ {elemento}: Sem dados disponíveis")
+                    self._exibir(f"⚠️ {elemento}: Sem dados disponíveis", logging.WARNING)
                 else:
-                    print(f"✓ {elemento}: {len(dados)} opções disponíveis")
+                    self._exibir(f"✓ {elemento}: {len(dados)} opções disponíveis")
             
             # 2. Validar dados para gráficos
             if not dados_dashboard['resumo_status']:
-                print("⚠️ Dados insuficientes para gráficos de status")
+                self._exibir("⚠️ Dados insuficientes para gráficos de status", logging.WARNING)
             else:
-                print(f"✓ Dados de status disponíveis: {len(dados_dashboard['resumo_status'])} categorias")
+                self._exibir(f"✓ Dados de status disponíveis: {len(dados_dashboard['resumo_status'])} categorias")
             
             # 3. Gerar JavaScript de teste
             js_teste = {
@@ -424,10 +489,10 @@ class AnalisadorInteligente:
                 for key, value in js_teste.items():
                     f.write(f"// Teste de {key}\n{value}\n\n")
             
-            print("✓ Arquivo de teste JavaScript gerado: dashboard_test.js")
+            self._exibir("✓ Arquivo de teste JavaScript gerado: dashboard_test.js", logging.INFO)
             
         except Exception as e:
-            print(f"Erro na validação dos elementos: {str(e)}")
+            self._exibir(f"Erro na validação dos elementos: {str(e)}", logging.ERROR)
 
     def gerar_relatorio_txt(self, dados_grupos):
         """Gera um arquivo TXT com todos os relatórios"""
@@ -499,54 +564,99 @@ class AnalisadorInteligente:
                 f.write("-" * 30 + "\n")
                 f.write(f"{'TOTAL GERAL':<20} {total_grupo:>5}\n\n")
         
-        print(f"\nRelatório TXT gerado em: {arquivo_saida}")
+        self._exibir(f"\nRelatório TXT gerado em: {arquivo_saida}", logging.INFO)
         return arquivo_saida
 
-    def executar_analise_completa(self):
-        """Executa o fluxo completo de análise"""
-        print("=== Iniciando Análise Inteligente de Desempenho ===\n")
+    def executar_analise_completa(self, previa=False, somente_metricas=False):
+        """
+        Executa o fluxo completo de análise. Com `previa`, apenas estima a
+        distribuição de status e o ranking a partir de uma amostra (resultado
+        aproximado em resultados_etapas['previa']), sem gerar nem gravar relatórios.
+        Com `somente_metricas`, só as etapas que usam as métricas das abas rodam e
+        os DataFrames não são mantidos na leitura (ver self.manter_dataframes).
+        """
+        self._exibir("=== Iniciando Análise Inteligente de Desempenho ===\n", logging.INFO)
+        
+        # As etapas decidem se os DataFrames das abas precisam ficar em memória
+        manter_dataframes = self.manter_dataframes
+        if manter_dataframes is None:
+            manter_dataframes = previa or not somente_metricas
         
         try:
             # 1. Carregar dados
-            dados_grupos = self.carregar_dados()
+            dados_grupos = self._executar_etapa('carregar_dados', self.carregar_dados, manter_dataframes)
+            
+            if previa:
+                if not manter_dataframes:
+                    self._exibir("⚠️ A prévia precisa dos DataFrames das abas (manter_dataframes=False)",
+                                 logging.ERROR)
+                    return False
+                self.resultados_etapas = {
+                    'dados_grupos': dados_grupos,
+                    'previa': self._executar_etapa('previa', self.gerar_previa, dados_grupos)
+                }
+                self._exibir("\n=== Prévia Concluída (resultados aproximados) ===", logging.INFO)
+                return True
             
             # 2. Validar dados antes de prosseguir
-            if not self.validar_dados_antes_geracao(dados_grupos):
-                print("\n⚠️ Análise interrompida devido a erros na validação!")
+            if not self._executar_etapa('validar_dados', self.validar_dados_antes_geracao, dados_grupos):
+                self._exibir("\n⚠️ Análise interrompida devido a erros na validação!", logging.ERROR)
                 return False
             
-            # 3. Gerar relatório diário
-            self.gerar_relatorio_diario(dados_grupos)
-            
-            # 4. Gerar relatório geral
-            self.gerar_relatorio_geral(dados_grupos)
-            
-            # 5. Gerar relatório de produtividade diária
-            self.gerar_relatorio_produtividade_diaria(dados_grupos)
-            
-            # 6. Gerar relatório TXT
-            self.gerar_relatorio_txt(dados_grupos)
-            
-            # 7. Calcular métricas avançadas
-            df_metricas = self.calcular_metricas_avancadas(dados_grupos)
-            
-            # 8. Gerar ranking de colaboradores
-            df_ranking = self.gerar_ranking_colaboradores(df_metricas)
-            
-            # 9. Identificar melhores práticas
-            melhores_praticas = self.identificar_melhores_praticas(df_ranking, dados_grupos)
-            
-            # 10. Gerar recomendações estratégicas
-            recomendacoes = self.gerar_recomendacoes_estrategicas(df_ranking, dados_grupos)
+            # 3 a 12. Demais etapas, cada uma com as entradas de que depende; as
+            # independentes rodam ao mesmo tempo e as marcadas com cache são
+            # reaproveitadas quando as entradas não mudaram
+            executor = ExecutorEtapas(
+                diretorio_cache=self.obter_diretorio_cache() / 'etapas' if self.cache_etapas else None,
+                max_workers=self.etapas_paralelas,
+                parametros={
+                    'status_especificos': self.status_especificos,
+                    'status_prioritarios': self.status_prioritarios,
+                    'horas_trabalho': self.horas_trabalho,
+                    'parametros_predicao': self.parametros_predicao
+                },
+                notificar=self._notificar_etapa
+            )
+            executor.adicionar('relatorio_diario', self.gerar_relatorio_diario, ['dados_grupos'])
+            executor.adicionar('relatorio_geral', self.gerar_relatorio_geral, ['dados_grupos'])
+            executor.adicionar('produtividade_diaria', self.gerar_relatorio_produtividade_diaria, ['dados_grupos'])
+            if self.gerar_txt:
+                executor.adicionar('relatorio_txt', self.gerar_relatorio_txt, ['dados_grupos'])
+            if manter_dataframes:
+                # Colunas derivadas são calculadas uma vez e compartilhadas pelas etapas seguintes
+                # `dependencias` são os módulos chamados pela etapa: mudanças neles invalidam o
+                # cache dela e das etapas que usam sua saída
+                executor.adicionar('contexto', self.criar_contexto, ['dados_grupos'],
+                                   dependencias=[contexto_analise, status_contratos])
+                executor.adicionar('metricas_avancadas', self.calcular_metricas_avancadas, ['dados_grupos'], cache=True,
+                                   dependencias=[motor_metricas, status_contratos])
+                executor.adicionar('ranking', self.gerar_ranking_colaboradores, ['metricas_avancadas'], cache=True)
+                executor.adicionar('melhores_praticas', self.identificar_melhores_praticas,
+                                   ['ranking', 'dados_grupos', 'contexto'], cache=True)
+                executor.adicionar('recomendacoes', self.gerar_recomendacoes_estrategicas,
+                                   ['ranking', 'dados_grupos', 'contexto'], cache=True)
+                executor.adicionar('relatorio_html', self.gerar_html_responsivo, ['dados_grupos', 'contexto'], cache=True,
+                                   dependencias=[dashboard_json])
+                # Grava arquivo: roda mesmo quando relatorio_html vem do cache
+                executor.adicionar('validar_dashboard', self.validar_elementos_dashboard, ['relatorio_html'])
+                executor.adicionar('dashboard_json', self.gravar_dashboard, ['relatorio_html'])
+                if self.prever_backlog:
+                    executor.adicionar('previsao_backlog', self.atualizar_previsao_backlog, ['contexto'])
+                if self.treinar_modelo:
+                    # Atualizar o modelo de predição usado pela API
+                    executor.adicionar('modelo_predicao', self.treinar_modelo_predicao, ['dados_grupos', 'contexto'])
+            else:
+                self._exibir("Sem os DataFrames das abas: só as etapas de métricas serão executadas "
+                             "(contexto, ranking, dashboard, previsões e modelo ficam de fora)", logging.INFO)
             
-            # 11. Gerar relatório HTML responsivo com os dados completos
-            self.gerar_html_responsivo(dados_grupos)
+            self.resultados_etapas = executor.executar({'dados_grupos': dados_grupos})
+            executor.imprimir_relatorio(lambda linha: self._exibir(linha, logging.INFO))
             
-            print("\n=== Análise Concluída com Sucesso ===")
+            self._exibir("\n=== Análise Concluída com Sucesso ===", logging.INFO)
             return True
             
         except Exception as e:
-            print(f"\nErro durante a análise: {str(e)}")
+            self._exibir(f"\nErro durante a análise: {str(e)}", logging.ERROR)
             traceback.print_exc()
             return False
 
@@ -557,232 +667,534 @@ class AnalisadorInteligente:
                 return diretorio
         raise FileNotFoundError("Nenhum diretório válido encontrado")
 
-    def carregar_dados(self):
-        """Carrega e normaliza dados dos arquivos Excel"""
+    def obter_diretorio_cache(self, diretorio=None):
+        """Diretório do manifesto, do cache de abas, dos agregados e dos modelos"""
+        if self.diretorio_cache:
+            return Path(self.diretorio_cache)
+        return (diretorio or self.encontrar_diretorio()) / '.cache_analise'
+
+    def carregar_dados(self, manter_dataframes=None):
+        """
+        Carrega e normaliza dados dos arquivos Excel. Sem `manter_dataframes`
+        (nem self.manter_dataframes), os DataFrames das abas são mantidos; com
+        False, dados_grupos só traz as métricas de cada aba.
+        """
+        if manter_dataframes is None:
+            manter_dataframes = self.manter_dataframes is not False
         try:
             diretorio = self.encontrar_diretorio()
-            print(f"Diretório de trabalho: {diretorio}")
+            self._exibir(f"Diretório de trabalho: {diretorio}", logging.INFO)
             
-            dados_grupos = {}
+            manifesto = cache = None
+            diretorio_cache = self.obter_diretorio_cache(diretorio)
+            if self.ingestao_incremental:
+                manifesto = ManifestoIngestao(diretorio_cache)
+                cache = CacheAbas(diretorio_cache, self.formato_cache)
             
+            # Abrir cada arquivo para descobrir as abas e o leitor adequado
+            arquivos_validos = []
             for grupo, arquivo in self.arquivos.items():
                 caminho = diretorio / arquivo
-                print(f"\nTentando carregar arquivo: {caminho}")
+                self._exibir(f"\nTentando carregar arquivo: {caminho}")
                 
                 if not caminho.exists():
-                    print(f"Arquivo não encontrado: {caminho}")
+                    self._exibir(f"Arquivo não encontrado: {caminho}", logging.WARNING)
                     continue
                 
-                print(f"\nCarregando dados do grupo {grupo}...")
-                
+                self._exibir(f"\nCarregando dados do grupo {grupo}...", logging.INFO)
                 try:
-                    # Tentar carregar com openpyxl primeiro
+                    entrada = manifesto.consultar(caminho) if manifesto else None
+                    if entrada:
+                        self._exibir("Arquivo sem alterações desde a última leitura")
+                        motor, abas = entrada['motor'], list(entrada['abas'])
+                    else:
+                        motor, abas = self.listar_abas(caminho)
+                        if manifesto:
+                            entrada = manifesto.fingerprint(caminho, motor, abas)
+                    arquivos_validos.append((grupo, caminho, motor, abas, entrada))
+                except Exception as e:
+                    self._exibir(f"Erro ao processar arquivo {arquivo}: {str(e)}", logging.ERROR)
+                    self._exibir("Detalhes do erro:", logging.ERROR)
+                    traceback.print_exc()
+            
+            # Separar as abas que podem vir do cache das que precisam ser lidas
+            abas_em_cache = {}
+            pendentes = []
+            for grupo, caminho, motor, abas, entrada in arquivos_validos:
+                abas_em_cache[grupo] = {}
+                abas_pendentes = []
+                for aba in abas:
+                    encontrada, resultado = self._consultar_cache(cache, entrada, aba, manter_dataframes)
+                    if encontrada:
+                        abas_em_cache[grupo][aba] = resultado
+                    else:
+                        abas_pendentes.append(aba)
+                
+                if abas_em_cache[grupo]:
+                    self._exibir(f"Grupo {grupo}: {len(abas_em_cache[grupo])} abas sem alteração lidas do cache", logging.INFO)
+                    self._notificar_progresso(
+                        'abas_em_cache', arquivo=caminho.name, abas=list(abas_em_cache[grupo])
+                    )
+                if abas_pendentes:
+                    pendentes.append((grupo, caminho, motor, abas_pendentes))
+            
+            # Ler as abas em paralelo apenas quando há mais de um arquivo
+            n_processos = self.processos_ingestao or 1
+            if self.ingestao_paralela and n_processos > 1 and len(pendentes) > 1:
+                resultados = self._ler_arquivos_em_paralelo(pendentes, n_processos, manter_dataframes)
+            else:
+                resultados = {}
+                for grupo, caminho, motor, abas in pendentes:
                     try:
-                        print("Tentando carregar com openpyxl...")
-                        wb = load_workbook(filename=str(caminho), read_only=True, data_only=True)
-                        abas = [aba for aba in wb.sheetnames if aba not in ["TESTE", "RELATÓRIO GERAL"]]
-                        print(f"Abas encontradas: {abas}")
-                        
-                        dados_colaboradores = {}
-                        metricas_colaboradores = {}
-                        
-                        for aba in abas:
-                            try:
-                                print(f"\nProcessando aba: {aba}")
-                                ws = wb[aba]
-                                
-                                # Converter worksheet para DataFrame
-                                data = []
-                                headers = []
-                                first_row = True
-                                
-                                for row in ws.rows:
-                                    if first_row:
-                                        headers = [str(cell.value).strip() if cell.value else f"Col{i}" for i, cell in enumerate(row)]
-                                        first_row = False
-                                    else:
-                                        data.append([cell.value for cell in row])
-                                
-                                df = pd.DataFrame(data, columns=headers)
-                                
-                                if df.empty:
-                                    print(f"Aba {aba} está vazia, pulando...")
-                                    continue
-                                
-                                print(f"Colunas encontradas: {df.columns.tolist()}")
-                                
-                                # Normalizar colunas
-                                df.columns = [self.normalizar_valor(col) for col in df.columns]
-                                print(f"Colunas após normalização: {df.columns.tolist()}")
-                                
-                                # Identificar coluna de status
-                                col_status = next((col for col in df.columns if any(s in col for s in ['SITUACAO', 'STATUS', 'SITUAÇÃO'])), None)
-                                
-                                if col_status:
-                                    print(f"Coluna de status encontrada: {col_status}")
-                                    df = df.rename(columns={col_status: 'STATUS'})
-                                    df['STATUS'] = df['STATUS'].fillna('PENDENTE').astype(str).str.upper().str.strip()
-                                    
-                                    # Mapear status
-                                    mapeamento_status = {
-                                        'VERIFICADO': 'VERIFICADO',
-                                        'ANÁLISE': 'ANÁLISE',
-                                        'ANALISE': 'ANÁLISE',
-                                        'PENDENTE': 'PENDENTE',
-                                        'PRIORIDADE': 'PRIORIDADE',
-                                        'PRIORIDADE TOTAL': 'PRIORIDADE TOTAL',
-                                        'APROVADO': 'APROVADO',
-                                        'APREENDIDO': 'APREENDIDO',
-                                        'CANCELADO': 'CANCELADO',
-                                        'QUITADO': 'QUITADO',
-                                        'OUTROS ACORDOS': 'OUTROS ACORDOS',
-                                        'M.ENCAMINHADA': 'M.ENCAMINHADA'
-                                    }
-                                    df['STATUS'] = df['STATUS'].map(lambda x: mapeamento_status.get(x, x))
-                                    
-                                    # Adicionar data de processamento
-                                    df['DIA'] = pd.to_datetime('today').date()
-                                    
-                                    dados_colaboradores[aba] = df
-                                    
-                                    # Calcular métricas básicas
-                                    status_counts = df['STATUS'].value_counts().to_dict()
-                                    
-                                    # Calcular métricas diárias
-                                    metricas_diarias = {
-                                        'VERIFICADO': 0,
-                                        'ANÁLISE': 0,
-                                        'PENDENTE': 0,
-                                        'PRIORIDADE': 0,
-                                        'PRIORIDADE TOTAL': 0,
-                                        'APROVADO': 0,
-                                        'APREENDIDO': 0,
-                                        'CANCELADO': 0,
-                                        'QUITADO': 0,
-                                        'OUTROS ACORDOS': 0,
-                                        'M.ENCAMINHADA': 0
-                                    }
-                                    metricas_diarias.update(status_counts)
-                                    
-                                    metricas_colaboradores[aba] = {
-                                        'total_registros': len(df),
-                                        'status_counts': status_counts,
-                                        'metricas_diarias': metricas_diarias,
-                                        'produtividade_hora': len(df) / self.horas_trabalho
-                                    }
-                                    
-                                    # Mostrar contagem de status
-                                    print(f"✓ {aba}: {len(df)} registros")
-                                    print("  Status:")
-                                    for status, count in metricas_diarias.items():
-                                        print(f"    {status}: {count}")
-                                else:
-                                    print(f"⚠️ Nenhuma coluna de status encontrada na aba {aba}")
-                                  
-                            except Exception as e:
-                                print(f"✗ Erro ao processar {aba}: {str(e)}")
-                                print("Detalhes do erro:")
-                                traceback.print_exc()
-                                continue
-                        
-                        wb.close()
-                        
+                        resultados[grupo] = self.ler_abas(caminho, motor, abas, manter_dataframes)
                     except Exception as e:
-                        print(f"Erro ao processar com openpyxl: {str(e)}")
-                        print("Tentando com xlrd...")
-                        
-                        # Se falhar com openpyxl, tentar com xlrd
-                        wb = xlrd.open_workbook(str(caminho))
-                        abas = [aba for aba in wb.sheet_names() if aba not in ["TESTE", "RELATÓRIO GERAL"]]
-                        
-                        dados_colaboradores = {}
-                        metricas_colaboradores = {}
-                        
-                        for aba in abas:
-                            try:
-                                ws = wb.sheet_by_name(aba)
-                                headers = [str(ws.cell_value(0, i)).strip() for i in range(ws.ncols)]
-                                data = []
-                                
-                                for row_idx in range(1, ws.nrows):
-                                    row = [ws.cell_value(row_idx, col_idx) for col_idx in range(ws.ncols)]
-                                    data.append(row)
-                                
-                                df = pd.DataFrame(data, columns=headers)
-                                
-                                # Resto do processamento igual ao anterior...
-                                if df.empty:
-                                    continue
-                                    
-                                df.columns = [self.normalizar_valor(col) for col in df.columns]
-                                col_status = next((col for col in df.columns if any(s in col for s in ['SITUACAO', 'STATUS', 'SITUAÇÃO'])), None)
-                                
-                                if col_status:
-                                    df = df.rename(columns={col_status: 'STATUS'})
-                                    df['STATUS'] = df['STATUS'].fillna('PENDENTE').astype(str).str.upper().str.strip()
-                                    
-                                    mapeamento_status = {
-                                        'VERIFICADO': 'VERIFICADO',
-                                        'ANÁLISE': 'ANÁLISE',
-                                        'ANALISE': 'ANÁLISE',
-                                        'PENDENTE': 'PENDENTE',
-                                        'PRIORIDADE': 'PRIORIDADE',
-                                        'PRIORIDADE TOTAL': 'PRIORIDADE TOTAL',
-                                        'APROVADO': 'APROVADO',
-                                        'APREENDIDO': 'APREENDIDO',
-                                        'CANCELADO': 'CANCELADO',
-                                        'QUITADO': 'QUITADO',
-                                        'OUTROS ACORDOS': 'OUTROS ACORDOS',
-                                        'M.ENCAMINHADA': 'M.ENCAMINHADA'
-                                    }
-                                    df['STATUS'] = df['STATUS'].map(lambda x: mapeamento_status.get(x, x))
-                                    
-                                    df['DIA'] = pd.to_datetime('today').date()
-                                    dados_colaboradores[aba] = df
-                                    
-                                    status_counts = df['STATUS'].value_counts().to_dict()
-                                    metricas_diarias = {status: 0 for status in self.status_especificos}
-                                    metricas_diarias.update(status_counts)
-                                    
-                                    metricas_colaboradores[aba] = {
-                                        'total_registros': len(df),
-                                        'status_counts': status_counts,
-                                        'metricas_diarias': metricas_diarias,
-                                        'produtividade_hora': len(df) / self.horas_trabalho
-                                    }
-                                    
-                                    print(f"✓ {aba}: {len(df)} registros")
-                                    for status, count in metricas_diarias.items():
-                                        print(f"    {status}: {count}")
-                            
-                            except Exception as e:
-                                print(f"Erro ao processar {aba} com xlrd: {str(e)}")
-                                continue
+                        self._exibir(f"Erro ao processar arquivo {caminho.name}: {str(e)}", logging.ERROR)
+                        traceback.print_exc()
+            
+            # Consolidar na ordem dos arquivos e das abas
+            dados_grupos = {}
+            for grupo, caminho, _, abas, entrada in arquivos_validos:
+                lidas = {aba: (df, metricas) for aba, df, metricas, _ in resultados.get(grupo, [])}
+                
+                dados_colaboradores = {}
+                metricas_colaboradores = {}
+                for aba in abas:
+                    if aba in abas_em_cache[grupo]:
+                        resultado = abas_em_cache[grupo][aba]
+                    elif aba in lidas:
+                        resultado = lidas[aba]
+                        if manifesto:
+                            self._gravar_cache(cache, manifesto, entrada, aba, resultado)
+                    else:
+                        continue
                     
+                    df, metricas = resultado
+                    if df is not None and manter_dataframes:
+                        dados_colaboradores[aba] = df
+                    if metricas is not None:
+                        metricas_colaboradores[aba] = metricas
+                
+                if manifesto:
+                    manifesto.registrar(caminho, entrada)
+                
+                if abas_em_cache[grupo] or grupo in resultados:
                     dados_grupos[grupo] = {
                         'colaboradores': dados_colaboradores,
                         'metricas': metricas_colaboradores
                     }
-                    
-                except Exception as e:
-                    print(f"Erro ao processar arquivo {arquivo}: {str(e)}")
-                    print("Detalhes do erro:")
-                    traceback.print_exc()
-                    continue
+            
+            if manifesto:
+                manifesto.salvar()
+                cache.limpar(manifesto.digests_em_uso())
             
             if not dados_grupos:
-                print("\nAtenção: Nenhum dado foi carregado!")
+                self._exibir("\nAtenção: Nenhum dado foi carregado!", logging.WARNING)
                 return {}
             
-            print("\nDados carregados com sucesso!")
+            if self.agregados_incrementais:
+                self.atualizar_agregados(diretorio_cache, dados_grupos)
+            
+            if manter_dataframes:
+                self.relatorio_memoria(dados_grupos)
+            
+            self._exibir("\nDados carregados com sucesso!", logging.INFO)
             return dados_grupos
             
         except Exception as e:
-            print(f"\nErro crítico ao carregar dados: {str(e)}")
-            print("Detalhes do erro:")
+            self._exibir(f"\nErro crítico ao carregar dados: {str(e)}", logging.ERROR)
+            self._exibir("Detalhes do erro:", logging.ERROR)
             traceback.print_exc()
             return {}
 
+    def carregar_dados_do_cache(self):
+        """
+        Monta dados_grupos apenas com as abas guardadas no cache, sem abrir as
+        planilhas nem gravar o manifesto. Retorna None se não houver cache ou
+        se algum arquivo mudou desde a última leitura completa.
+        """
+        diretorio = self.encontrar_diretorio()
+        diretorio_cache = self.obter_diretorio_cache(diretorio)
+        manifesto = ManifestoIngestao(diretorio_cache)
+        cache = CacheAbas(diretorio_cache, self.formato_cache)
+
+        dados_grupos = {}
+        for grupo, arquivo in self.arquivos.items():
+            caminho = diretorio / arquivo
+            if not caminho.exists():
+                continue
+            entrada = manifesto.consultar(caminho)
+            if entrada is None:
+                self._exibir(f"Arquivo {arquivo} sem leitura completa em cache", logging.INFO)
+                return None
+
+            dados_colaboradores = {}
+            metricas_colaboradores = {}
+            for aba in entrada['abas']:
+                encontrada, resultado = self._consultar_cache(cache, entrada, aba)
+                if not encontrada:
+                    self._exibir(f"Aba {aba} de {arquivo} não está no cache", logging.INFO)
+                    return None
+                df, metricas = resultado
+                if df is not None:
+                    dados_colaboradores[aba] = df
+                if metricas is not None:
+                    metricas_colaboradores[aba] = metricas
+            dados_grupos[grupo] = {'colaboradores': dados_colaboradores, 'metricas': metricas_colaboradores}
+
+        return dados_grupos or None
+
+    def atualizar_agregados(self, diretorio_cache, dados_grupos):
+        """Aplica ao banco de agregados as variações das abas lidas nesta execução"""
+        try:
+            if self.agregados is None:
+                caminho = Path(self.caminho_agregados) if self.caminho_agregados else diretorio_cache / 'agregados.db'
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                self.agregados = AgregadosIncrementais(caminho)
+            
+            contribuicoes = {
+                (grupo, colaborador): contribuicao(metricas)
+                for grupo, dados in dados_grupos.items()
+                for colaborador, metricas in dados['metricas'].items()
+            }
+            dia = pd.to_datetime('today').date().isoformat()
+            alterados = self.agregados.aplicar(dia, dados_grupos.keys(), contribuicoes)
+            self._exibir(f"Agregados atualizados: {len(alterados)} colaboradores com alterações", logging.INFO)
+        except Exception as e:
+            self._exibir(f"Aviso: não foi possível atualizar os agregados: {str(e)}", logging.WARNING)
+            self.agregados = None
+    
+    def metricas_agregadas(self, dados_grupos):
+        """
+        Métricas por grupo e colaborador lidas do banco de agregados, na ordem das
+        abas; sem o banco, as métricas calculadas na leitura.
+        """
+        if self.agregados is None:
+            return {grupo: dados['metricas'] for grupo, dados in dados_grupos.items()}
+        
+        totais = self.agregados.totais(dados_grupos.keys())
+        vazio = {'total_registros': 0, 'status_counts': {}}
+        return {
+            grupo: {
+                colaborador: self.montar_metricas(
+                    totais.get((grupo, colaborador), vazio)['total_registros'],
+                    totais.get((grupo, colaborador), vazio)['status_counts']
+                )
+                for colaborador in dados['metricas']
+            }
+            for grupo, dados in dados_grupos.items()
+        }
+    
+    def _consultar_cache(self, cache, entrada, aba, manter_dataframes=True):
+        """Retorna (True, (df, metricas)) se a aba não mudou desde a última leitura"""
+        if cache is None:
+            return False, None
+        
+        info = entrada['abas'][aba]
+        if not info.get('processada'):
+            return False, None
+        if info['metricas'] is None:
+            # Aba vazia ou sem coluna de status na última leitura
+            return True, (None, None)
+        if not manter_dataframes:
+            # Só as métricas são necessárias, e elas estão no manifesto
+            return True, (None, info['metricas'])
+        if not cache.contem(info['digest']):
+            return False, None
+        
+        try:
+            df = cache.ler(info['digest'])
+        except Exception as e:
+            self._exibir(f"Aviso: cache da aba {aba} ilegível, relendo: {str(e)}", logging.WARNING)
+            return False, None
+        
+        # A data de processamento é sempre a da execução atual
+        df['DIA'] = pd.Timestamp.today().normalize()
+        return True, (df, info['metricas'])
+
+    def _gravar_cache(self, cache, manifesto, entrada, aba, resultado):
+        """Guarda o DataFrame normalizado da aba e registra suas métricas no manifesto"""
+        df, metricas = resultado
+        try:
+            if df is not None:
+                cache.gravar(entrada['abas'][aba]['digest'], df)
+            manifesto.registrar_aba(entrada, aba, metricas)
+        except Exception as e:
+            self._exibir(f"Aviso: não foi possível gravar o cache da aba {aba}: {str(e)}", logging.WARNING)
+
+    def _ler_arquivos_em_paralelo(self, arquivos_validos, n_processos, manter_dataframes=True):
+        """Distribui lotes de abas de todos os arquivos entre processos"""
+        lotes_por_arquivo = max(1, n_processos // len(arquivos_validos))
+        self._exibir(f"\nLendo {len(arquivos_validos)} arquivos com {n_processos} processos...", logging.INFO)
+        
+        # Os processos não têm o callback: o progresso de cada aba é enviado
+        # aqui, à medida que cada lote termina
+        lotes_por_grupo = {}
+        falhas = set()
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            futuros = {}
+            for grupo, caminho, motor, abas in arquivos_validos:
+                tamanho_lote = max(1, -(-len(abas) // lotes_por_arquivo))
+                lotes = [abas[i:i + tamanho_lote] for i in range(0, len(abas), tamanho_lote)]
+                lotes_por_grupo[grupo] = [None] * len(lotes)
+                for indice, lote in enumerate(lotes):
+                    futuro = executor.submit(self.ler_abas, caminho, motor, lote, manter_dataframes)
+                    futuros[futuro] = (grupo, caminho, indice)
+            
+            for futuro in as_completed(futuros):
+                grupo, caminho, indice = futuros[futuro]
+                try:
+                    lotes_por_grupo[grupo][indice] = futuro.result()
+                except Exception as e:
+                    if grupo not in falhas:
+                        self._exibir(f"Erro ao processar arquivo {caminho.name}: {str(e)}", logging.ERROR)
+                        traceback.print_exc()
+                    falhas.add(grupo)
+                    continue
+                for aba, _, _, leitura in lotes_por_grupo[grupo][indice]:
+                    self._notificar_aba(caminho, aba, leitura)
+                
+                lotes = lotes_por_grupo[grupo]
+                if grupo not in falhas and all(lote is not None for lote in lotes):
+                    abas_lidas = [item for lote in lotes for item in lote]
+                    self._notificar_progresso(
+                        'arquivo_processado', arquivo=caminho.name, abas=len(abas_lidas),
+                        linhas=sum(leitura['linhas'] for *_, leitura in abas_lidas)
+                    )
+        
+        # Na ordem das abas, como na leitura serial
+        return {
+            grupo: [item for lote in lotes for item in lote]
+            for grupo, lotes in lotes_por_grupo.items()
+            if grupo not in falhas
+        }
+
+    def listar_abas(self, caminho):
+        """Retorna o leitor que consegue abrir o arquivo e as abas de colaboradores"""
+        try:
+            self._exibir("Tentando carregar com openpyxl...")
+            wb = load_workbook(filename=str(caminho), read_only=True, data_only=True)
+            abas = [aba for aba in wb.sheetnames if aba not in self.abas_ignoradas]
+            wb.close()
+            motor = 'openpyxl'
+        except Exception as e:
+            self._exibir(f"Erro ao processar com openpyxl: {str(e)}", logging.WARNING)
+            self._exibir("Tentando com xlrd...")
+            wb = xlrd.open_workbook(str(caminho), on_demand=True)
+            abas = [aba for aba in wb.sheet_names() if aba not in self.abas_ignoradas]
+            wb.release_resources()
+            motor = 'xlrd'
+        
+        self._exibir(f"Abas encontradas: {abas}")
+        return motor, abas
+
+    def ler_abas(self, caminho, motor, abas, manter_dataframes=True):
+        """
+        Lê e normaliza as abas indicadas de um arquivo, abrindo-o uma única vez.
+        Retorna uma lista (aba, df, metricas, leitura) na ordem das abas; df e
+        metricas são None para abas vazias ou sem coluna de status (df também na
+        leitura em blocos sem `manter_dataframes`) e leitura traz as linhas e os
+        segundos da aba, para o progresso de quem leu em outro processo.
+        """
+        if motor == 'openpyxl':
+            wb = load_workbook(filename=str(caminho), read_only=True, data_only=True)
+            ler_linhas = lambda aba: wb[aba].iter_rows(values_only=True)
+            fechar = wb.close
+            formatar = formatar_cabecalho
+        else:
+            wb = xlrd.open_workbook(str(caminho), on_demand=True)
+            def ler_linhas(aba):
+                ws = wb.sheet_by_name(aba)
+                return (ws.row_values(row_idx) for row_idx in range(ws.nrows))
+            fechar = wb.release_resources
+            # Como antes da leitura colunar: no xlrd, cabeçalhos vazios continuam vazios
+            formatar = formatar_cabecalho_xlrd
+        
+        resultados = []
+        try:
+            for aba in abas:
+                try:
+                    self._exibir(f"\nProcessando aba: {aba}")
+                    inicio = time.perf_counter()
+                    
+                    if self.linhas_por_bloco:
+                        resultado = self.processar_aba_em_blocos(aba, ler_linhas(aba), manter_dataframes, formatar)
+                    else:
+                        # Converter worksheet para DataFrame lendo em fluxo por colunas
+                        df = ler_colunas(ler_linhas(aba), self.tamanho_bloco_leitura, formatar)
+                        resultado = self.processar_aba(aba, df)
+                    leitura = {
+                        'linhas': resultado[1]['total_registros'] if resultado else 0,
+                        'segundos': time.perf_counter() - inicio
+                    }
+                    resultados.append((aba,) + (resultado or (None, None)) + (leitura,))
+                    self._notificar_aba(caminho, aba, leitura)
+                
+                except Exception as e:
+                    self._exibir(f"✗ Erro ao processar {aba}: {str(e)}", logging.ERROR)
+                    self._exibir("Detalhes do erro:", logging.ERROR)
+                    traceback.print_exc()
+                    continue
+        finally:
+            fechar()
+        
+        return resultados
+
+    def processar_aba(self, aba, df):
+        """Normaliza o DataFrame de uma aba e calcula suas métricas básicas"""
+        if df.empty:
+            self._exibir(f"Aba {aba} está vazia, pulando...")
+            return None
+        
+        df = self.normalizar_aba(aba, df)
+        if df is None:
+            return None
+        
+        metricas = self.montar_metricas(len(df), contar_status(df['STATUS']), somar_tempo_por_status(df))
+        df = self._compactar(df, metricas)
+        self._mostrar_metricas(aba, metricas)
+        return df, metricas
+    
+    def processar_aba_em_blocos(self, aba, linhas, manter_dataframes=True, formatar=formatar_cabecalho):
+        """
+        Processa a aba em blocos de self.linhas_por_bloco linhas, acumulando as
+        métricas a cada bloco. Sem `manter_dataframes` cada bloco é descartado
+        depois de contado e o retorno é (None, metricas); com ele, os blocos são
+        guardados e concatenados, então a memória volta a crescer com a aba.
+        """
+        total = 0
+        contagem = Counter()
+        tempo_status = {}
+        blocos = []
+        for i, bloco in enumerate(ler_colunas_em_blocos(linhas, self.linhas_por_bloco, formatar)):
+            df = self.normalizar_aba(aba, bloco, detalhar=(i == 0))
+            if df is None:
+                return None
+            
+            total += len(df)
+            contagem.update(contar_status(df['STATUS']))
+            acumular_tempo_por_status(tempo_status, somar_tempo_por_status(df))
+            if manter_dataframes:
+                blocos.append(df)
+        
+        if total == 0:
+            self._exibir(f"Aba {aba} está vazia, pulando...")
+            return None
+        
+        df = None
+        if blocos:
+            # Tipos inferidos sobre a aba inteira, como na leitura sem blocos
+            df = concatenar_blocos(blocos)
+            # Os blocos podem ter categorias de status diferentes
+            df['STATUS'] = normalizar_status(df['STATUS'])
+        
+        status_counts = dict(sorted(contagem.items(), key=lambda item: -item[1]))
+        metricas = self.montar_metricas(total, status_counts, tempo_status)
+        if df is not None:
+            df = self._compactar(df, metricas)
+        self._mostrar_metricas(aba, metricas)
+        return df, metricas
+    
+    def normalizar_aba(self, aba, df, detalhar=True):
+        """Normaliza colunas e status; retorna None se a aba não tiver coluna de status"""
+        detalhar = detalhar and self._detalhar()
+        if detalhar:
+            self._exibir(f"Colunas encontradas: {df.columns.tolist()}")
+        
+        # Normalizar colunas
+        df.columns = [self.normalizar_valor(col) for col in df.columns]
+        if detalhar:
+            self._exibir(f"Colunas após normalização: {df.columns.tolist()}")
+        
+        # Identificar coluna de status
+        col_status = next((col for col in df.columns if any(s in col for s in ['SITUACAO', 'STATUS', 'SITUAÇÃO'])), None)
+        
+        if not col_status:
+            self._exibir(f"⚠️ Nenhuma coluna de status encontrada na aba {aba}", logging.WARNING)
+            return None
+        
+        if detalhar:
+            self._exibir(f"Coluna de status encontrada: {col_status}")
+        df = df.rename(columns={col_status: 'STATUS'})
+        
+        # Mapear status para o vocabulário comum (coluna categórica)
+        df['STATUS'] = normalizar_status(df['STATUS'], padrao='PENDENTE')
+        
+        # Adicionar data de processamento
+        df['DIA'] = pd.Timestamp.today().normalize()
+        return df
+    
+    def montar_metricas(self, total_registros, status_counts, tempo_status=None):
+        """
+        Monta as métricas básicas de uma aba a partir do total e da contagem de
+        status; `tempo_status` traz {status: [soma, quantidade]} dos tempos de processamento
+        """
+        # Calcular métricas diárias
+        metricas_diarias = {status: 0 for status in self.status_especificos}
+        metricas_diarias.update(status_counts)
+        
+        return {
+            'total_registros': total_registros,
+            'status_counts': status_counts,
+            'metricas_diarias': metricas_diarias,
+            'produtividade_hora': total_registros / self.horas_trabalho,
+            'tempo_status': tempo_status or {}
+        }
+    
+    def _compactar(self, df, metricas):
+        """Compacta os tipos da aba e guarda em metricas['memoria'] os bytes antes e depois"""
+        if not self.compactar_tipos:
+            return df
+        antes = memoria_bytes(df)
+        df = compactar_dataframe(df)
+        metricas['memoria'] = {'antes': antes, 'depois': memoria_bytes(df)}
+        return df
+    
+    def relatorio_memoria(self, dados_grupos):
+        """
+        Memória das abas antes e depois da compactação dos tipos:
+        {grupo: {aba: {'antes': bytes, 'depois': bytes}}}
+        """
+        resultado = {
+            grupo: {
+                aba: metricas['memoria']
+                for aba, metricas in dados['metricas'].items()
+                if 'memoria' in metricas
+            }
+            for grupo, dados in dados_grupos.items()
+        }
+        antes = sum(m['antes'] for abas in resultado.values() for m in abas.values())
+        depois = sum(m['depois'] for abas in resultado.values() for m in abas.values())
+        if not antes:
+            return resultado
+        
+        def reducao(memoria):
+            return (1 - memoria['depois'] / memoria['antes']) * 100 if memoria['antes'] else 0
+        
+        if self._detalhar():
+            exibir = self._exibir
+            exibir("\n=== Memória das Abas (compactação de tipos) ===")
+            exibir(f"{'GRUPO':<12} {'ABA':<24} {'ANTES (KB)':>11} {'DEPOIS (KB)':>12} {'REDUÇÃO':>8}")
+            for grupo, abas in resultado.items():
+                for aba, memoria in abas.items():
+                    exibir(f"{grupo:<12} {aba:<24} {memoria['antes'] / 1024:>11.1f} "
+                           f"{memoria['depois'] / 1024:>12.1f} {reducao(memoria):>7.1f}%")
+                subtotal = {k: sum(m[k] for m in abas.values()) for k in ('antes', 'depois')}
+                if subtotal['antes']:
+                    exibir(f"{grupo:<12} {'(total do grupo)':<24} {subtotal['antes'] / 1024:>11.1f} "
+                           f"{subtotal['depois'] / 1024:>12.1f} {reducao(subtotal):>7.1f}%")
+        log.info("Memória das abas: %.1f MB -> %.1f MB (%.1f%% menor)",
+                 antes / 1024 ** 2, depois / 1024 ** 2, reducao({'antes': antes, 'depois': depois}))
+        return resultado
+    
+    def _mostrar_metricas(self, aba, metricas):
+        if not self._detalhar():
+            return
+        # Mostrar contagem de status
+        self._exibir(f"✓ {aba}: {metricas['total_registros']} registros")
+        self._exibir("  Status:")
+        for status, count in metricas['metricas_diarias'].items():
+            self._exibir(f"    {status}: {count}")
+
     def normalizar_valor(self, valor):
         if isinstance(valor, (int, float)):
             return str(valor)
@@ -792,144 +1204,222 @@ class AnalisadorInteligente:
             return str(valor)
 
     def gerar_relatorio_diario(self, dados_grupos):
-        """Gera relatório diário com contagem de status específicos"""
-        print("\n=== Relatório Diário ===")
-        
-        for grupo, dados in dados_grupos.items():
-            print(f"\nGrupo: {grupo.upper()}")
-            
-            for colaborador, metricas in dados['metricas'].items():
-                print(f"\n{colaborador}:")
-                print("  RELATÓRIO DIÁRIO")
-                print("  " + "-" * 30)
-                for status in self.status_especificos:
-                    count = metricas['metricas_diarias'].get(status, 0)
-                    print(f"  {status:<20} {count:>5}")
-                print("  " + "-" * 30)
-                print(f"  {'TOTAL':<20} {metricas['total_registros']:>5}")
-                print()
+        """
+        Contagem dos status específicos por colaborador:
+        {grupo: {colaborador: {'status': {status: quantidade}, 'total': n}}}
+        """
+        resultado = {
+            grupo: {
+                colaborador: {
+                    'status': {status: metricas['metricas_diarias'].get(status, 0) for status in self.status_especificos},
+                    'total': metricas['total_registros']
+                }
+                for colaborador, metricas in dados['metricas'].items()
+            }
+            for grupo, dados in dados_grupos.items()
+        }
+        log.info("Relatório diário: %d colaboradores", sum(len(c) for c in resultado.values()))
+        
+        if self._detalhar():
+            exibir = self._exibir
+            exibir("\n=== Relatório Diário ===")
+            for grupo, colaboradores in resultado.items():
+                exibir(f"\nGrupo: {grupo.upper()}")
+                
+                for colaborador, relatorio in colaboradores.items():
+                    exibir(f"\n{colaborador}:")
+                    exibir("  RELATÓRIO DIÁRIO")
+                    exibir("  " + "-" * 30)
+                    for status, count in relatorio['status'].items():
+                        exibir(f"  {status:<20} {count:>5}")
+                    exibir("  " + "-" * 30)
+                    exibir(f"  {'TOTAL':<20} {relatorio['total']:>5}")
+                    exibir()
+        return resultado
 
     def gerar_relatorio_geral(self, dados_grupos):
-        """Gera relatório geral com totais por status e colaborador"""
-        print("\n=== Relatório Geral ===")
-        
+        """
+        Totais por status e colaborador, por grupo e consolidados:
+        {'grupos': {grupo: {'colaboradores': {...}, 'status': {...}, 'total': n}},
+         'status': {...}, 'total': n}
+        """
         totais_gerais = {status: 0 for status in self.status_especificos}
         total_geral_registros = 0
+        grupos = {}
         
-        for grupo, dados in dados_grupos.items():
-            print(f"\nGrupo: {grupo.upper()}")
-            
+        for grupo, metricas_grupo in self.metricas_agregadas(dados_grupos).items():
             totais_grupo = {status: 0 for status in self.status_especificos}
             total_grupo_registros = 0
+            colaboradores = {}
             
-            # Exibir dados por colaborador
-            for colaborador, metricas in dados['metricas'].items():
-                print(f"\n{colaborador}:")
-                print("  RELATÓRIO GERAL")
-                print("  " + "-" * 30)
-                
-                for status in self.status_especificos:
-                    count = metricas['status_counts'].get(status, 0)
+            for colaborador, metricas in metricas_grupo.items():
+                contagem = {status: metricas['status_counts'].get(status, 0) for status in self.status_especificos}
+                for status, count in contagem.items():
                     totais_grupo[status] += count
                     totais_gerais[status] += count
-                    print(f"  {status:<20} {count:>5}")
                 
-                print("  " + "-" * 30)
                 total_colaborador = metricas['total_registros']
                 total_grupo_registros += total_colaborador
                 total_geral_registros += total_colaborador
-                print(f"  {'TOTAL':<20} {total_colaborador:>5}")
-                print()
+                colaboradores[colaborador] = {'status': contagem, 'total': total_colaborador}
+            
+            grupos[grupo] = {'colaboradores': colaboradores, 'status': totais_grupo, 'total': total_grupo_registros}
+        
+        resultado = {'grupos': grupos, 'status': totais_gerais, 'total': total_geral_registros}
+        log.info("Relatório geral: %d registros em %d grupos", total_geral_registros, len(grupos))
+        
+        if self._detalhar():
+            self._exibir_relatorio_geral(resultado)
+        return resultado
+    
+    def _exibir_relatorio_geral(self, resultado):
+        exibir = self._exibir
+        exibir("\n=== Relatório Geral ===")
+        
+        for grupo, dados in resultado['grupos'].items():
+            exibir(f"\nGrupo: {grupo.upper()}")
+            
+            # Exibir dados por colaborador
+            for colaborador, relatorio in dados['colaboradores'].items():
+                exibir(f"\n{colaborador}:")
+                exibir("  RELATÓRIO GERAL")
+                exibir("  " + "-" * 30)
+                for status, count in relatorio['status'].items():
+                    exibir(f"  {status:<20} {count:>5}")
+                exibir("  " + "-" * 30)
+                exibir(f"  {'TOTAL':<20} {relatorio['total']:>5}")
+                exibir()
             
             # Exibir totais do grupo
-            print(f"\nTOTAL DO GRUPO {grupo.upper()}:")
-            print("  " + "-" * 30)
-            for status, total in totais_grupo.items():
-                print(f"  {status:<20} {total:>5}")
-            print("  " + "-" * 30)
-            print(f"  {'TOTAL GERAL':<20} {total_grupo_registros:>5}")
+            exibir(f"\nTOTAL DO GRUPO {grupo.upper()}:")
+            exibir("  " + "-" * 30)
+            for status, total in dados['status'].items():
+                exibir(f"  {status:<20} {total:>5}")
+            exibir("  " + "-" * 30)
+            exibir(f"  {'TOTAL GERAL':<20} {dados['total']:>5}")
         
         # Exibir totais gerais
-        print("\n=== TOTAIS CONSOLIDADOS ===")
-        print("-" * 30)
-        for status, total in totais_gerais.items():
-            print(f"{status:<20} {total:>5}")
-        print("-" * 30)
-        print(f"{'TOTAL GERAL':<20} {total_geral_registros:>5}")
-        
-        print("\nRelatório geral concluído!")
+        exibir("\n=== TOTAIS CONSOLIDADOS ===")
+        exibir("-" * 30)
+        for status, total in resultado['status'].items():
+            exibir(f"{status:<20} {total:>5}")
+        exibir("-" * 30)
+        exibir(f"{'TOTAL GERAL':<20} {resultado['total']:>5}")
+        
+        exibir("\nRelatório geral concluído!")
 
-    def gerar_relatorio_produtividade_diaria(self, dados_grupos):
-        """Gera relatório de produtividade diária por colaborador"""
-        print("\n=== Relatório de Produtividade Diária ===")
+    def gerar_previa(self, dados_grupos):
+        """Distribuição de status e ranking estimados a partir de uma amostra de cada colaborador"""
+        amostra, tamanhos = amostrar_abas(dados_grupos, self.fracao_previa, self.minimo_previa, self.semente_previa)
+        previa = estimar_previa(
+            amostra, tamanhos, self.horas_trabalho, self.confianca_previa, self.fracao_previa, self.minimo_previa
+        )
+        if previa['amostra']:
+            log.info("Prévia aproximada: %d de %d registros amostrados",
+                     previa['amostra']['registros_amostrados'], previa['amostra']['registros_total'])
+        if self._detalhar():
+            self._exibir_previa(previa)
+        return previa
+    
+    def _exibir_previa(self, previa):
+        exibir = self._exibir
+        exibir("\n=== PRÉVIA APROXIMADA ===")
+        exibir(previa['aviso'])
+        if not previa['amostra']:
+            return
+        amostra = previa['amostra']
+        exibir(f"Amostra: {amostra['registros_amostrados']} de {amostra['registros_total']} registros "
+               f"| intervalos de {amostra['confianca']:.0%} de confiança")
         
-        for grupo, dados in dados_grupos.items():
-            print(f"\nGrupo: {grupo.upper()}")
-            
-            for colaborador, metricas in dados['metricas'].items():
+        exibir(f"\n{'STATUS':<20} {'ESTIMATIVA':>10}  INTERVALO")
+        exibir("-" * 50)
+        for status, estimativa in previa['status'].items():
+            exibir(f"{status:<20} {estimativa['estimativa']:>10.0f}  "
+                   f"{estimativa['minimo']:.0f} a {estimativa['maximo']:.0f} (~{estimativa['percentual']:.1f}%)")
+        
+        exibir(f"\n{'#':>3} {'COLABORADOR':<20} {'GRUPO':<12} {'SCORE':>8}  INTERVALO")
+        exibir("-" * 64)
+        for linha in previa['ranking']:
+            exibir(f"{linha['posicao']:>3} {linha['colaborador']:<20} {linha['grupo']:<12} "
+                   f"{linha['score_eficiencia']:>8.2f}  {linha['score_minimo']:.2f} a {linha['score_maximo']:.2f}")
+    
+    def gerar_relatorio_produtividade_diaria(self, dados_grupos):
+        """
+        Produtividade por colaborador: {grupo: {colaborador: {'produtividade_diaria',
+        'produtividade_hora', 'prioritarios', 'eficiencia'}}}
+        """
+        resultado = {}
+        for grupo, metricas_grupo in self.metricas_agregadas(dados_grupos).items():
+            resultado[grupo] = {}
+            for colaborador, metricas in metricas_grupo.items():
                 # Calcular produtividade por hora
                 prod_hora = metricas['produtividade_hora']
-                prod_diaria = prod_hora * self.horas_trabalho
                 
                 # Calcular produtividade por status
                 status_counts = metricas['status_counts']
-                status_prioritarios = {s: status_counts.get(s, 0) for s in self.status_prioritarios}
-                total_prioritarios = sum(status_prioritarios.values())
+                total_prioritarios = sum(status_counts.get(s, 0) for s in self.status_prioritarios)
                 
-                # Exibir resultados
-                print(f"\n{colaborador}:")
-                print(f"  Produtividade diária: {prod_diaria:.1f} registros/dia")
-                print(f"  Produtividade horária: {prod_hora:.2f} registros/hora")
-                print(f"  Status prioritários ({', '.join(self.status_prioritarios)}): {total_prioritarios}")
-                print(f"  Eficiência: {(total_prioritarios/metricas['total_registros']*100 if metricas['total_registros'] > 0 else 0):.1f}%")
-        
-        print("\nRelatório de produtividade concluído!")
-
-    def treinar_modelo_predicao(self, dados_grupos):
-        """Treina modelo de machine learning para prever probabilidade de aprovação de contratos"""
-        # Preparar dados para treinamento
-        X_data = []
-        y_data = []
-        
-        for grupo, dados in dados_grupos.items():
-            for colaborador, df in dados['colaboradores'].items():
-                if df.empty:
-                    continue
+                resultado[grupo][colaborador] = {
+                    'produtividade_diaria': prod_hora * self.horas_trabalho,
+                    'produtividade_hora': prod_hora,
+                    'prioritarios': total_prioritarios,
+                    'eficiencia': (total_prioritarios / metricas['total_registros'] * 100
+                                   if metricas['total_registros'] > 0 else 0)
+                }
+        log.info("Relatório de produtividade: %d colaboradores", sum(len(c) for c in resultado.values()))
+        
+        if self._detalhar():
+            exibir = self._exibir
+            exibir("\n=== Relatório de Produtividade Diária ===")
+            for grupo, colaboradores in resultado.items():
+                exibir(f"\nGrupo: {grupo.upper()}")
                 
-                # Extrair features
-                for _, row in df.iterrows():
-                    features = []
-                    
-                    # Adicionar features numéricas
-                    if 'TEMPO_PROCESSAMENTO' in df.columns:
-                        features.append(row.get('TEMPO_PROCESSAMENTO', 0))
-                    else:
-                        features.append(0)
-                    
-                    # Adicionar hora do dia (se disponível)
-                    if 'HORA' in df.columns:
-                        features.append(pd.to_datetime(row['HORA']).hour)
-                    else:
-                        features.append(12)  # valor padrão
-                    
-                    # Adicionar dia da semana (se disponível)
-                    if 'DIA' in df.columns:
-                        features.append(pd.to_datetime(row['DIA']).weekday())
-                    else:
-                        features.append(0)
-                    
-                    # Target: 1 se aprovado/quitado, 0 caso contrário
-                    status = row.get('STATUS', '')
-                    y_data.append(1 if status in self.status_prioritarios else 0)
-                    X_data.append(features)
+                for colaborador, produtividade in colaboradores.items():
+                    exibir(f"\n{colaborador}:")
+                    exibir(f"  Produtividade diária: {produtividade['produtividade_diaria']:.1f} registros/dia")
+                    exibir(f"  Produtividade horária: {produtividade['produtividade_hora']:.2f} registros/hora")
+                    exibir(f"  Status prioritários ({', '.join(self.status_prioritarios)}): {produtividade['prioritarios']}")
+                    exibir(f"  Eficiência: {produtividade['eficiencia']:.1f}%")
+            
+            exibir("\nRelatório de produtividade concluído!")
+        return resultado
+
+    def registro_modelos(self):
+        diretorio = Path(self.diretorio_modelos) if self.diretorio_modelos else self.obter_diretorio_cache() / 'modelos'
+        return RegistroModelos(diretorio)
+    
+    def treinar_modelo_predicao(self, dados_grupos, contexto=None):
+        """
+        Treina modelo de machine learning para prever probabilidade de aprovação de contratos.
         
-        if not X_data or not y_data:
+        Se os dados de treino forem os mesmos de um modelo registrado, ele é
+        carregado do disco. O treino em segundo plano é o da importação
+        (tarefas_importacao): o servidor continua com o modelo atual e carrega o
+        novo do registro quando a tarefa termina.
+        """
+        # Preparar dados para treinamento: uma linha por contrato de todas as abas
+        if contexto is None:
+            contexto = self.criar_contexto(dados_grupos)
+        X, y = montar_features_contexto(contexto)
+        
+        if len(X) == 0:
             return None
         
-        # Converter para arrays numpy
-        X = np.array(X_data)
-        y = np.array(y_data)
+        fingerprint = fingerprint_treino(X, y, repr(self.parametros_predicao))
+        atual = self.modelos.get('predicao')
+        if atual is not None and atual.get('fingerprint') == fingerprint:
+            return atual['model']
+        
+        salvo = self.registro_modelos().carregar('predicao', fingerprint)
+        if salvo is not None:
+            self.modelos['predicao'] = salvo
+            self._exibir(f"\nModelo de predição carregado do registro (acurácia {salvo['accuracy']:.2%})", logging.INFO)
+            return salvo['model']
         
+        return self._treinar_predicao(X, y, fingerprint)['model']
+    
+    def _treinar_predicao(self, X, y, fingerprint):
+        """Treina o RandomForest com todos os núcleos, substitui o modelo atual e o registra"""
         # Normalizar features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
@@ -940,12 +1430,7 @@ class AnalisadorInteligente:
         )
         
         # Treinar modelo
-        model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=None,
-            min_samples_split=2,
-            random_state=42
-        )
+        model = RandomForestClassifier(**self.parametros_predicao, n_jobs=-1)
         
         model.fit(X_train, y_train)
         
@@ -953,44 +1438,84 @@ class AnalisadorInteligente:
         y_pred = model.predict(X_test)
         accuracy = (y_pred == y_test).mean()
         
-        print("\n=== Modelo de Predição de Aprovação ===")
-        print(f"Acurácia do modelo: {accuracy:.2%}")
+        self._exibir("\n=== Modelo de Predição de Aprovação ===")
+        self._exibir(f"Acurácia do modelo: {accuracy:.2%}", logging.INFO)
         
         # Salvar modelo e scaler
-        self.modelos['predicao'] = {
+        modelo = {
             'model': model,
             'scaler': scaler,
             'accuracy': accuracy,
-            'features': ['tempo_processamento', 'hora_dia', 'dia_semana']
+            'features': FEATURES_PREDICAO,
+            'fingerprint': fingerprint,
+            'treinado_em': datetime.now().isoformat()
         }
+        self.modelos['predicao'] = modelo
         
-        return model
-
+        try:
+            self.registro_modelos().salvar('predicao', fingerprint, modelo)
+        except Exception as e:
+            self._exibir(f"Aviso: não foi possível registrar o modelo de predição: {str(e)}", logging.WARNING)
+        
+        return modelo
+    
+    def carregar_modelo_predicao(self):
+        """Carrega o último modelo registrado, sem depender dos dados (por exemplo, ao iniciar o servidor)"""
+        modelo = self.registro_modelos().ultimo('predicao')
+        if modelo is not None:
+            self.modelos['predicao'] = modelo
+        return modelo
+    
     def prever_aprovacao(self, tempo_processamento, hora_dia=None, dia_semana=None):
         """Prevê a probabilidade de aprovação de um contrato"""
-        if 'predicao' not in self.modelos:
-            return None
-            
-        modelo = self.modelos['predicao']
-        
-        # Preparar features
-        features = [
+        X = np.array([[
             tempo_processamento,
-            hora_dia if hora_dia is not None else 12,
-            dia_semana if dia_semana is not None else 0
-        ]
-        
-        # Normalizar features
-        X = modelo['scaler'].transform([features])
+            hora_dia if hora_dia is not None else PADRAO_HORA,
+            dia_semana if dia_semana is not None else PADRAO_DIA_SEMANA
+        ]], dtype=float)
         
-        # Fazer predição
-        prob = modelo['model'].predict_proba(X)[0]
+        probabilidades = self.prever_aprovacao_lote(X)
+        if probabilidades is None:
+            return None
         
         return {
-            'probabilidade_aprovacao': prob[1],
-            'confianca_modelo': modelo['accuracy']
+            'probabilidade_aprovacao': probabilidades[0],
+            'confianca_modelo': self.modelos['predicao']['accuracy']
         }
-
+    
+    def prever_aprovacao_lote(self, X):
+        """
+        Probabilidades de aprovação de vários contratos. `X` é a matriz de
+        montar_features (ou um DataFrame com as colunas das abas).
+        """
+        if 'predicao' not in self.modelos:
+            return None
+        
+        modelo = self.modelos['predicao']
+        if isinstance(X, pd.DataFrame):
+            X = montar_features(X)
+        if len(X) == 0:
+            return np.empty(0)
+        
+        return modelo['model'].predict_proba(modelo['scaler'].transform(X))[:, 1]
+    
+    def atualizar_previsao_backlog(self, contexto):
+        """Previsão de pendentes dos próximos dias no banco do dashboard, servida em /api/previsao-backlog"""
+        resultado = gerar_previsao_backlog(
+            contexto, self.obter_caminho_db(), self.parametros_backlog,
+            self.horizonte_backlog, self.status_pendentes
+        )
+        if resultado is None:
+            self._exibir("⚠️ Histórico insuficiente para prever os pendentes", logging.WARNING)
+        elif resultado['reaproveitada']:
+            self._exibir(f"Previsão de pendentes sem alterações nos dados (versão {resultado['versao'][:12]})", logging.INFO)
+        else:
+            self._exibir(
+                f"Previsão de pendentes para {self.horizonte_backlog} dias gravada ({resultado['linhas']} linhas)",
+                logging.INFO
+            )
+        return resultado
+    
     def validar_dados_antes_geracao(self, dados_grupos):
         """
         Valida os dados antes de gerar relatórios, tratando status faltantes de forma inteligente.
@@ -1078,27 +1603,43 @@ class AnalisadorInteligente:
             traceback.print_exc()
             return False
 
+    def obter_caminho_db(self):
+        """Caminho do banco do dashboard"""
+        if self.caminho_db:
+            return Path(self.caminho_db)
+        return self.encontrar_diretorio() / 'relatorio_dashboard.db'
+
     def exportar_para_sqlite(self, dados_grupos=None):
-        """Exporta os dados para um banco de dados SQLite"""
+        """
+        Exporta as métricas por colaborador para o banco do dashboard. Usa os dados
+        da última análise (ou `dados_grupos`); sem eles, os totais do banco de
+        agregados ou, por último, o relatório TXT.
+        """
         try:
             print("\n=== Exportando dados para SQLite ===")
             
             # Criar instância do gerenciador de banco de dados
-            db_manager = RelatorioDatabase()
-            
-            # Verificar se já existe relatório gerado
-            relatorio_path = Path('F:/relatoriotest/relatorio_completo.txt')
-            if relatorio_path.exists():
-                print(f"Importando dados do relatório: {relatorio_path}")
-                if db_manager.importar_relatorio_txt(relatorio_path):
-                    print("✓ Dados exportados com sucesso!")
-                    return True
-                else:
-                    print("✗ Falha ao importar relatório.")
+            db_manager = RelatorioDatabase(self.obter_caminho_db(), self.horas_trabalho)
+            
+            if dados_grupos is None:
+                dados_grupos = self.resultados_etapas.get('dados_grupos')
+            if dados_grupos:
+                exportado = db_manager.exportar_metricas(self.metricas_agregadas(dados_grupos))
+            elif self.agregados is not None:
+                exportado = db_manager.importar_agregados(self.agregados.totais())
+            else:
+                relatorio_path = self.encontrar_diretorio() / 'relatorio_completo.txt'
+                if not relatorio_path.exists():
+                    print("✗ Nenhum dado carregado e arquivo de relatório não encontrado.")
                     return False
+                print(f"Importando dados do relatório: {relatorio_path}")
+                exportado = db_manager.importar_relatorio_txt(relatorio_path)
+            
+            if exportado:
+                print("✓ Dados exportados com sucesso!")
             else:
-                print("✗ Arquivo de relatório não encontrado.")
-                return False
+                print("✗ Falha ao exportar dados.")
+            return exportado
         
         except Exception as e:
             print(f"Erro ao exportar para SQLite: {str(e)}")
@@ -1111,42 +1652,27 @@ class AnalisadorInteligente:
             print("\n=== Gerando Dashboard a partir do SQLite ===")
             
             # Conectar ao banco de dados
-            db_path = "F:/relatoriotest/relatorio_dashboard.db"
+            db_path = self.obter_caminho_db()
             conn = sqlite3.connect(db_path)
             
-            # Consultas SQL otimizadas
-            query_status = """
-            SELECT 
-                SUM(verificado) as verificado,
-                SUM(analise) as analise,
-                SUM(pendente) as pendente,
-                SUM(prioridade) as prioridade,
-                SUM(prioridade_total) as prioridade_total,
-                SUM(aprovado) as aprovado,
-                SUM(apreendido) as apreendido,
-                SUM(cancelado) as cancelado
-            FROM relatorio_geral
-            """
-            
-            # Executar consultas
-            df_status = pd.read_sql_query(query_status, conn)
-            
-            # Verificar se há dados válidos e substituir NaN por 0
-            df_status = df_status.fillna(0)
+            # Histórico lido em blocos e somado por colaborador
+            resumo = resumo_historico(
+                conn, RelatorioDatabase.COLUNAS_STATUS.values(),
+                tamanho_bloco=self.tamanho_bloco_consulta, medir_memoria=True
+            )
+            for nome, medida in resumo['consultas'].items():
+                print(descrever_medida(nome, medida))
+            df_status = pd.DataFrame([resumo['status']])
+            df_metricas = resumo['colaboradores']
             
             # Gerar gráfico de pizza
             plt.figure(figsize=(10, 6))
             status_labels = ['Verificado', 'Análise', 'Pendente', 'Prioridade', 
                              'Prioridade Total', 'Aprovado', 'Apreendido', 'Cancelado']
             status_values = [
-                df_status['verificado'].iloc[0], 
-                df_status['analise'].iloc[0],
-                df_status['pendente'].iloc[0], 
-                df_status['prioridade'].iloc[0],
-                df_status['prioridade_total'].iloc[0], 
-                df_status['aprovado'].iloc[0],
-                df_status['apreendido'].iloc[0], 
-                df_status['cancelado'].iloc[0]
+                resumo['status'].get(coluna, 0)
+                for coluna in ['verificado', 'analise', 'pendente', 'prioridade',
+                               'prioridade_total', 'aprovado', 'apreendido', 'cancelado']
             ]
             
             # Verificar se há pelo menos um valor não zero
@@ -1158,8 +1684,20 @@ class AnalisadorInteligente:
                 plt.text(0.5, 0.5, 'Sem dados disponíveis', 
                         horizontalalignment='center', verticalalignment='center')
                 plt.axis('off')
-            
-            # Resto do código permanece igual...
+            buffer_pizza = BytesIO()
+            plt.savefig(buffer_pizza, format='png')
+            plt.close()
+            
+            # Gráfico de eficiência média dos 10 melhores colaboradores
+            plt.figure(figsize=(12, 6))
+            top10 = df_metricas.nlargest(10, 'eficiencia')
+            plt.bar(top10['colaborador'], top10['eficiencia'])
+            plt.title('Eficiência Média por Colaborador')
+            plt.xticks(rotation=45)
+            plt.tight_layout()
+            buffer_barras = BytesIO()
+            plt.savefig(buffer_barras, format='png')
+            plt.close()
             
             # Gerar HTML
             template_str = '''
@@ -1278,13 +1816,13 @@ class AnalisadorInteligente:
             template = jinja2.Template(template_str)
             html_output = template.render(
                 status_data=df_status.iloc[0].to_dict(),
-                grafico_pizza=base64.b64encode(buffer.read()).decode('utf-8'),
-                grafico_barras=base64.b64encode(buffer.read()).decode('utf-8'),
+                grafico_pizza=base64.b64encode(buffer_pizza.getvalue()).decode('utf-8'),
+                grafico_barras=base64.b64encode(buffer_barras.getvalue()).decode('utf-8'),
                 df_metricas=df_metricas
             )
             
             # Salvar HTML
-            output_path = Path('F:/relatoriotest/dashboard.html')
+            output_path = Path(db_path).parent / 'dashboard.html'
             output_path.write_text(html_output, encoding='utf-8')
             
             print(f"✓ Dashboard gerado com sucesso: {output_path}")
@@ -1299,11 +1837,26 @@ class AnalisadorInteligente:
                 conn.close()
 
 class RelatorioDatabase:
-    def __init__(self, db_path="F:/relatoriotest/relatorio_dashboard.db"):
-        self.db_path = db_path
+    # Colunas de relatorio_geral para cada status
+    COLUNAS_STATUS = {
+        'VERIFICADO': 'verificado',
+        'ANÁLISE': 'analise',
+        'PENDENTE': 'pendente',
+        'PRIORIDADE': 'prioridade',
+        'PRIORIDADE TOTAL': 'prioridade_total',
+        'APROVADO': 'aprovado',
+        'APREENDIDO': 'apreendido',
+        'CANCELADO': 'cancelado',
+        'QUITADO': 'quitado',
+        'OUTROS ACORDOS': 'outros_acordos',
+        'M.ENCAMINHADA': 'm_encaminhada'
+    }
+    
+    def __init__(self, db_path="F:/relatoriotest/relatorio_dashboard.db", horas_trabalho=8):
+        self.db_path = str(db_path)
         self.conn = None
         self.criar_tabelas()
-        self.horas_trabalho = 8  # Horas de trabalho por dia
+        self.horas_trabalho = horas_trabalho  # Horas de trabalho por dia
 
     def conectar(self):
         """Estabelece conexão com o banco de dados"""
@@ -1353,12 +1906,21 @@ class RelatorioDatabase:
             aprovado INTEGER DEFAULT 0,
             apreendido INTEGER DEFAULT 0,
             cancelado INTEGER DEFAULT 0,
+            quitado INTEGER DEFAULT 0,
+            outros_acordos INTEGER DEFAULT 0,
+            m_encaminhada INTEGER DEFAULT 0,
             total INTEGER DEFAULT 0,
             FOREIGN KEY (colaborador_id) REFERENCES colaboradores (id),
             UNIQUE (colaborador_id, data_relatorio)
         )
         ''')
         
+        # Bancos criados antes das colunas de QUITADO, OUTROS ACORDOS e M.ENCAMINHADA
+        existentes = {linha[1] for linha in cursor.execute('PRAGMA table_info(relatorio_geral)')}
+        for coluna in self.COLUNAS_STATUS.values():
+            if coluna not in existentes:
+                cursor.execute(f'ALTER TABLE relatorio_geral ADD COLUMN {coluna} INTEGER DEFAULT 0')
+        
         # Tabela de métricas de produtividade
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS metricas_produtividade (
@@ -1429,14 +1991,7 @@ class RelatorioDatabase:
                         dados_colaborador = {
                             'colaborador_id': colaborador_id,
                             'data_relatorio': data_relatorio,
-                            'verificado': 0,
-                            'analise': 0,
-                            'pendente': 0,
-                            'prioridade': 0,
-                            'prioridade_total': 0,
-                            'aprovado': 0,
-                            'apreendido': 0,
-                            'cancelado': 0
+                            **{coluna: 0 for coluna in self.COLUNAS_STATUS.values()}
                         }
                         dados_relatorio.append(dados_colaborador)
                 
@@ -1446,57 +2001,13 @@ class RelatorioDatabase:
                     status = status.strip().upper()
                     try:
                         valor = int(valor.strip())
-                        if status in ['VERIFICADO', 'ANÁLISE', 'PENDENTE', 'PRIORIDADE', 'PRIORIDADE TOTAL',
-                                    'APROVADO', 'APREENDIDO', 'CANCELADO']:
-                            dados_colaborador[status.lower()] = valor
+                        if status in self.COLUNAS_STATUS:
+                            dados_colaborador[self.COLUNAS_STATUS[status]] = valor
                     except ValueError:
                         continue
             
             # Inserir dados no relatório geral
-            for dados in dados_relatorio:
-                total = sum(dados[k] for k in ['verificado', 'analise', 'pendente', 'prioridade',
-                                             'prioridade_total', 'aprovado', 'apreendido', 'cancelado'])
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO relatorio_geral (
-                        colaborador_id, data_relatorio,
-                        verificado, analise, pendente,
-                        prioridade, prioridade_total,
-                        aprovado, apreendido, cancelado,
-                        total
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    dados['colaborador_id'],
-                    dados['data_relatorio'],
-                    dados['verificado'],
-                    dados['analise'],
-                    dados['pendente'],
-                    dados['prioridade'],
-                    dados['prioridade_total'],
-                    dados['aprovado'],
-                    dados['apreendido'],
-                    dados['cancelado'],
-                    total
-                ))
-                
-                # Calcular métricas de produtividade
-                prod_horaria = total / self.horas_trabalho if self.horas_trabalho > 0 else 0
-                prod_diaria = prod_horaria * self.horas_trabalho
-                eficiencia = (dados['aprovado'] / total * 100) if total > 0 else 0
-                
-                # Inserir métricas de produtividade
-                cursor.execute('''
-                    INSERT OR REPLACE INTO metricas_produtividade (
-                        colaborador_id, data_relatorio,
-                        prod_diaria, prod_horaria, eficiencia
-                    ) VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    dados['colaborador_id'],
-                    dados['data_relatorio'],
-                    prod_diaria,
-                    prod_horaria,
-                    eficiencia
-                ))
+            self._gravar_relatorio(cursor, dados_relatorio)
             
             conn.commit()
             print(f"✓ Dados importados com sucesso para o banco de dados: {self.db_path}")
@@ -1509,6 +2020,88 @@ class RelatorioDatabase:
         finally:
             self.fechar()
 
+    def _gravar_relatorio(self, cursor, dados_relatorio):
+        """Grava relatorio_geral e metricas_produtividade de todos os colaboradores de uma vez"""
+        colunas = list(self.COLUNAS_STATUS.values())
+        linhas_relatorio = []
+        linhas_metricas = []
+        for dados in dados_relatorio:
+            contagens = [dados.get(coluna, 0) for coluna in colunas]
+            # Status fora das colunas também entram no total, quando informado
+            total = dados.get('total', sum(contagens))
+            linhas_relatorio.append((dados['colaborador_id'], dados['data_relatorio'], *contagens, total))
+            
+            # Calcular métricas de produtividade
+            prod_horaria = total / self.horas_trabalho if self.horas_trabalho > 0 else 0
+            prod_diaria = prod_horaria * self.horas_trabalho
+            eficiencia = (dados.get('aprovado', 0) / total * 100) if total > 0 else 0
+            linhas_metricas.append((dados['colaborador_id'], dados['data_relatorio'], prod_diaria, prod_horaria, eficiencia))
+        
+        cursor.executemany(f'''
+            INSERT OR REPLACE INTO relatorio_geral (
+                colaborador_id, data_relatorio, {', '.join(colunas)}, total
+            ) VALUES ({', '.join('?' * (len(colunas) + 3))})
+        ''', linhas_relatorio)
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO metricas_produtividade (
+                colaborador_id, data_relatorio,
+                prod_diaria, prod_horaria, eficiencia
+            ) VALUES (?, ?, ?, ?, ?)
+        ''', linhas_metricas)
+
+    def exportar_metricas(self, metricas_grupos, data_relatorio=None):
+        """
+        Grava grupos, colaboradores, relatorio_geral e metricas_produtividade a partir
+        das métricas em memória ({grupo: {colaborador: metricas}}), em uma única transação
+        """
+        data_relatorio = data_relatorio or datetime.now().date()
+        try:
+            conn = self.conectar()
+            with conn:
+                conn.executemany('INSERT OR IGNORE INTO grupos (nome) VALUES (?)', [(grupo,) for grupo in metricas_grupos])
+                ids_grupos = dict(conn.execute('SELECT nome, id FROM grupos'))
+                
+                conn.executemany('INSERT OR IGNORE INTO colaboradores (nome, grupo_id) VALUES (?, ?)', [
+                    (colaborador, ids_grupos[grupo])
+                    for grupo, colaboradores in metricas_grupos.items()
+                    for colaborador in colaboradores
+                ])
+                ids_colaboradores = {
+                    (grupo_id, nome): colaborador_id
+                    for colaborador_id, nome, grupo_id in conn.execute('SELECT id, nome, grupo_id FROM colaboradores')
+                }
+                
+                dados_relatorio = []
+                for grupo, colaboradores in metricas_grupos.items():
+                    for colaborador, metricas in colaboradores.items():
+                        dados = {
+                            'colaborador_id': ids_colaboradores[(ids_grupos[grupo], colaborador)],
+                            'data_relatorio': data_relatorio,
+                            'total': int(metricas['total_registros'])
+                        }
+                        for status, coluna in self.COLUNAS_STATUS.items():
+                            dados[coluna] = int(metricas['status_counts'].get(status, 0))
+                        dados_relatorio.append(dados)
+                
+                self._gravar_relatorio(conn, dados_relatorio)
+            print(f"✓ {len(dados_relatorio)} colaboradores gravados em: {self.db_path}")
+            return True
+        
+        except Exception as e:
+            print(f"Erro ao gravar métricas: {str(e)}")
+            traceback.print_exc()
+            return False
+        finally:
+            self.fechar()
+
+    def importar_agregados(self, totais, data_relatorio=None):
+        """Grava o relatório geral a partir dos totais por colaborador do banco de agregados"""
+        metricas_grupos = {}
+        for (grupo, colaborador), metricas in totais.items():
+            metricas_grupos.setdefault(grupo, {})[colaborador] = metricas
+        return self.exportar_metricas(metricas_grupos, data_relatorio)
+
 if __name__ == "__main__":
     try:
         print("\n=== Iniciando Análise de Dados ===")
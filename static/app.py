@@ -1,9 +1,12 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
+from typing import List, Optional
 import sqlite3
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import base64
@@ -15,8 +18,20 @@ import os
 import sys
 import psutil
 import subprocess
+import asyncio
 from dotenv import load_dotenv
 from analisar_dados_v5 import AnalisadorInteligente, RelatorioDatabase
+from tarefas_importacao import GerenciadorImportacao
+from observador_diretorios import ObservadorDiretorios
+from features_predicao import PADRAO_DIA_SEMANA, PADRAO_HORA
+from predicao_lotes import AgrupadorPredicoes, ModeloIndisponivel
+from previsao_backlog import PrevisoesBacklog
+from consultas_em_blocos import contar_blocos, descrever_medida, medir_consulta, resumo_historico
+from previa_amostral import FRACAO_PREVIA
+
+# O gerenciador de WebSockets fica na raiz do projeto
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from websocket_manager import manager as ws_manager
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -148,6 +163,9 @@ class ServerHealthCheck:
                     aprovado INTEGER DEFAULT 0,
                     apreendido INTEGER DEFAULT 0,
                     cancelado INTEGER DEFAULT 0,
+                    quitado INTEGER DEFAULT 0,
+                    outros_acordos INTEGER DEFAULT 0,
+                    m_encaminhada INTEGER DEFAULT 0,
                     total INTEGER DEFAULT 0,
                     FOREIGN KEY (colaborador_id) REFERENCES colaboradores (id),
                     UNIQUE (colaborador_id, data_relatorio)
@@ -224,6 +242,90 @@ DB_PATH = os.getenv("DB_PATH", "relatorio_dashboard.db")
 # Instanciar verificador de saúde do servidor
 health_checker = ServerHealthCheck()
 
+# Importações em segundo plano, com progresso publicado no canal 'importacao'
+CANAL_IMPORTACAO = "importacao"
+
+async def publicar_progresso(evento):
+    await ws_manager.broadcast(evento, CANAL_IMPORTACAO)
+    if evento['tipo'] == 'concluido':
+        # A importação registra um novo modelo de predição quando os dados mudam
+        await asyncio.get_running_loop().run_in_executor(None, analisador_predicao.carregar_modelo_predicao)
+        # Avisar os dashboards conectados de que há dados novos gravados
+        await ws_manager.broadcast({
+            'tipo': 'dados_atualizados',
+            'tarefa_id': evento['tarefa_id'],
+            'momento': evento['momento']
+        }, "metrics")
+
+gerenciador_importacao = GerenciadorImportacao(publicar_progresso)
+
+# Predições: o modelo vem do registro e os pedidos são pontuados em micro-lotes
+analisador_predicao = AnalisadorInteligente()
+
+def prever_lote(X):
+    probabilidades = analisador_predicao.prever_aprovacao_lote(X)
+    if probabilidades is None:
+        raise ModeloIndisponivel("Nenhum modelo de predição disponível")
+    return probabilidades
+
+agrupador_predicoes = AgrupadorPredicoes(
+    prever_lote,
+    tamanho_lote=int(os.getenv("PREDICAO_TAMANHO_LOTE", "256")),
+    espera=float(os.getenv("PREDICAO_ESPERA_MS", "5")) / 1000
+)
+
+class ContratoPredicao(BaseModel):
+    tempo_processamento: float
+    hora_dia: Optional[float] = None
+    dia_semana: Optional[float] = None
+
+class PedidoPredicao(BaseModel):
+    contratos: List[ContratoPredicao]
+
+# Observador dos diretórios de dados (desative com OBSERVAR_DIRETORIOS=0)
+OBSERVAR_DIRETORIOS = os.getenv("OBSERVAR_DIRETORIOS", "1") != "0"
+observador = None
+
+@app.on_event("startup")
+async def iniciar_websockets():
+    await ws_manager.startup()
+
+@app.on_event("startup")
+async def carregar_modelo_predicao():
+    modelo = await asyncio.get_running_loop().run_in_executor(None, analisador_predicao.carregar_modelo_predicao)
+    if modelo is None:
+        print("Nenhum modelo de predição registrado; /api/predict responde após a primeira importação")
+
+@app.on_event("startup")
+async def iniciar_observador():
+    """Inicia a ingestão incremental quando uma planilha é criada ou alterada"""
+    global observador
+    if not OBSERVAR_DIRETORIOS:
+        return
+    
+    loop = asyncio.get_running_loop()
+    
+    def disparar(caminho):
+        tarefa, nova = gerenciador_importacao.iniciar(
+            motivo=f"Planilha alterada: {caminho.name}",
+            reexecutar_se_ocupado=True
+        )
+        print(f"Alteração em {caminho.name}: tarefa {tarefa.id} {'iniciada' if nova else 'agendada'}")
+    
+    analisador = AnalisadorInteligente()
+    observador = ObservadorDiretorios(
+        analisador.diretorios,
+        analisador.arquivos.values(),
+        # O observador roda em outra thread; a tarefa é criada no event loop
+        lambda caminho: loop.call_soon_threadsafe(disparar, caminho)
+    )
+    observador.iniciar()
+
+@app.on_event("shutdown")
+async def parar_observador():
+    if observador is not None:
+        observador.parar()
+
 # Função para conectar ao banco de dados
 def get_db():
     """Função helper para obter conexão com o banco de dados"""
@@ -275,39 +377,26 @@ async def dashboard(request: Request):
     try:
         conn = get_db()
         
-        # Buscar dados do relatório geral
-        df_relatorio = pd.read_sql_query("""
-            SELECT 
-                c.nome as colaborador,
-                g.nome as grupo,
-                r.*,
-                m.prod_diaria,
-                m.prod_horaria,
-                m.eficiencia
-            FROM relatorio_geral r
-            JOIN colaboradores c ON r.colaborador_id = c.id
-            JOIN grupos g ON c.grupo_id = g.id
-            LEFT JOIN metricas_produtividade m ON r.colaborador_id = m.colaborador_id
-            ORDER BY r.data_relatorio DESC
-        """, conn)
-        
-        # Calcular totais
-        totais = {
-            'verificado': df_relatorio['verificado'].sum(),
-            'analise': df_relatorio['analise'].sum(),
-            'pendente': df_relatorio['pendente'].sum(),
-            'prioridade': df_relatorio['prioridade'].sum(),
-            'prioridade_total': df_relatorio['prioridade_total'].sum(),
-            'aprovado': df_relatorio['aprovado'].sum(),
-            'apreendido': df_relatorio['apreendido'].sum(),
-            'cancelado': df_relatorio['cancelado'].sum()
-        }
+        # Histórico do relatório geral lido em blocos e somado por colaborador
+        try:
+            resumo = resumo_historico(
+                conn, RelatorioDatabase.COLUNAS_STATUS.values(),
+                tamanho_bloco=analisador_predicao.tamanho_bloco_consulta, medir_memoria=True
+            )
+        finally:
+            conn.close()
+        for nome, medida in resumo['consultas'].items():
+            print(descrever_medida(nome, medida))
+        colaboradores = resumo['colaboradores'].to_dict('records')
         
         # Preparar dados para o template
         context = {
             "request": request,
-            "df_relatorio": df_relatorio.to_dict('records'),
-            "totais": totais,
+            "df_relatorio": colaboradores,
+            "metricas": colaboradores,
+            "grupos": resumo['grupos'].to_dict('records'),
+            "status": resumo['status'],
+            "totais": resumo['status'],
             "ultima_atualizacao": datetime.now().strftime("%d/%m/%Y %H:%M")
         }
         
@@ -322,8 +411,6 @@ async def exportar_dados(tipo: str, formato: str, conn: sqlite3.Connection = Dep
     from fastapi.responses import FileResponse
     
     try:
-        cursor = conn.cursor()
-        
         if tipo == "diario":
             query = """
             SELECT c.nome as colaborador, g.nome as grupo, rd.*
@@ -354,28 +441,33 @@ async def exportar_dados(tipo: str, formato: str, conn: sqlite3.Connection = Dep
         else:
             raise HTTPException(status_code=400, detail="Tipo de relatório inválido")
         
-        # Executar consulta
-        cursor.execute(query)
-        dados = cursor.fetchall()
-        df = pd.DataFrame(dados)
+        if formato not in ("excel", "csv"):
+            raise HTTPException(status_code=400, detail="Formato inválido")
         
         # Caminho para salvar o arquivo
         data_atual = datetime.now().strftime("%Y%m%d")
         caminho_arquivo = f"static/{nome_arquivo}_{data_atual}"
         
-        # Exportar conforme formato solicitado
-        if formato == "excel":
-            caminho_completo = f"{caminho_arquivo}.xlsx"
-            df.to_excel(caminho_completo, index=False)
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        
-        elif formato == "csv":
-            caminho_completo = f"{caminho_arquivo}.csv"
-            df.to_csv(caminho_completo, index=False)
-            media_type = "text/csv"
-        
-        else:
-            raise HTTPException(status_code=400, detail="Formato inválido")
+        # Resultado lido em blocos de linhas, com tempo e pico de memória da exportação
+        consultas = {}
+        with medir_consulta(consultas, f"exportar_{nome_arquivo}") as medida:
+            blocos = contar_blocos(
+                pd.read_sql_query(query, conn, chunksize=analisador_predicao.tamanho_bloco_consulta), medida
+            )
+            
+            # Exportar conforme formato solicitado
+            if formato == "excel":
+                caminho_completo = f"{caminho_arquivo}.xlsx"
+                # A planilha precisa de todas as linhas de uma vez
+                pd.concat(blocos, ignore_index=True).to_excel(caminho_completo, index=False)
+                media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            else:
+                caminho_completo = f"{caminho_arquivo}.csv"
+                # Cada bloco é acrescentado ao arquivo e descartado
+                for i, bloco in enumerate(blocos):
+                    bloco.to_csv(caminho_completo, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+                media_type = "text/csv"
+        print(descrever_medida(f"exportar_{nome_arquivo}", medida))
         
         return FileResponse(
             path=caminho_completo,
@@ -743,16 +835,144 @@ async def health_check():
     
     return status
 
-@app.post("/atualizar")
+@app.post("/atualizar", status_code=202)
 async def atualizar_dados():
-    """Rota para atualizar os dados do dashboard"""
+    """
+    Inicia a atualização dos dados em segundo plano e retorna o id da tarefa.
+    Se uma atualização já estiver em andamento, retorna a tarefa existente.
+    """
     try:
-        analisador = AnalisadorInteligente()
-        analisador.executar_analise_completa()
-        analisador.exportar_para_sqlite()
-        return {"message": "Dados atualizados com sucesso"}
+        tarefa, nova = gerenciador_importacao.iniciar()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar dados: {str(e)}")
+    
+    resposta = tarefa.resumo()
+    resposta["message"] = "Atualização iniciada" if nova else "Atualização já em andamento"
+    resposta["websocket"] = f"/ws/{CANAL_IMPORTACAO}"
+    return resposta
+
+@app.get("/atualizar/{tarefa_id}")
+async def status_atualizacao(tarefa_id: str):
+    """Retorna o estado de uma atualização"""
+    tarefa = gerenciador_importacao.obter(tarefa_id)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return tarefa.resumo()
+
+@app.post("/api/predict")
+async def prever_aprovacao(pedido: PedidoPredicao):
+    """
+    Probabilidade de aprovação de cada contrato. Pedidos simultâneos são
+    pontuados juntos; a resposta traz a latência e o tamanho do lote.
+    """
+    if not pedido.contratos:
+        raise HTTPException(status_code=422, detail="Nenhum contrato informado")
+    
+    X = np.array([
+        [
+            contrato.tempo_processamento,
+            PADRAO_HORA if contrato.hora_dia is None else contrato.hora_dia,
+            PADRAO_DIA_SEMANA if contrato.dia_semana is None else contrato.dia_semana
+        ]
+        for contrato in pedido.contratos
+    ], dtype=float)
+    
+    try:
+        probabilidades, lote = await agrupador_predicoes.prever(X)
+    except ModeloIndisponivel as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    modelo = analisador_predicao.modelos['predicao']
+    return {
+        "probabilidades_aprovacao": probabilidades.tolist(),
+        "confianca_modelo": float(modelo['accuracy']),
+        **lote
+    }
+
+@app.get("/api/predict/estatisticas")
+async def estatisticas_predicao():
+    """Requisições, lotes e latência das predições desde o início do servidor"""
+    return agrupador_predicoes.estatisticas()
+
+@app.get("/api/dashboard")
+async def dados_dashboard():
+    """Dados do dashboard gravados pela última análise, entregues sem recálculo"""
+    caminho = analisador_predicao.obter_caminho_dashboard()
+    if not caminho.exists():
+        raise HTTPException(status_code=404, detail="Dados do dashboard ainda não gerados; execute uma atualização")
+    return FileResponse(str(caminho), media_type="application/json")
+
+@app.get("/api/previsao-backlog")
+async def previsao_backlog(grupo: Optional[str] = None, colaborador: Optional[str] = None):
+    """
+    Pendentes previstos por dia gravados pela última análise: totais dos grupos
+    ou, com `colaborador`, as previsões dele. Nada é recalculado aqui.
+    """
+    caminho = analisador_predicao.obter_caminho_db()
+    previsao = PrevisoesBacklog(caminho).ler(grupo, colaborador) if caminho.exists() else None
+    if previsao is None:
+        raise HTTPException(status_code=404, detail="Previsão de pendentes não encontrada; execute uma atualização")
+    return previsao
+
+@app.get("/api/previa")
+async def previa_analise(fracao: float = FRACAO_PREVIA):
+    """
+    Prévia da análise a partir de uma amostra de cada colaborador: distribuição
+    de status e ranking estimados, com intervalos de confiança. O resultado é
+    aproximado (campo 'aproximado'). Só as abas já guardadas no cache pela
+    última importação são lidas; as planilhas não são abertas e nada é gravado.
+    """
+    if not 0 < fracao <= 1:
+        raise HTTPException(status_code=422, detail="A fração da amostra deve estar entre 0 e 1")
+    
+    def executar():
+        # A importação grava o cache durante todo o processo
+        if not gerenciador_importacao.trava_cache.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="Importação em andamento; tente a prévia quando ela terminar")
+        try:
+            analisador = AnalisadorInteligente()
+            analisador.interativo = False
+            analisador.fracao_previa = fracao
+            dados_grupos = analisador.carregar_dados_do_cache()
+            if dados_grupos is None:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Dados ainda não importados ou alterados desde a última importação; execute uma atualização"
+                )
+            return analisador.gerar_previa(dados_grupos)
+        finally:
+            gerenciador_importacao.trava_cache.release()
+    
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, executar)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar a prévia da análise: {str(e)}")
+
+@app.websocket("/ws/importacao")
+async def websocket_importacao(websocket: WebSocket):
+    """Canal com os eventos de progresso das atualizações"""
+    await ws_manager.connect(websocket, CANAL_IMPORTACAO)
+    try:
+        # Quem conecta durante uma importação recebe o último evento
+        tarefa = gerenciador_importacao.tarefa_atual
+        if tarefa is not None and tarefa.em_execucao and tarefa.eventos:
+            await ws_manager.send_personal_message(tarefa.eventos[-1], websocket)
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        ws_manager.disconnect(websocket, CANAL_IMPORTACAO)
+
+@app.websocket("/ws/metrics")
+async def websocket_metricas(websocket: WebSocket):
+    """Canal dos dashboards: avisa quando uma importação grava dados novos ('dados_atualizados')"""
+    await ws_manager.connect(websocket, "metrics")
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        ws_manager.disconnect(websocket, "metrics")
 
 # Iniciar o servidor se executado diretamente
 if __name__ == "__main__":
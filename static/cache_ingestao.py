@@ -0,0 +1,285 @@
+"""
+Ingestão incremental das planilhas.
+
+O manifesto guarda, para cada arquivo, mtime, tamanho e hash, além de um digest
+do conteúdo de cada aba. Abas cujo digest não mudou são lidas de um cache
+colunar em disco (Feather/Parquet) e apenas as abas alteradas voltam a ser
+processadas.
+"""
+import hashlib
+import json
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from pathlib import Path, PurePosixPath
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow o cache usa pickle
+    pa = None
+
+# Incrementar quando a normalização das abas mudar, invalidando o cache
+VERSAO_CACHE = 4
+
+NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELACAO = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PACOTE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Dimensão e valores das células; o restante do XML guarda seleção, zoom,
+# aba ativa... (a dimensão define a largura das linhas no modo read-only)
+RE_DIMENSAO_ABA = re.compile(rb'<dimension\b[^>]*>')
+RE_DADOS_ABA = re.compile(rb'<sheetData\b.*?(?:/>|</sheetData>)', re.S)
+
+# Índices de shared strings referenciados pelas células da aba (t="s")
+RE_CELULA_TEXTO = re.compile(rb'(<c\b[^>]*?\bt="s"[^>]*>\s*<v>)(\d+)(</v>)')
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do arquivo lendo em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _membros_abas(pacote):
+    """Mapeia o nome de cada aba para o arquivo XML correspondente no pacote .xlsx"""
+    workbook = ET.fromstring(pacote.read('xl/workbook.xml'))
+    relacoes = ET.fromstring(pacote.read('xl/_rels/workbook.xml.rels'))
+    alvos = {rel.get('Id'): rel.get('Target') for rel in relacoes.iter(f'{NS_PACOTE}Relationship')}
+
+    membros = {}
+    for sheet in workbook.iter(f'{NS_PLANILHA}sheet'):
+        alvo = alvos.get(sheet.get(f'{NS_RELACAO}id'))
+        if alvo:
+            alvo = alvo.lstrip('/') if alvo.startswith('/') else str(PurePosixPath('xl') / alvo)
+            membros[sheet.get('name')] = alvo
+    return membros
+
+
+def _shared_strings(pacote):
+    """Lê a tabela de shared strings do pacote"""
+    try:
+        raiz = ET.fromstring(pacote.read('xl/sharedStrings.xml'))
+    except KeyError:
+        return []
+    return [''.join(si.itertext()) for si in raiz.iter(f'{NS_PLANILHA}si')]
+
+
+def digests_abas(caminho, abas, sha_arquivo):
+    """
+    Calcula um digest do conteúdo de cada aba.
+
+    Para .xlsx o digest cobre apenas a dimensão e o bloco <sheetData> da aba,
+    com as shared strings resolvidas, e os estilos (que definem datas). Se o pacote não puder ser
+    lido assim (.xls, por exemplo), o digest de cada aba deriva do hash do arquivo.
+    """
+    try:
+        with zipfile.ZipFile(caminho) as pacote:
+            membros = _membros_abas(pacote)
+            textos = _shared_strings(pacote)
+            try:
+                hash_estilos = hashlib.sha256(pacote.read('xl/styles.xml')).digest()
+            except KeyError:
+                hash_estilos = b''
+
+            # Trocar índices pelos textos torna o digest imune à renumeração
+            # da tabela de shared strings quando outra aba é editada
+            def resolver_texto(m):
+                return m.group(1) + escape(textos[int(m.group(2))]).encode('utf-8') + m.group(3)
+
+            digests = {}
+            for aba in abas:
+                xml = pacote.read(membros[aba])
+                sha = hashlib.sha256(hash_estilos)
+                dimensao = RE_DIMENSAO_ABA.search(xml)
+                if dimensao:
+                    sha.update(dimensao.group(0))
+                dados = RE_DADOS_ABA.search(xml)
+                if dados:
+                    sha.update(RE_CELULA_TEXTO.sub(resolver_texto, dados.group(0)))
+                digests[aba] = sha.hexdigest()
+            return digests
+    except (zipfile.BadZipFile, KeyError, IndexError, ET.ParseError):
+        return {aba: hashlib.sha256(f"{sha_arquivo}:{aba}".encode('utf-8')).hexdigest() for aba in abas}
+
+
+class ManifestoIngestao:
+    """Manifesto persistente com as impressões digitais de arquivos e abas"""
+
+    def __init__(self, diretorio_cache):
+        self.diretorio = Path(diretorio_cache)
+        self.caminho = self.diretorio / 'manifesto.json'
+        self.arquivos = self._carregar()
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if dados.get('versao') == VERSAO_CACHE:
+                return dados.get('arquivos', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def salvar(self):
+        """Grava o manifesto de forma atômica"""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho.with_suffix('.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'versao': VERSAO_CACHE, 'arquivos': self.arquivos}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+
+    def consultar(self, caminho):
+        """Retorna a entrada do arquivo se mtime e tamanho não mudaram"""
+        entrada = self.arquivos.get(Path(caminho).name)
+        stat = Path(caminho).stat()
+        if entrada and entrada['mtime'] == stat.st_mtime and entrada['tamanho'] == stat.st_size:
+            return entrada
+        return None
+
+    def fingerprint(self, caminho, motor, abas):
+        """
+        Recalcula a impressão digital de um arquivo alterado. As abas cujo digest
+        não mudou mantêm as métricas já registradas.
+        """
+        stat = Path(caminho).stat()
+        sha = hash_arquivo(caminho)
+        anterior = self.arquivos.get(Path(caminho).name, {'sha256': None, 'abas': {}})
+        if anterior['sha256'] == sha and set(anterior['abas']) >= set(abas):
+            digests = {aba: anterior['abas'][aba]['digest'] for aba in abas}
+        else:
+            digests = digests_abas(caminho, abas, sha)
+
+        abas_entrada = {}
+        for aba in abas:
+            entrada_aba = anterior['abas'].get(aba)
+            if entrada_aba and entrada_aba['digest'] == digests[aba]:
+                abas_entrada[aba] = entrada_aba
+            else:
+                abas_entrada[aba] = {'digest': digests[aba]}
+
+        return {
+            'mtime': stat.st_mtime,
+            'tamanho': stat.st_size,
+            'sha256': sha,
+            'motor': motor,
+            'abas': abas_entrada
+        }
+
+    def registrar_aba(self, entrada, aba, metricas):
+        """Marca a aba como processada; métricas None indicam aba sem dados úteis"""
+        entrada['abas'][aba]['processada'] = True
+        entrada['abas'][aba]['metricas'] = metricas
+
+    def registrar(self, caminho, entrada):
+        self.arquivos[Path(caminho).name] = entrada
+
+    def digests_em_uso(self):
+        return {aba['digest'] for entrada in self.arquivos.values() for aba in entrada['abas'].values()}
+
+
+class CacheAbas:
+    """
+    Cache em disco dos DataFrames normalizados, indexado pelo digest da aba.
+
+    Os DataFrames são gravados em formato colunar (Feather ou Parquet). Colunas
+    com tipos mistos, que o Arrow não representa, vão para um arquivo auxiliar
+    em pickle; sem pyarrow instalado todo o DataFrame é gravado em pickle.
+    """
+
+    EXTENSOES = {'feather': '.feather', 'parquet': '.parquet', 'pickle': '.pkl'}
+
+    def __init__(self, diretorio_cache, formato='feather'):
+        if formato not in self.EXTENSOES:
+            raise ValueError(f"Formato de cache inválido: {formato}")
+        if formato != 'pickle' and pa is None:
+            formato = 'pickle'
+        self.diretorio = Path(diretorio_cache) / 'abas'
+        self.formato = formato
+
+    def _caminho(self, digest, formato):
+        return self.diretorio / f"v{VERSAO_CACHE}-{digest}{self.EXTENSOES[formato]}"
+
+    def _caminho_resto(self, digest):
+        return self.diretorio / f"v{VERSAO_CACHE}-{digest}.resto.pkl"
+
+    def _localizar(self, digest):
+        for formato in self.EXTENSOES:
+            caminho = self._caminho(digest, formato)
+            if caminho.exists():
+                return formato, caminho
+        return None, None
+
+    def contem(self, digest):
+        return self._localizar(digest)[0] is not None
+
+    def ler(self, digest):
+        formato, caminho = self._localizar(digest)
+        if formato == 'pickle':
+            return pd.read_pickle(caminho)
+
+        df = pd.read_feather(caminho) if formato == 'feather' else pd.read_parquet(caminho)
+        caminho_resto = self._caminho_resto(digest)
+        if caminho_resto.exists():
+            ordem, df_resto = pd.read_pickle(caminho_resto)
+            df = pd.concat([df, df_resto], axis=1)[ordem]
+        return df
+
+    def gravar(self, digest, df):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        formato = self.formato
+        if formato != 'pickle' and not df.columns.is_unique:
+            formato = 'pickle'
+
+        if formato == 'pickle':
+            self._gravar_atomico(self._caminho(digest, formato), df.to_pickle)
+            return
+
+        # Separar as colunas que o Arrow não consegue converter
+        resto = [col for col in df.columns if df[col].dtype == object and not self._conversivel(df[col])]
+        colunar = df.drop(columns=resto).reset_index(drop=True)
+        tabela = pa.Table.from_pandas(colunar, preserve_index=False)
+
+        if resto:
+            self._gravar_atomico(
+                self._caminho_resto(digest),
+                lambda caminho: pd.to_pickle((list(df.columns), df[resto].reset_index(drop=True)), caminho)
+            )
+        if formato == 'feather':
+            self._gravar_atomico(self._caminho(digest, formato), lambda caminho: feather.write_feather(tabela, caminho))
+        else:
+            self._gravar_atomico(self._caminho(digest, formato), lambda caminho: pq.write_table(tabela, caminho))
+
+    @staticmethod
+    def _conversivel(serie):
+        try:
+            pa.array(serie, from_pandas=True)
+            return True
+        except (pa.ArrowException, TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _gravar_atomico(caminho, escrever):
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        escrever(temporario)
+        os.replace(temporario, caminho)
+
+    def limpar(self, digests_em_uso):
+        """Remove entradas que não são mais referenciadas pelo manifesto"""
+        if not self.diretorio.exists():
+            return
+        em_uso = set()
+        for digest in digests_em_uso:
+            em_uso.add(self._caminho_resto(digest).name)
+            em_uso.update(self._caminho(digest, formato).name for formato in self.EXTENSOES)
+        for arquivo in self.diretorio.iterdir():
+            if arquivo.name not in em_uso:
+                arquivo.unlink()
@@ -0,0 +1,85 @@
+"""
+Compactação dos tipos das colunas das abas.
+
+Depois da normalização, as colunas de texto com poucos valores distintos
+viram categóricas, datas guardadas como objetos `date`/`datetime` viram
+datetime64, inteiros passam a int32 e números de ponto flutuante a float32
+quando a conversão não altera nenhum valor. Nas colunas que continuam como
+objeto, valores repetidos passam a ser o mesmo objeto (strings internadas).
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Colunas de texto com até esta fração de valores distintos viram categóricas
+FRACAO_CATEGORICA = 0.5
+
+_INT32 = np.iinfo(np.int32)
+
+
+def memoria_bytes(df):
+    """
+    Memória ocupada pelo DataFrame. Nas colunas de objetos cada objeto é contado
+    uma única vez, de modo que o compartilhamento de valores repetidos aparece.
+    """
+    total = int(df.index.memory_usage(deep=True))
+    # Por posição: a normalização pode deixar cabeçalhos repetidos
+    for i in range(df.shape[1]):
+        serie = df.iloc[:, i]
+        if serie.dtype != object:
+            total += int(serie.memory_usage(index=False, deep=True))
+            continue
+        valores = serie.to_numpy()
+        ids = np.fromiter(map(id, valores), dtype=np.int64, count=len(valores))
+        _, primeiros = np.unique(ids, return_index=True)
+        total += valores.nbytes + sum(sys.getsizeof(valores[i]) for i in primeiros)
+    return total
+
+
+def _internar(serie):
+    """Uma única instância por valor distinto (strings também no interning do Python)"""
+    codigos, unicos = pd.factorize(serie)
+    unicos = np.array(
+        [sys.intern(valor) if type(valor) is str else valor for valor in unicos] + [None],
+        dtype=object
+    )
+    # O código -1 (vazio) aponta para o None acrescentado ao fim
+    return pd.Series(unicos[codigos], index=serie.index, name=serie.name, dtype=object)
+
+
+def compactar_coluna(serie):
+    """Menor representação da coluna que preserva todos os valores"""
+    tipo = serie.dtype
+    if pd.api.types.is_integer_dtype(tipo) and tipo.itemsize > 4:
+        if serie.empty or (serie.min() >= _INT32.min and serie.max() <= _INT32.max):
+            return serie.astype(np.int32)
+        return serie
+    if pd.api.types.is_float_dtype(tipo) and tipo.itemsize > 4:
+        reduzida = serie.astype(np.float32)
+        if np.array_equal(reduzida.to_numpy(dtype=np.float64), serie.to_numpy(), equal_nan=True):
+            return reduzida
+        return serie
+    if tipo != object:
+        return serie
+
+    inferido = pd.api.types.infer_dtype(serie, skipna=True)
+    if inferido in ('date', 'datetime'):
+        try:
+            return pd.to_datetime(serie)
+        except (ValueError, TypeError, OverflowError):
+            return _internar(serie)
+    if inferido == 'string' and serie.nunique() <= FRACAO_CATEGORICA * len(serie):
+        return serie.astype('category')
+    if inferido == 'empty':
+        return serie
+    return _internar(serie)
+
+
+def compactar_dataframe(df):
+    """Novo DataFrame com todas as colunas compactadas (cabeçalhos repetidos são mantidos)"""
+    if df.shape[1] == 0:
+        return df.copy()
+    compactado = pd.concat([compactar_coluna(df.iloc[:, i]) for i in range(df.shape[1])], axis=1)
+    compactado.columns = df.columns
+    return compactado
@@ -0,0 +1,143 @@
+"""
+Consultas ao histórico do banco do dashboard lidas em blocos.
+
+O relatório geral ganha linhas todos os dias. Em vez de carregar as tabelas
+inteiras, as consultas são lidas em blocos de `tamanho_bloco` linhas
+(`chunksize`) e cada bloco é somado aos agregados por colaborador, de modo que
+a memória depende do número de colaboradores e não dos anos de histórico. O
+tempo e o pico de memória alocada de cada consulta podem ser medidos
+(tracemalloc).
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+TAMANHO_BLOCO_CONSULTA = 20_000
+
+COLUNAS_METRICAS = ['prod_diaria', 'prod_horaria', 'eficiencia']
+
+
+@contextmanager
+def medir_consulta(medidas, nome, memoria=True):
+    """Registra em medidas[nome] os segundos e, com `memoria`, o pico de memória alocada em MB"""
+    iniciou = memoria and not tracemalloc.is_tracing()
+    if iniciou:
+        tracemalloc.start()
+    elif memoria and hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0] if memoria else 0
+    medida = medidas.setdefault(nome, {'linhas': 0, 'blocos': 0, 'pico_mb': None})
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        medida['segundos'] = time.perf_counter() - inicio
+        if memoria:
+            medida['pico_mb'] = max(tracemalloc.get_traced_memory()[1] - base, 0) / 1024 ** 2
+            if iniciou:
+                tracemalloc.stop()
+
+
+def descrever_medida(nome, medida):
+    """Linha de resumo de uma consulta medida por medir_consulta"""
+    pico = f"pico {medida['pico_mb']:.1f} MB" if medida['pico_mb'] is not None else 'pico não medido'
+    return (f"{nome:<24} {medida['linhas']:>9} linhas em {medida['blocos']} blocos "
+            f"| {pico} ({medida['segundos']:.2f}s)")
+
+
+def contar_blocos(blocos, medida):
+    """Repassa os blocos de um read_sql_query(chunksize=...) somando linhas e blocos em `medida`"""
+    for bloco in blocos:
+        medida['linhas'] += len(bloco)
+        medida['blocos'] += 1
+        yield bloco
+
+
+def somar_em_blocos(conn, consulta, chaves, colunas, params=None, tamanho_bloco=TAMANHO_BLOCO_CONSULTA, medida=None):
+    """
+    Soma `colunas` por `chaves` lendo o resultado da consulta em blocos, com a
+    coluna 'linhas' (registros de cada chave). Só os totais parciais ficam em
+    memória entre um bloco e outro.
+    """
+    acumulado = None
+    for bloco in pd.read_sql_query(consulta, conn, params=params, chunksize=tamanho_bloco):
+        if bloco.empty:
+            continue
+        grupos = bloco.groupby(chaves, sort=False)
+        parcial = grupos[colunas].sum()
+        parcial['linhas'] = grupos.size()
+        acumulado = parcial if acumulado is None else \
+            pd.concat([acumulado, parcial]).groupby(level=list(range(len(chaves))), sort=False).sum()
+        if medida is not None:
+            medida['linhas'] += len(bloco)
+            medida['blocos'] += 1
+
+    if acumulado is None:
+        return pd.DataFrame(columns=[*chaves, *colunas, 'linhas'])
+    return acumulado.reset_index()
+
+
+def _filtro_periodo(alias, inicio, fim):
+    condicoes, params = [], []
+    if inicio is not None:
+        condicoes.append(f'{alias}.data_relatorio >= ?')
+        params.append(str(inicio))
+    if fim is not None:
+        condicoes.append(f'{alias}.data_relatorio <= ?')
+        params.append(str(fim))
+    return (' WHERE ' + ' AND '.join(condicoes) if condicoes else ''), params
+
+
+def resumo_historico(conn, colunas_status, inicio=None, fim=None, tamanho_bloco=TAMANHO_BLOCO_CONSULTA,
+                     medir_memoria=False):
+    """
+    Histórico do banco do dashboard entre as datas de relatório `inicio` e `fim`:
+
+    - 'colaboradores': grupo, colaborador, soma de cada status e do total, dias
+      com relatório e médias de prod_diaria, prod_horaria e eficiencia
+    - 'grupos': nome, total_colaboradores e total
+    - 'status': soma de cada coluna de status
+    - 'consultas': linhas, blocos, segundos e pico_mb de cada consulta
+    """
+    # Bancos antigos podem não ter todas as colunas de status
+    existentes = {linha[1] for linha in conn.execute('PRAGMA table_info(relatorio_geral)')}
+    colunas_status = [coluna for coluna in colunas_status if coluna in existentes]
+    consultas = {}
+
+    filtro, params = _filtro_periodo('r', inicio, fim)
+    with medir_consulta(consultas, 'relatorio_geral', medir_memoria) as medida:
+        relatorio = somar_em_blocos(conn, f'''
+            SELECT g.nome AS grupo, c.nome AS colaborador, {', '.join(f'r.{coluna}' for coluna in colunas_status)}, r.total
+            FROM relatorio_geral r
+            JOIN colaboradores c ON r.colaborador_id = c.id
+            JOIN grupos g ON c.grupo_id = g.id{filtro}
+        ''', ['grupo', 'colaborador'], [*colunas_status, 'total'], params, tamanho_bloco, medida)
+    relatorio = relatorio.rename(columns={'linhas': 'dias'})
+
+    filtro, params = _filtro_periodo('m', inicio, fim)
+    with medir_consulta(consultas, 'metricas_produtividade', medir_memoria) as medida:
+        metricas = somar_em_blocos(conn, f'''
+            SELECT g.nome AS grupo, c.nome AS colaborador, {', '.join(f'm.{coluna}' for coluna in COLUNAS_METRICAS)}
+            FROM metricas_produtividade m
+            JOIN colaboradores c ON m.colaborador_id = c.id
+            JOIN grupos g ON c.grupo_id = g.id{filtro}
+        ''', ['grupo', 'colaborador'], COLUNAS_METRICAS, params, tamanho_bloco, medida)
+    for coluna in COLUNAS_METRICAS:
+        metricas[coluna] = metricas[coluna] / metricas['linhas']
+
+    colaboradores = relatorio.merge(
+        metricas.drop(columns='linhas'), on=['grupo', 'colaborador'], how='left'
+    ).fillna({coluna: 0.0 for coluna in COLUNAS_METRICAS})
+    colaboradores = colaboradores.astype({coluna: 'int64' for coluna in [*colunas_status, 'total', 'dias']})
+    grupos = colaboradores.groupby('grupo', sort=True).agg(
+        total_colaboradores=('colaborador', 'size'), total=('total', 'sum')
+    ).reset_index().rename(columns={'grupo': 'nome'})
+
+    return {
+        'colaboradores': colaboradores.sort_values(['grupo', 'colaborador'], ignore_index=True),
+        'grupos': grupos,
+        'status': {coluna: int(colaboradores[coluna].sum()) for coluna in colunas_status},
+        'consultas': consultas
+    }
@@ -0,0 +1,177 @@
+"""
+Contexto compartilhado pelas etapas de uma execução da análise.
+
+O contexto é criado uma vez, depois do carregamento, e concentra as abas de
+todos os colaboradores em uma base única. As colunas derivadas (dia da semana,
+hora, datas de abertura e de resolução, tempo de processamento, status
+prioritário) só são calculadas quando alguma etapa as acessa pela primeira vez
+e ficam guardadas para as demais. Os DataFrames originais das abas não são
+alterados.
+"""
+from datetime import time as hora_do_dia
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from log_analise import log
+from status_contratos import normalizar_status
+
+
+def coluna_resolucao(df):
+    """Primeira coluna com a data de resolução/conclusão da aba"""
+    return next(
+        (col for col in df.columns if 'RESOLUCAO' in col.upper() or 'DATA_CONCLUSAO' in col.upper()),
+        None
+    )
+
+
+def coluna_abertura(df):
+    """Coluna com a data de abertura/entrada do registro"""
+    return next((col for col in ('DATA', 'DATA_INICIO', 'DATA_ABERTURA') if col in df.columns), None)
+
+
+def coluna_hora(df):
+    """Primeira coluna com o horário do registro"""
+    return next((col for col in df.columns if 'HORA' in col), None)
+
+
+def extrair_hora(serie):
+    """
+    Hora do dia de uma coluna de data/hora; aceita também objetos time do
+    openpyxl. Células que não são data/hora ficam vazias.
+    """
+    try:
+        return pd.to_datetime(serie).dt.hour
+    except (TypeError, ValueError):
+        horas = pd.to_datetime(serie, errors='coerce').dt.hour
+        return horas.fillna(serie.map(lambda valor: valor.hour if isinstance(valor, hora_do_dia) else np.nan))
+
+
+class ContextoAnalise:
+    """Base consolidada de uma execução com colunas derivadas memorizadas"""
+
+    def __init__(self, dados_grupos, status_prioritarios):
+        self.dados_grupos = dados_grupos
+        self.status_prioritarios = list(status_prioritarios)
+
+        # Abas com dados, na ordem dos grupos; cada uma ocupa uma fatia da base
+        self.abas = [
+            (grupo, colaborador, df)
+            for grupo, dados in dados_grupos.items()
+            for colaborador, df in dados['colaboradores'].items()
+            if not df.empty
+        ]
+        limites = np.cumsum([0] + [len(df) for _, _, df in self.abas])
+        self._fatias = {
+            (grupo, colaborador): slice(limites[i], limites[i + 1])
+            for i, (grupo, colaborador, _) in enumerate(self.abas)
+        }
+
+    def fatia(self, grupo, colaborador):
+        """Posições da base ocupadas pela aba do colaborador (None se vazia ou ausente)"""
+        return self._fatias.get((grupo, colaborador))
+
+    def _concatenar(self, derivar, dtype):
+        """
+        Aplica `derivar(df)` a cada aba e concatena os resultados na ordem da base.
+        Abas sem a coluna (derivar retorna None) ou com erro ficam vazias.
+        """
+        partes = []
+        for grupo, colaborador, df in self.abas:
+            try:
+                parte = derivar(df)
+            except Exception as e:
+                log.warning("Não foi possível derivar coluna para %s (%s): %s", colaborador, grupo, e)
+                parte = None
+            if parte is None:
+                parte = pd.Series(np.nan, index=range(len(df))).astype(dtype)
+            partes.append(pd.Series(parte).astype(dtype).reset_index(drop=True))
+        if not partes:
+            return pd.Series(dtype=dtype)
+        return pd.concat(partes, ignore_index=True)
+
+    @cached_property
+    def base(self):
+        """Aba, grupo e colaborador (categóricos) e status de cada registro"""
+        if not self.abas:
+            return pd.DataFrame(columns=['ABA', 'GRUPO', 'COLABORADOR', 'STATUS'])
+        tamanhos = [len(df) for _, _, df in self.abas]
+        aba = np.repeat(np.arange(len(self.abas), dtype=np.int32), tamanhos)
+        grupos = pd.Categorical([grupo for grupo, _, _ in self.abas])
+        colaboradores = pd.Categorical([colaborador for _, colaborador, _ in self.abas])
+        status = pd.concat(
+            [df['STATUS'] if 'STATUS' in df.columns else pd.Series(np.nan, index=df.index) for _, _, df in self.abas],
+            ignore_index=True
+        )
+        return pd.DataFrame({
+            'ABA': aba,
+            'GRUPO': grupos.take(aba),
+            'COLABORADOR': colaboradores.take(aba),
+            # As abas podem ter categorias de status diferentes
+            'STATUS': normalizar_status(status)
+        })
+
+    @cached_property
+    def prioritario(self):
+        """Máscara dos registros com status prioritário"""
+        return self.base['STATUS'].isin(self.status_prioritarios).to_numpy()
+
+    @cached_property
+    def dia(self):
+        return self._concatenar(
+            lambda df: pd.to_datetime(df['DIA'], errors='coerce') if 'DIA' in df.columns else None,
+            'datetime64[ns]'
+        )
+
+    @cached_property
+    def dia_semana(self):
+        return self.dia.dt.day_name()
+
+    @cached_property
+    def hora(self):
+        return self._concatenar(
+            lambda df: extrair_hora(df[coluna_hora(df)]) if coluna_hora(df) else None,
+            'Int64'
+        )
+
+    @cached_property
+    def hora_registro(self):
+        """Hora da coluna HORA, sem considerar outras colunas com HORA no nome (features do modelo)"""
+        return self._concatenar(
+            lambda df: extrair_hora(df['HORA']) if 'HORA' in df.columns else None,
+            'Int64'
+        )
+
+    def possui_coluna(self, localizar):
+        """Máscara dos registros cujas abas têm a coluna devolvida por `localizar(df)`"""
+        tem_coluna = np.array([localizar(df) is not None for _, _, df in self.abas], dtype=bool)
+        return tem_coluna[self.base['ABA'].to_numpy()] if self.abas else np.array([], dtype=bool)
+
+    @cached_property
+    def possui_resolucao(self):
+        return self.possui_coluna(coluna_resolucao)
+
+    @cached_property
+    def tempo_processamento(self):
+        return self._concatenar(
+            lambda df: (
+                pd.to_numeric(df['TEMPO_PROCESSAMENTO'], errors='coerce')
+                if 'TEMPO_PROCESSAMENTO' in df.columns else None
+            ),
+            'float64'
+        )
+
+    @cached_property
+    def data_resolucao(self):
+        return self._concatenar(
+            lambda df: pd.to_datetime(df[coluna_resolucao(df)], errors='coerce') if coluna_resolucao(df) else None,
+            'datetime64[ns]'
+        )
+
+    @cached_property
+    def data_abertura(self):
+        return self._concatenar(
+            lambda df: pd.to_datetime(df[coluna_abertura(df)], errors='coerce') if coluna_abertura(df) else None,
+            'datetime64[ns]'
+        )
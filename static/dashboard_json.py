@@ -0,0 +1,73 @@
+"""
+Dados do dashboard como um único artefato JSON.
+
+Os registros diários (quantidade por colaborador, data de resolução e status),
+o resumo por status e as listas usadas nos filtros são montados com operações
+sobre colunas a partir do contexto da análise. O arquivo gravado é entregue
+pelo servidor como está, sem recalcular nada a cada requisição.
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_DASHBOARD = 'dashboard.json'
+
+
+def montar_dados_dashboard(contexto):
+    """
+    Payload do dashboard: 'dados_diarios' (DataFrame com data, colaborador, grupo,
+    status e quantidade), 'resumo_status', 'colaboradores', 'grupos' e
+    'datas_disponiveis'. None se nenhum registro tiver data de resolução válida.
+    """
+    data_resolucao = contexto.data_resolucao
+    validos = contexto.possui_resolucao & data_resolucao.notna().to_numpy()
+    contagem = contexto.base[validos].groupby([
+        'ABA',
+        data_resolucao[validos].dt.normalize().rename('data'),
+        'STATUS'
+    ], observed=True).size()
+    if contagem.empty:
+        return None
+    contagem = contagem.reset_index(name='quantidade')
+
+    # Grupo e colaborador de cada linha a partir do índice da aba
+    aba = contagem['ABA'].to_numpy()
+    grupos = np.array([grupo for grupo, _, _ in contexto.abas], dtype=object)
+    colaboradores = np.array([colaborador for _, colaborador, _ in contexto.abas], dtype=object)
+    diarios = pd.DataFrame({
+        'data': contagem['data'].dt.strftime('%Y-%m-%d'),
+        'colaborador': colaboradores[aba],
+        'grupo': grupos[aba],
+        'status': contagem['STATUS'].astype(str),
+        'quantidade': contagem['quantidade'].astype('int64')
+    })
+
+    return {
+        'dados_diarios': diarios,
+        'resumo_status': {status: int(total) for status, total in diarios.groupby('status')['quantidade'].sum().items()},
+        'colaboradores': pd.unique(diarios['colaborador']).tolist(),
+        'grupos': pd.unique(diarios['grupo']).tolist(),
+        'datas_disponiveis': np.unique(diarios['data'].to_numpy()).tolist()
+    }
+
+
+def gravar_dashboard_json(dados, caminho):
+    """Grava o payload em `caminho` (substituição atômica) e retorna o caminho"""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+
+    resumo = {'gerado_em': datetime.now().isoformat(timespec='seconds')}
+    resumo.update((chave, valor) for chave, valor in dados.items() if chave != 'dados_diarios')
+    # Os registros diários são serializados pelo pandas e inseridos no objeto do resumo
+    registros = dados['dados_diarios'].to_json(orient='records', force_ascii=False)
+    texto = '{"dados_diarios": ' + registros + ', ' + json.dumps(resumo, ensure_ascii=False)[1:]
+
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+    return caminho
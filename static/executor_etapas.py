@@ -0,0 +1,280 @@
+"""
+Execução das etapas da análise como um grafo de dependências.
+
+Cada etapa declara as entradas de que precisa (valores iniciais ou saídas de
+outras etapas). As etapas cujas entradas estão prontas rodam ao mesmo tempo
+em um pool de threads. A chave de cada etapa é o hash do seu código, do
+código dos módulos de que ela depende, dos parâmetros da análise e das chaves
+das entradas; etapas marcadas com `cache=True` gravam a saída em disco sob
+essa chave e, em uma nova execução com as mesmas entradas, a saída é lida do
+disco sem executar a etapa. Etapas com efeitos fora do valor retornado
+(arquivos, banco) não devem usar cache.
+
+O que as etapas exibem durante a execução é acumulado por
+`escrever_saida_etapa` e escrito de uma vez ao fim de cada etapa, na ordem
+em que foram declaradas, para que as tabelas de etapas paralelas não se
+misturem.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # sem psutil a memória não é medida
+    psutil = None
+
+# Incrementar descarta os resultados gravados de todas as etapas
+VERSAO_CACHE = 1
+
+_saida_etapa = threading.local()
+
+
+def hash_valor(valor, sha=None):
+    """Hash do conteúdo de DataFrames, arrays e estruturas de dicionários e listas"""
+    sha = sha or hashlib.sha256()
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        quadro = valor.to_frame() if isinstance(valor, pd.Series) else valor
+        sha.update(repr((type(valor).__name__, list(quadro.columns), [str(dtype) for dtype in quadro.dtypes])).encode('utf-8'))
+        sha.update(pd.util.hash_pandas_object(quadro, index=True).to_numpy().tobytes())
+    elif isinstance(valor, np.ndarray):
+        sha.update(repr((valor.shape, str(valor.dtype))).encode('utf-8'))
+        sha.update(np.ascontiguousarray(valor).tobytes() if valor.dtype != object else repr(valor.tolist()).encode('utf-8'))
+    elif isinstance(valor, dict):
+        sha.update(b'{')
+        for chave, item in valor.items():
+            hash_valor(chave, sha)
+            hash_valor(item, sha)
+        sha.update(b'}')
+    elif isinstance(valor, (list, tuple)):
+        sha.update(b'[')
+        for item in valor:
+            hash_valor(item, sha)
+        sha.update(b']')
+    else:
+        sha.update(f"{type(valor).__name__}:{valor!r};".encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _assinatura_codigo(objeto):
+    """Código-fonte da etapa ou módulo; mudanças na implementação invalidam o cache"""
+    try:
+        return inspect.getsource(objeto)
+    except (OSError, TypeError):
+        return getattr(objeto, '__qualname__', getattr(objeto, '__name__', repr(objeto)))
+
+
+def escrever_saida_etapa(texto):
+    """
+    Acumula `texto` na saída da etapa em execução nesta thread. Retorna False
+    fora de uma etapa, quando quem chamou deve escrever diretamente.
+    """
+    linhas = getattr(_saida_etapa, 'linhas', None)
+    if linhas is None:
+        return False
+    linhas.append(texto)
+    return True
+
+
+class Etapa:
+    def __init__(self, nome, funcao, entradas=(), cache=False, dependencias=()):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.cache = cache
+        self.dependencias = list(dependencias)
+
+
+class ExecutorEtapas:
+    """
+    Grafo de etapas. `parametros` entra na chave de todas as etapas (configurações
+    que alteram os resultados); `notificar(registro)` é chamado ao fim de cada
+    etapa e `escrever(texto)` recebe a saída acumulada de cada etapa.
+    """
+
+    def __init__(self, diretorio_cache=None, max_workers=None, parametros=None, notificar=None, escrever=print):
+        self.diretorio_cache = Path(diretorio_cache) if diretorio_cache else None
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.parametros = repr(parametros)
+        self.notificar = notificar
+        self.escrever = escrever
+        self.etapas = {}
+        self.relatorio = []
+
+    def adicionar(self, nome, funcao, entradas=(), cache=False, dependencias=()):
+        """
+        `dependencias` são os módulos (ou funções) que a etapa chama: o código deles
+        entra na chave, e com ela na das etapas que usam a saída desta
+        """
+        self.etapas[nome] = Etapa(nome, funcao, entradas, cache, dependencias)
+
+    def _ordem_topologica(self, iniciais):
+        ordem, visitadas = [], set(iniciais)
+        pendentes = dict(self.etapas)
+        while pendentes:
+            prontas = [nome for nome, etapa in pendentes.items() if all(e in visitadas for e in etapa.entradas)]
+            if not prontas:
+                faltantes = {nome: [e for e in etapa.entradas if e not in visitadas] for nome, etapa in pendentes.items()}
+                raise ValueError(f"Entradas inexistentes ou ciclo entre etapas: {faltantes}")
+            for nome in prontas:
+                ordem.append(nome)
+                visitadas.add(nome)
+                del pendentes[nome]
+        return ordem
+
+    def _chave(self, etapa, chaves):
+        sha = hashlib.sha256()
+        partes = (
+            str(VERSAO_CACHE), etapa.nome, _assinatura_codigo(etapa.funcao),
+            *(_assinatura_codigo(dependencia) for dependencia in etapa.dependencias),
+            self.parametros, *(chaves[e] for e in etapa.entradas)
+        )
+        for parte in partes:
+            sha.update(parte.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _caminho_cache(self, etapa, chave):
+        return self.diretorio_cache / f"{etapa.nome}-{chave[:24]}.pkl"
+
+    def _ler_cache(self, etapa, chave):
+        if not etapa.cache or self.diretorio_cache is None:
+            return False, None
+        caminho = self._caminho_cache(etapa, chave)
+        if not caminho.exists():
+            return False, None
+        try:
+            with open(caminho, 'rb') as f:
+                return True, pickle.load(f)
+        except Exception as e:
+            print(f"Aviso: cache da etapa {etapa.nome} ilegível: {str(e)}")
+            return False, None
+
+    def _gravar_cache(self, etapa, chave, resultado):
+        if not etapa.cache or self.diretorio_cache is None:
+            return
+        try:
+            self.diretorio_cache.mkdir(parents=True, exist_ok=True)
+            caminho = self._caminho_cache(etapa, chave)
+            temporario = caminho.with_name(caminho.name + '.tmp')
+            with open(temporario, 'wb') as f:
+                pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, caminho)
+            # Versões anteriores da etapa não serão mais usadas
+            for antigo in self.diretorio_cache.glob(f"{etapa.nome}-*.pkl"):
+                if antigo != caminho:
+                    antigo.unlink()
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o cache da etapa {etapa.nome}: {str(e)}")
+
+    @staticmethod
+    def _memoria_mb():
+        return psutil.Process().memory_info().rss / 1024 ** 2 if psutil is not None else None
+
+    def _rodar(self, etapa, argumentos):
+        _saida_etapa.linhas = []
+        inicio = time.perf_counter()
+        memoria_inicio = self._memoria_mb()
+        try:
+            resultado = etapa.funcao(*argumentos)
+        finally:
+            linhas, _saida_etapa.linhas = _saida_etapa.linhas, None
+        memoria_fim = self._memoria_mb()
+        return resultado, {
+            'segundos': time.perf_counter() - inicio,
+            'memoria_mb': memoria_fim - memoria_inicio if memoria_fim is not None else None,
+            'rss_mb': memoria_fim,
+            'saida': linhas
+        }
+
+    def executar(self, iniciais):
+        """Executa todas as etapas e retorna {nome: resultado} (incluindo os valores iniciais)"""
+        ordem = self._ordem_topologica(iniciais)
+        resultados = dict(iniciais)
+        chaves = {nome: hash_valor(valor) for nome, valor in iniciais.items()}
+        for nome in ordem:
+            chaves[nome] = self._chave(self.etapas[nome], chaves)
+        self.relatorio = []
+
+        # Etapas com saída em cache não precisam executar
+        executar = []
+        for nome in ordem:
+            etapa = self.etapas[nome]
+            encontrada, resultado = self._ler_cache(etapa, chaves[nome])
+            if encontrada:
+                resultados[nome] = resultado
+                self._registrar(nome, 'cache', {'segundos': 0.0, 'memoria_mb': None, 'rss_mb': None})
+            else:
+                executar.append(nome)
+
+        # A saída de cada etapa é escrita na ordem em que as etapas foram declaradas
+        ordem_saida = [nome for nome in self.etapas if nome in executar]
+        textos = {}
+
+        def escrever_saidas():
+            while ordem_saida and ordem_saida[0] in textos:
+                self._escrever_saida(textos.pop(ordem_saida.pop(0)))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='etapa') as pool:
+                em_andamento = {}
+                pendentes = list(executar)
+                while pendentes or em_andamento:
+                    for nome in [n for n in pendentes if all(e in resultados for e in self.etapas[n].entradas)]:
+                        etapa = self.etapas[nome]
+                        argumentos = [resultados[e] for e in etapa.entradas]
+                        em_andamento[pool.submit(self._rodar, etapa, argumentos)] = nome
+                        pendentes.remove(nome)
+
+                    concluidas, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                    for futuro in concluidas:
+                        nome = em_andamento.pop(futuro)
+                        try:
+                            resultado, medidas = futuro.result()
+                        except Exception:
+                            for outro in em_andamento:
+                                outro.cancel()
+                            raise
+                        textos[nome] = medidas.pop('saida')
+                        resultados[nome] = resultado
+                        self._gravar_cache(self.etapas[nome], chaves[nome], resultado)
+                        self._registrar(nome, 'executada', medidas)
+                    escrever_saidas()
+        finally:
+            # Em caso de erro, a saída das etapas concluídas não se perde
+            for nome in ordem_saida:
+                self._escrever_saida(textos.pop(nome, []))
+
+        return resultados
+
+    def _escrever_saida(self, linhas):
+        for texto in linhas:
+            self.escrever(texto)
+
+    def _registrar(self, nome, origem, medidas):
+        registro = {'etapa': nome, 'origem': origem, **medidas}
+        self.relatorio.append(registro)
+        if self.notificar is not None:
+            self.notificar(registro)
+
+    def imprimir_relatorio(self, escrever=print):
+        """Tabela com o tempo e a variação de memória de cada etapa; `escrever` recebe cada linha"""
+        escrever("\n=== Etapas da Análise ===")
+        escrever(f"{'ETAPA':<24} {'ORIGEM':<10} {'SEGUNDOS':>9} {'MEMÓRIA (MB)':>13}")
+        ordem = list(self.etapas)
+        for registro in sorted(self.relatorio, key=lambda r: ordem.index(r['etapa'])):
+            memoria = f"{registro['memoria_mb']:+.1f}" if registro['memoria_mb'] is not None else '-'
+            escrever(f"{registro['etapa']:<24} {registro['origem']:<10} {registro['segundos']:>9.3f} {memoria:>13}")
+        picos = [r['rss_mb'] for r in self.relatorio if r.get('rss_mb') is not None]
+        if picos:
+            escrever(f"Memória do processo ao fim das etapas: até {max(picos):.1f} MB")
+        if self.max_workers > 1:
+            escrever("(com etapas em paralelo, a variação de memória de cada etapa é aproximada)")
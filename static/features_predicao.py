@@ -0,0 +1,77 @@
+"""
+Features do modelo de predição de aprovação.
+
+A matriz X tem uma linha por contrato e as colunas de FEATURES_PREDICAO;
+o alvo y indica status prioritário. Tudo é montado com operações sobre
+colunas inteiras, tanto para o treino (a partir do contexto da análise)
+quanto para pontuar lotes de contratos novos (a partir de um DataFrame).
+Como no cálculo original, a hora vem só da coluna HORA. Colunas ausentes e
+células vazias ou inválidas recebem os valores padrão, porque o
+RandomForestClassifier não aceita NaN.
+"""
+import numpy as np
+import pandas as pd
+
+from contexto_analise import extrair_hora
+
+FEATURES_PREDICAO = ['tempo_processamento', 'hora_dia', 'dia_semana']
+
+# Valores usados quando a aba não tem a coluna correspondente ou a célula está vazia
+PADRAO_TEMPO = 0
+PADRAO_HORA = 12
+PADRAO_DIA_SEMANA = 0
+
+_PADROES = np.array([PADRAO_TEMPO, PADRAO_HORA, PADRAO_DIA_SEMANA], dtype=float)
+
+
+def _preencher_padroes(X):
+    """Troca os NaN de cada coluna de X pelo valor padrão da feature"""
+    vazios = np.isnan(X)
+    if vazios.any():
+        X[vazios] = np.broadcast_to(_PADROES, X.shape)[vazios]
+    return X
+
+
+def montar_features(df, status_prioritarios=None):
+    """
+    Matriz X (float64) de um DataFrame com as colunas das abas. Com
+    `status_prioritarios` retorna (X, y), sendo y 1 para status prioritários.
+    """
+    X = np.empty((len(df), len(FEATURES_PREDICAO)))
+    X[:, 0] = (
+        pd.to_numeric(df['TEMPO_PROCESSAMENTO'], errors='coerce').to_numpy(dtype=float)
+        if 'TEMPO_PROCESSAMENTO' in df.columns else PADRAO_TEMPO
+    )
+    X[:, 1] = extrair_hora(df['HORA']).to_numpy(dtype=float) if 'HORA' in df.columns else PADRAO_HORA
+    X[:, 2] = (
+        pd.to_datetime(df['DIA'], errors='coerce').dt.weekday.to_numpy(dtype=float)
+        if 'DIA' in df.columns else PADRAO_DIA_SEMANA
+    )
+    _preencher_padroes(X)
+
+    if status_prioritarios is None:
+        return X
+    y = df['STATUS'].isin(status_prioritarios).to_numpy(dtype=np.int64) if 'STATUS' in df.columns \
+        else np.zeros(len(df), dtype=np.int64)
+    return X, y
+
+
+def montar_features_contexto(contexto):
+    """(X, y) de todas as abas do contexto, usando as colunas derivadas já calculadas"""
+    X = np.empty((len(contexto.base), len(FEATURES_PREDICAO)))
+    X[:, 0] = np.where(
+        contexto.possui_coluna(lambda df: 'TEMPO_PROCESSAMENTO' if 'TEMPO_PROCESSAMENTO' in df.columns else None),
+        contexto.tempo_processamento.to_numpy(dtype=float),
+        PADRAO_TEMPO
+    )
+    X[:, 1] = np.where(
+        contexto.possui_coluna(lambda df: 'HORA' if 'HORA' in df.columns else None),
+        contexto.hora_registro.to_numpy(dtype=float, na_value=np.nan),
+        PADRAO_HORA
+    )
+    X[:, 2] = np.where(
+        contexto.possui_coluna(lambda df: 'DIA' if 'DIA' in df.columns else None),
+        contexto.dia.dt.weekday.to_numpy(dtype=float),
+        PADRAO_DIA_SEMANA
+    )
+    return _preencher_padroes(X), contexto.prioritario.astype(np.int64)
@@ -0,0 +1,115 @@
+"""
+Leitura em fluxo de abas de planilhas para buffers colunares.
+
+As linhas vêm de qualquer iterador de tuplas (``iter_rows(values_only=True)``
+do openpyxl ou ``row_values`` do xlrd) e são transpostas em blocos direto para
+arrays pré-alocados por coluna, sem montar a lista de listas intermediária.
+"""
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# Quantidade de linhas transpostas por vez
+TAMANHO_BLOCO_PADRAO = 5000
+
+
+def formatar_cabecalho(linha):
+    """Converte a primeira linha da aba em nomes de coluna; células vazias (ou 0) viram ColN"""
+    return [str(valor).strip() if valor else f"Col{i}" for i, valor in enumerate(linha)]
+
+
+def formatar_cabecalho_xlrd(linha):
+    """Cabeçalho das abas lidas pelo xlrd: o texto de cada célula, mesmo vazio"""
+    return [str(valor).strip() for valor in linha]
+
+
+def iterar_blocos(linhas, n_colunas, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Agrupa as linhas em blocos, ajustando cada uma ao número de colunas"""
+    while True:
+        bloco = list(islice(linhas, tamanho_bloco))
+        if not bloco:
+            return
+        yield [
+            linha if len(linha) == n_colunas else (tuple(linha) + (None,) * n_colunas)[:n_colunas]
+            for linha in bloco
+        ]
+
+
+def tipar_coluna(valores):
+    """Infere o tipo da coluna como o construtor do DataFrame faria"""
+    return pd.Series(valores, dtype=object).infer_objects()
+
+
+def ler_colunas(linhas, tamanho_bloco=TAMANHO_BLOCO_PADRAO, formatar=formatar_cabecalho):
+    """
+    Lê uma aba a partir de um iterador de linhas (a primeira é o cabeçalho,
+    convertida por `formatar`) e retorna um DataFrame com colunas tipadas.
+    """
+    linhas = iter(linhas)
+    primeira = next(linhas, None)
+    if primeira is None:
+        return pd.DataFrame()
+
+    cabecalho = formatar(primeira)
+    n_colunas = len(cabecalho)
+    capacidade = tamanho_bloco
+    buffers = [np.empty(capacidade, dtype=object) for _ in range(n_colunas)]
+    total = 0
+
+    for bloco in iterar_blocos(linhas, n_colunas, tamanho_bloco):
+        n = len(bloco)
+        if total + n > capacidade:
+            capacidade = max(capacidade * 2, total + n)
+            novos = [np.empty(capacidade, dtype=object) for _ in range(n_colunas)]
+            for novo, antigo in zip(novos, buffers):
+                novo[:total] = antigo[:total]
+            buffers = novos
+
+        # zip(*bloco) transpõe o bloco inteiro de uma vez
+        for buffer, valores in zip(buffers, zip(*bloco)):
+            buffer[total:total + n] = valores
+        total += n
+
+    df = pd.DataFrame({i: tipar_coluna(buffer[:total]) for i, buffer in enumerate(buffers)})
+    df.columns = cabecalho
+    return df
+
+
+def ler_colunas_em_blocos(linhas, linhas_por_bloco, formatar=formatar_cabecalho):
+    """
+    Lê uma aba em DataFrames de até ``linhas_por_bloco`` linhas, todos com o
+    cabeçalho da primeira linha. Apenas um bloco fica em memória por vez. O
+    tipo de cada bloco é inferido só com os valores dele; para juntar os blocos
+    use ``concatenar_blocos``.
+    """
+    linhas = iter(linhas)
+    primeira = next(linhas, None)
+    if primeira is None:
+        return
+
+    cabecalho = formatar(primeira)
+    for bloco in iterar_blocos(linhas, len(cabecalho), linhas_por_bloco):
+        df = pd.DataFrame({i: tipar_coluna(valores) for i, valores in enumerate(zip(*bloco))})
+        df.columns = cabecalho
+        yield df
+
+
+def concatenar_blocos(blocos):
+    """
+    Concatena os blocos de ``ler_colunas_em_blocos`` com os tipos que a leitura
+    da aba inteira teria: colunas que ficaram como objeto (por exemplo, vazias
+    no primeiro bloco e numéricas depois) são inferidas de novo sobre todos os
+    valores.
+    """
+    df = pd.concat(blocos, ignore_index=True)
+    if df.shape[1] == 0 or not (df.dtypes == object).any():
+        return df
+    # Por posição: a aba pode ter cabeçalhos repetidos
+    colunas = [
+        tipar_coluna(df.iloc[:, i]) if df.dtypes.iloc[i] == object else df.iloc[:, i]
+        for i in range(df.shape[1])
+    ]
+    tipado = pd.concat(colunas, axis=1)
+    tipado.columns = df.columns
+    return tipado
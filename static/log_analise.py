@@ -0,0 +1,42 @@
+"""
+Log da análise executada em lote.
+
+Fora do terminal (servidor, processo de importação) as etapas não imprimem
+as tabelas do console: as mensagens vão para o logger `analise`, que descarta
+sem formatar o que estiver abaixo do nível configurado e acumula o restante
+em memória, escrevendo de uma vez quando o buffer enche, quando chega um
+erro ou ao fim da execução.
+"""
+import logging
+import sys
+from logging.handlers import MemoryHandler
+
+NOME_LOGGER = 'analise'
+FORMATO = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+log = logging.getLogger(NOME_LOGGER)
+
+
+def configurar_log(nivel=logging.INFO, destino=None, capacidade=500):
+    """
+    Direciona o logger `analise` para `destino` (arquivo) ou stderr, com um
+    buffer de `capacidade` registros. `nivel` aceita o número ou o nome ('DEBUG').
+    """
+    descarregar_log(fechar=True)
+    alvo = logging.FileHandler(destino, encoding='utf-8') if destino else logging.StreamHandler(sys.stderr)
+    alvo.setFormatter(logging.Formatter(FORMATO))
+    log.addHandler(MemoryHandler(capacidade, flushLevel=logging.ERROR, target=alvo))
+    log.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    log.propagate = False
+    return log
+
+
+def descarregar_log(fechar=False):
+    """Escreve os registros acumulados; com `fechar`, remove os handlers"""
+    for handler in list(log.handlers):
+        handler.flush()
+        if fechar:
+            log.removeHandler(handler)
+            if isinstance(handler, MemoryHandler) and handler.target is not None:
+                handler.target.close()
+            handler.close()
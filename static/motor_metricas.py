@@ -0,0 +1,119 @@
+"""
+Motor de métricas por colaborador.
+
+Todas as abas são concatenadas uma única vez em um DataFrame longo, em que
+cada linha traz o índice da aba e o código inteiro do status. Contagens,
+dias distintos e tempos de aprovação de todos os colaboradores saem de
+tabelas cruzadas (bincount) sobre essas chaves inteiras, sem laços por
+colaborador ou por status.
+"""
+import numpy as np
+import pandas as pd
+
+from status_contratos import CODIGOS_STATUS, STATUS_CONTRATOS, codigos_status
+
+COLUNAS_METRICAS = [
+    'grupo', 'colaborador', 'total_registros', 'aprovados', 'pendentes',
+    'taxa_prioritarios', 'produtividade_hora', 'produtividade_prioritarios',
+    'tempo_medio_dias', 'score_eficiencia'
+]
+
+
+def consolidar_colaboradores(dados_grupos):
+    """
+    Concatena as abas de todos os grupos. Retorna (longo, abas): `longo` tem as
+    colunas ABA (índice em `abas`), STATUS (código int16), DIA (código do dia
+    dentro do conjunto) e TEMPO_PROCESSAMENTO; `abas` tem grupo e colaborador
+    categóricos e indica se a aba possui a coluna de tempo.
+    """
+    aba, status, dia, tempo = [], [], [], []
+    abas = []
+    for grupo, dados in dados_grupos.items():
+        for colaborador, df in dados['colaboradores'].items():
+            if df.empty:
+                continue
+
+            n = len(df)
+            possui_tempo = 'TEMPO_PROCESSAMENTO' in df.columns
+            aba.append(np.full(n, len(abas), dtype=np.int32))
+            status.append(codigos_status(df['STATUS']) if 'STATUS' in df.columns else np.full(n, -1, dtype=np.int16))
+            # Sem a coluna DIA a aba conta como um único dia
+            dia.append(df['DIA'].to_numpy(dtype=object) if 'DIA' in df.columns else np.zeros(n, dtype=object))
+            tempo.append(
+                pd.to_numeric(df['TEMPO_PROCESSAMENTO'], errors='coerce').to_numpy(dtype=float)
+                if possui_tempo else np.full(n, np.nan)
+            )
+            abas.append((grupo, colaborador, possui_tempo))
+
+    if not abas:
+        return None, None
+
+    longo = pd.DataFrame({
+        'ABA': np.concatenate(aba),
+        'STATUS': np.concatenate(status),
+        # Dias vazios (-1) viram o código 0 e contam como um valor distinto
+        'DIA': pd.factorize(np.concatenate(dia))[0] + 1,
+        'TEMPO_PROCESSAMENTO': np.concatenate(tempo)
+    })
+    abas = pd.DataFrame(abas, columns=['grupo', 'colaborador', 'possui_tempo'])
+    abas['grupo'] = abas['grupo'].astype('category')
+    abas['colaborador'] = abas['colaborador'].astype('category')
+    return longo, abas
+
+
+def tabela_cruzada(chave_linha, chave_coluna, n_linhas, n_colunas):
+    """Tabela cruzada de duas chaves inteiras (0..n-1) calculada com um único bincount"""
+    combinada = chave_linha.astype(np.int64) * n_colunas + chave_coluna
+    tabela = np.bincount(combinada, minlength=n_linhas * n_colunas)
+    return tabela.reshape(n_linhas, n_colunas)
+
+
+def calcular_metricas_colaboradores(dados_grupos, horas_trabalho):
+    """Equivalente vetorizado de AnalisadorInteligente.calcular_metricas_avancadas"""
+    longo, abas = consolidar_colaboradores(dados_grupos)
+    if longo is None:
+        return pd.DataFrame()
+
+    n_abas = len(abas)
+    chave_aba = longo['ABA'].to_numpy()
+    codigo_status = longo['STATUS'].to_numpy()
+
+    # Abas x status; a coluna 0 recebe os status fora do vocabulário e os ausentes (-1)
+    contagem = tabela_cruzada(chave_aba, np.maximum(codigo_status, 0), n_abas, len(STATUS_CONTRATOS) + 1)
+    total_registros = contagem.sum(axis=1)
+    aprovados = contagem[:, CODIGOS_STATUS['APROVADO']]
+    pendentes = contagem[:, CODIGOS_STATUS['PENDENTE']]
+
+    # Dias distintos: pares (aba, dia) únicos contados por aba
+    dia = longo['DIA'].to_numpy()
+    pares = np.unique(chave_aba.astype(np.int64) * (dia.max() + 1) + dia)
+    dias_unicos = np.bincount(pares // (dia.max() + 1), minlength=n_abas)
+
+    # Tempo médio dos aprovados (NaN se todos os tempos forem vazios);
+    # 0 quando a aba não tem a coluna ou não há aprovados
+    tempo = longo['TEMPO_PROCESSAMENTO'].to_numpy()
+    validos = (codigo_status == CODIGOS_STATUS['APROVADO']) & ~np.isnan(tempo)
+    soma_tempo = np.bincount(chave_aba[validos], weights=tempo[validos], minlength=n_abas)
+    n_tempo = np.bincount(chave_aba[validos], minlength=n_abas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tempo_medio = soma_tempo / n_tempo
+    tempo_medio = np.where(abas['possui_tempo'].to_numpy() & (aprovados > 0), tempo_medio, 0.0)
+
+    taxa_prioritarios = np.where(total_registros > 0, aprovados / np.maximum(total_registros, 1) * 100, 0.0)
+    horas_totais = dias_unicos * horas_trabalho
+    with np.errstate(divide='ignore', invalid='ignore'):
+        produtividade_hora = np.where(horas_totais > 0, total_registros / horas_totais, 0.0)
+        produtividade_prioritarios = np.where(horas_totais > 0, aprovados / horas_totais, 0.0)
+
+    return pd.DataFrame({
+        'grupo': abas['grupo'].astype(str).to_numpy(),
+        'colaborador': abas['colaborador'].astype(str).to_numpy(),
+        'total_registros': total_registros,
+        'aprovados': aprovados,
+        'pendentes': pendentes,
+        'taxa_prioritarios': taxa_prioritarios,
+        'produtividade_hora': produtividade_hora,
+        'produtividade_prioritarios': produtividade_prioritarios,
+        'tempo_medio_dias': tempo_medio,
+        'score_eficiencia': taxa_prioritarios * 0.4 + produtividade_hora * 0.3 + produtividade_prioritarios * 0.3
+    }, columns=COLUNAS_METRICAS)
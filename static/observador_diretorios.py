@@ -0,0 +1,170 @@
+"""
+Observador dos diretórios de dados.
+
+Usa o watchdog (inotify no Linux) quando disponível e, sem ele, compara
+periodicamente mtime e tamanho das planilhas. Cada alteração só é repassada
+quando o arquivo para de mudar por alguns segundos e o pacote está completo,
+evitando disparar a ingestão no meio de uma cópia ou de um salvamento.
+"""
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # sem watchdog o observador usa polling
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _ManipuladorEventos(FileSystemEventHandler):
+    """Encaminha ao observador os caminhos tocados por eventos do sistema de arquivos"""
+
+    def __init__(self, observador):
+        self.observador = observador
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for caminho in (event.src_path, getattr(event, 'dest_path', None)):
+            if caminho:
+                self.observador.marcar(Path(caminho))
+
+
+class ObservadorDiretorios:
+    """
+    Observa os arquivos `nomes_arquivos` nos `diretorios` e chama
+    `ao_alterar(caminho)` uma vez por alteração concluída.
+    """
+
+    def __init__(self, diretorios, nomes_arquivos, ao_alterar,
+                 espera=2.0, intervalo_polling=5.0, usar_inotify=True):
+        self.diretorios = [Path(d).resolve() for d in diretorios if Path(d).is_dir()]
+        self.nomes_arquivos = set(nomes_arquivos)
+        self.ao_alterar = ao_alterar
+        self.espera = espera
+        self.intervalo_polling = intervalo_polling
+        self.usar_inotify = usar_inotify and Observer is not None
+        # inotify pedido, mas o watchdog não está instalado
+        self.sem_watchdog = usar_inotify and Observer is None
+
+        self._pendentes = {}  # caminho -> (momento do último evento, assinatura)
+        self._assinaturas = {}  # última versão repassada de cada arquivo
+        self._varridas = {}  # assinatura vista na última varredura (modo polling)
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    @property
+    def modo(self):
+        return 'inotify' if self.usar_inotify else 'polling'
+
+    def iniciar(self):
+        if self._thread is not None:
+            return
+        # Estado inicial: arquivos já existentes não disparam ingestão
+        self._assinaturas = {caminho: self._assinatura(caminho) for caminho in self._arquivos_observados()}
+        self._varridas = dict(self._assinaturas)
+
+        if self.usar_inotify:
+            self._observer = Observer()
+            manipulador = _ManipuladorEventos(self)
+            for diretorio in self.diretorios:
+                self._observer.schedule(manipulador, str(diretorio), recursive=False)
+            self._observer.start()
+
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name='observador-diretorios', daemon=True)
+        self._thread.start()
+        print(f"Observando {[str(d) for d in self.diretorios]} ({self.modo})")
+        if self.sem_watchdog:
+            print("Aviso: watchdog não instalado; alterações detectadas por polling "
+                  f"a cada {self.intervalo_polling:g}s")
+
+    def parar(self):
+        self._parar.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def marcar(self, caminho):
+        """Registra um evento em um arquivo observado, reiniciando a espera"""
+        if caminho.name not in self.nomes_arquivos:
+            return
+        caminho = caminho.resolve()
+        if caminho.parent not in self.diretorios:
+            return
+        with self._trava:
+            assinatura = self._pendentes.get(caminho, (None, None))[1]
+            self._pendentes[caminho] = (time.monotonic(), assinatura)
+
+    def _arquivos_observados(self):
+        return [d / nome for d in self.diretorios for nome in self.nomes_arquivos if (d / nome).exists()]
+
+    @staticmethod
+    def _assinatura(caminho):
+        try:
+            stat = caminho.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def _arquivo_completo(caminho):
+        """Planilhas .xlsx só estão completas quando o diretório central do zip foi gravado"""
+        if caminho.suffix.lower() != '.xlsx':
+            return True
+        return zipfile.is_zipfile(caminho)
+
+    def _varrer(self):
+        """Modo polling: marca os arquivos cuja assinatura mudou desde a última varredura"""
+        for diretorio in self.diretorios:
+            for nome in self.nomes_arquivos:
+                caminho = diretorio / nome
+                assinatura = self._assinatura(caminho)
+                if assinatura is not None and assinatura != self._varridas.get(caminho):
+                    self._varridas[caminho] = assinatura
+                    self.marcar(caminho)
+
+    def _verificar_pendentes(self):
+        """Dispara os arquivos que ficaram estáveis durante o período de espera"""
+        agora = time.monotonic()
+        prontos = []
+        with self._trava:
+            for caminho, (ultimo_evento, assinatura_anterior) in list(self._pendentes.items()):
+                if agora - ultimo_evento < self.espera:
+                    continue
+                assinatura = self._assinatura(caminho)
+                if assinatura is None:
+                    # Arquivo removido ou renomeado durante o salvamento
+                    del self._pendentes[caminho]
+                elif assinatura != assinatura_anterior or not self._arquivo_completo(caminho):
+                    # Ainda mudando: esperar mais um período
+                    self._pendentes[caminho] = (agora, assinatura)
+                else:
+                    del self._pendentes[caminho]
+                    if assinatura != self._assinaturas.get(caminho):
+                        self._assinaturas[caminho] = assinatura
+                        prontos.append(caminho)
+
+        for caminho in prontos:
+            try:
+                self.ao_alterar(caminho)
+            except Exception as e:
+                print(f"Erro ao processar alteração em {caminho.name}: {str(e)}")
+
+    def _executar(self):
+        ultimo_polling = 0.0
+        while not self._parar.is_set():
+            if not self.usar_inotify and time.monotonic() - ultimo_polling >= self.intervalo_polling:
+                self._varrer()
+                ultimo_polling = time.monotonic()
+            self._verificar_pendentes()
+            self._parar.wait(min(0.5, self.espera / 2))
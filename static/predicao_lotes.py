@@ -0,0 +1,95 @@
+"""
+Micro-lotes de predição.
+
+Pedidos que chegam quase ao mesmo tempo são reunidos em uma única matriz e
+pontuados com uma chamada vetorizada ao modelo. O lote é despachado quando
+atinge `tamanho_lote` linhas ou depois de `espera` segundos do primeiro
+pedido, o que vier antes. Cada pedido recebe a latência e o tamanho do lote
+em que foi pontuado.
+"""
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ModeloIndisponivel(RuntimeError):
+    """Nenhum modelo de predição treinado ou registrado"""
+
+
+class AgrupadorPredicoes:
+    """Reúne os pedidos em micro-lotes e chama `prever_lote(X)` uma vez por lote"""
+
+    def __init__(self, prever_lote, tamanho_lote=256, espera=0.005, historico=1000):
+        self.prever_lote = prever_lote
+        self.tamanho_lote = tamanho_lote
+        self.espera = espera
+
+        self._pendentes = []  # (X, futuro)
+        self._linhas_pendentes = 0
+        self._temporizador = None
+
+        self.lotes = 0
+        self.requisicoes = 0
+        self.linhas = 0
+        self._latencias = deque(maxlen=historico)
+
+    async def prever(self, X):
+        """Retorna (probabilidades, dados do lote) para as linhas de X"""
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        futuro = loop.create_future()
+        self._pendentes.append((X, futuro))
+        self._linhas_pendentes += len(X)
+
+        if self._linhas_pendentes >= self.tamanho_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.espera, self._despachar)
+
+        probabilidades, lote = await futuro
+        latencia = time.perf_counter() - inicio
+        self.requisicoes += 1
+        self._latencias.append(latencia)
+        return probabilidades, {'latencia_ms': round(latencia * 1000, 3), **lote}
+
+    def _despachar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        pendentes, self._pendentes = self._pendentes, []
+        self._linhas_pendentes = 0
+        if pendentes:
+            asyncio.ensure_future(self._pontuar(pendentes))
+
+    async def _pontuar(self, pendentes):
+        X = np.concatenate([x for x, _ in pendentes])
+        try:
+            # A predição roda fora do event loop para não atrasar os demais pedidos
+            probabilidades = await asyncio.get_running_loop().run_in_executor(None, self.prever_lote, X)
+        except Exception as e:
+            for _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.linhas += len(X)
+        lote = {'tamanho_lote': len(X), 'requisicoes_lote': len(pendentes)}
+        inicio = 0
+        for x, futuro in pendentes:
+            if not futuro.done():
+                futuro.set_result((probabilidades[inicio:inicio + len(x)], lote))
+            inicio += len(x)
+
+    def estatisticas(self):
+        latencias = np.array(self._latencias) * 1000
+        return {
+            'requisicoes': self.requisicoes,
+            'lotes': self.lotes,
+            'linhas': self.linhas,
+            'tamanho_medio_lote': round(self.linhas / self.lotes, 2) if self.lotes else 0,
+            'latencia_media_ms': round(float(latencias.mean()), 3) if len(latencias) else None,
+            'latencia_p95_ms': round(float(np.percentile(latencias, 95)), 3) if len(latencias) else None
+        }
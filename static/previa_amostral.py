@@ -0,0 +1,155 @@
+"""
+Prévia aproximada da análise a partir de uma amostra estratificada.
+
+Cada aba (colaborador) é um estrato: dela é sorteada, sem reposição, uma
+fração dos registros, com um mínimo por aba. Pela amostra são estimados a
+distribuição de status de cada colaborador, dos grupos e do total e o score
+de eficiência do ranking, com intervalos de confiança do estimador
+estratificado (aproximação normal com correção para população finita). O
+tamanho de cada aba é conhecido, então o total de registros é exato; todo o
+resto sai marcado como aproximado.
+"""
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from motor_metricas import consolidar_colaboradores, tabela_cruzada
+from status_contratos import STATUS_CONTRATOS
+
+FRACAO_PREVIA = 0.1
+MINIMO_POR_ABA = 30
+CONFIANCA_PREVIA = 0.95
+
+AVISO_PREVIA = ('Prévia aproximada: valores estimados a partir de uma amostra aleatória de cada colaborador. '
+                'Execute a análise completa para os valores exatos.')
+
+# Coluna 0 das contagens: status fora do vocabulário ou ausentes
+_NOMES_STATUS = ['OUTROS'] + STATUS_CONTRATOS
+
+
+def amostrar_abas(dados_grupos, fracao=FRACAO_PREVIA, minimo=MINIMO_POR_ABA, semente=None):
+    """
+    Amostra de cada aba não vazia: max(minimo, fracao do tamanho), limitada ao
+    tamanho da aba. Retorna (amostra no formato de dados_grupos, tamanhos das
+    abas na ordem em que aparecem na amostra).
+    """
+    gerador = np.random.default_rng(semente)
+    amostra = {}
+    tamanhos = []
+    for grupo, dados in dados_grupos.items():
+        colaboradores = {}
+        for colaborador, df in dados['colaboradores'].items():
+            if df.empty:
+                continue
+            n = min(len(df), max(minimo, math.ceil(fracao * len(df))))
+            posicoes = np.sort(gerador.choice(len(df), size=n, replace=False))
+            colaboradores[colaborador] = df.iloc[posicoes]
+            tamanhos.append(len(df))
+        amostra[grupo] = {'colaboradores': colaboradores}
+    return amostra, np.array(tamanhos, dtype=np.int64)
+
+
+def _intervalo(estimativa, erro_padrao, z, limite):
+    """Extremos do intervalo de confiança, limitados a [0, limite]"""
+    return np.maximum(estimativa - z * erro_padrao, 0.0), np.minimum(estimativa + z * erro_padrao, limite)
+
+
+def _resumo_status(total, variancia, registros, z, casas=1):
+    """{status: {'estimativa', 'minimo', 'maximo', 'percentual'}} dos status presentes na amostra"""
+    minimos, maximos = _intervalo(total, np.sqrt(variancia), z, registros)
+    return {
+        nome: {
+            'estimativa': round(float(estimativa), casas),
+            'minimo': round(float(minimo), casas),
+            'maximo': round(float(maximo), casas),
+            'percentual': round(float(estimativa / registros * 100), 2) if registros else 0.0
+        }
+        for nome, estimativa, minimo, maximo in zip(_NOMES_STATUS, total, minimos, maximos)
+        if estimativa > 0
+    }
+
+
+def estimar_previa(amostra, tamanhos, horas_trabalho, confianca=CONFIANCA_PREVIA, fracao=FRACAO_PREVIA,
+                   minimo=MINIMO_POR_ABA):
+    """
+    Estimativas da distribuição de status (total, grupos, colaboradores) e do
+    ranking a partir de `amostra` e dos `tamanhos` das abas. O score segue a
+    fórmula de motor_metricas; como ele é linear na taxa de aprovados, o
+    intervalo vem do erro padrão dessa taxa.
+    """
+    longo, abas = consolidar_colaboradores(amostra)
+    z = NormalDist().inv_cdf((1 + confianca) / 2)
+    if longo is None:
+        return {'aproximado': True, 'aviso': AVISO_PREVIA, 'amostra': {}, 'status': {}, 'grupos': {}, 'ranking': []}
+
+    n_abas = len(abas)
+    chave_aba = longo['ABA'].to_numpy()
+    contagem = tabela_cruzada(chave_aba, np.maximum(longo['STATUS'].to_numpy(), 0), n_abas, len(_NOMES_STATUS))
+    n = contagem.sum(axis=1)
+    N = tamanhos.astype(np.float64)
+
+    # Proporção de cada status por aba e variância com correção para população finita
+    p = contagem / n[:, None]
+    fpc = np.where(N > 1, (N - n) / np.maximum(N - 1, 1), 0.0)
+    variancia_p = np.where(n[:, None] > 1, p * (1 - p) / np.maximum(n[:, None] - 1, 1), 0.0) * fpc[:, None]
+    total = N[:, None] * p
+    variancia_total = N[:, None] ** 2 * variancia_p
+
+    # Totais dos grupos e geral: estratos independentes, as variâncias somam
+    grupos = abas['grupo'].astype(str).to_numpy()
+    colaboradores = abas['colaborador'].astype(str).to_numpy()
+    resumo_grupos = {}
+    for grupo in dict.fromkeys(grupos):
+        linhas = grupos == grupo
+        registros = int(tamanhos[linhas].sum())
+        resumo_grupos[grupo] = {
+            'registros': registros,
+            'status': _resumo_status(total[linhas].sum(axis=0), variancia_total[linhas].sum(axis=0), registros, z)
+        }
+
+    # Ranking: dias distintos da amostra, como no cálculo completo
+    dia = longo['DIA'].to_numpy()
+    pares = np.unique(chave_aba.astype(np.int64) * (dia.max() + 1) + dia)
+    horas = np.bincount(pares // (dia.max() + 1), minlength=n_abas) * horas_trabalho
+    coluna_aprovado = _NOMES_STATUS.index('APROVADO')
+    taxa = p[:, coluna_aprovado]
+    erro_taxa = np.sqrt(variancia_p[:, coluna_aprovado])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        produtividade_hora = np.where(horas > 0, N / horas, 0.0)
+    # produtividade_prioritarios = taxa * produtividade_hora
+    score = taxa * 100 * 0.4 + produtividade_hora * 0.3 + taxa * produtividade_hora * 0.3
+    erro_score = erro_taxa * (100 * 0.4 + produtividade_hora * 0.3)
+
+    ranking = []
+    for i in np.argsort(-score, kind='stable'):
+        ranking.append({
+            'posicao': len(ranking) + 1,
+            'grupo': grupos[i],
+            'colaborador': colaboradores[i],
+            'registros': int(tamanhos[i]),
+            'amostrados': int(n[i]),
+            'taxa_prioritarios': round(float(taxa[i] * 100), 2),
+            'taxa_prioritarios_minimo': round(float(max(taxa[i] - z * erro_taxa[i], 0) * 100), 2),
+            'taxa_prioritarios_maximo': round(float(min(taxa[i] + z * erro_taxa[i], 1) * 100), 2),
+            'score_eficiencia': round(float(score[i]), 2),
+            'score_minimo': round(float(score[i] - z * erro_score[i]), 2),
+            'score_maximo': round(float(score[i] + z * erro_score[i]), 2),
+            'status': _resumo_status(total[i], variancia_total[i], int(tamanhos[i]), z)
+        })
+
+    registros = int(tamanhos.sum())
+    return {
+        'aproximado': True,
+        'aviso': AVISO_PREVIA,
+        'amostra': {
+            'fracao': fracao,
+            'minimo_por_colaborador': minimo,
+            'confianca': confianca,
+            'registros_amostrados': int(n.sum()),
+            'registros_total': registros
+        },
+        'status': _resumo_status(total.sum(axis=0), variancia_total.sum(axis=0), registros, z),
+        'grupos': resumo_grupos,
+        'ranking': ranking
+    }
@@ -0,0 +1,253 @@
+"""
+Previsão diária de contratos pendentes por colaborador e por grupo.
+
+A fila de cada aba é reconstruída pelas datas de abertura e de resolução: um
+contrato conta como pendente do dia em que foi aberto até a véspera da
+resolução; os que ainda têm status pendente ou não têm data de resolução
+continuam na fila até o último dia da série. Um único
+GradientBoostingRegressor é treinado com as defasagens de todas as abas de uma
+vez e prevê a variação da fila no dia seguinte; a previsão avança dia a dia
+para todas as abas juntas. O resultado fica no banco do dashboard com a versão
+dos dados que o gerou, e só é recalculado quando essa versão muda.
+"""
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+
+from registro_modelos import fingerprint_treino
+
+# Status que mantêm o contrato na fila independentemente da data de resolução
+STATUS_PENDENTES = ['PENDENTE']
+
+DEFASAGENS = (1, 2, 3, 7, 14)
+JANELA_MEDIA = 7
+HORIZONTE_PADRAO = 14
+
+FEATURES_BACKLOG = (
+    ['pendentes']
+    + [f'variacao_{defasagem}d' for defasagem in DEFASAGENS]
+    + [f'distancia_media_{JANELA_MEDIA}d', 'dia_semana_seguinte']
+)
+
+# Dias de histórico necessários para as features de um dia
+_HISTORICO = max(max(DEFASAGENS), JANELA_MEDIA - 1)
+
+
+def serie_pendentes(contexto, status_pendentes=STATUS_PENDENTES):
+    """
+    (datas, pendentes): os dias da primeira abertura à última movimentação e a
+    matriz (dias × abas do contexto) de contratos pendentes ao fim de cada dia
+    """
+    abertura = contexto.data_abertura.dt.normalize()
+    validos = abertura.notna().to_numpy()
+    if not validos.any():
+        return pd.DatetimeIndex([]), np.zeros((0, len(contexto.abas)), dtype=np.int64)
+
+    resolucao = contexto.data_resolucao.dt.normalize()
+    na_fila = contexto.base['STATUS'].isin(status_pendentes).to_numpy() | resolucao.isna().to_numpy()
+    resolucao = resolucao.where(~na_fila)
+
+    inicio = abertura[validos].min()
+    fim = pd.concat([abertura[validos], resolucao[validos]]).max()
+    datas = pd.date_range(inicio, fim, freq='D')
+
+    # Entrada no dia da abertura e saída no dia da resolução (nunca antes da entrada);
+    # quem continua na fila sai na posição além do último dia
+    entrada = (abertura[validos] - inicio).dt.days.to_numpy()
+    saida = (resolucao[validos] - inicio).dt.days.fillna(len(datas)).to_numpy(dtype=np.int64)
+    saida = np.maximum(saida, entrada)
+    aba = contexto.base['ABA'].to_numpy()[validos]
+
+    variacoes = np.zeros((len(datas) + 1, len(contexto.abas)), dtype=np.int64)
+    np.add.at(variacoes, (entrada, aba), 1)
+    np.add.at(variacoes, (saida, aba), -1)
+    return datas, np.cumsum(variacoes[:-1], axis=0)
+
+
+def montar_features_backlog(pendentes, dia_semana_seguinte):
+    """
+    Features (dias × abas × FEATURES_BACKLOG) de cada dia: pendentes, variação
+    desde cada defasagem, distância da média móvel e dia da semana seguinte.
+    Dias sem histórico suficiente ficam com NaN.
+    """
+    dias, abas = pendentes.shape
+    nivel = pendentes.astype(np.float64)
+    features = np.full((dias, abas, len(FEATURES_BACKLOG)), np.nan)
+    features[:, :, 0] = nivel
+    for i, defasagem in enumerate(DEFASAGENS, start=1):
+        features[defasagem:, :, i] = nivel[defasagem:] - nivel[:-defasagem]
+    acumulado = np.vstack([np.zeros((1, abas)), np.cumsum(nivel, axis=0)])
+    features[JANELA_MEDIA - 1:, :, -2] = (
+        (acumulado[JANELA_MEDIA:] - acumulado[:-JANELA_MEDIA]) / JANELA_MEDIA - nivel[JANELA_MEDIA - 1:]
+    )
+    features[:, :, -1] = np.asarray(dia_semana_seguinte, dtype=np.float64)[:, None]
+    return features
+
+
+def montar_treino_backlog(datas, pendentes):
+    """
+    (X, y) com uma linha por aba e dia que tenha histórico e dia seguinte;
+    y é a variação de pendentes para o dia seguinte
+    """
+    dia_semana_seguinte = (datas + pd.Timedelta(days=1)).weekday
+    features = montar_features_backlog(pendentes, dia_semana_seguinte)[_HISTORICO:-1]
+    y = np.diff(pendentes, axis=0)[_HISTORICO:].astype(np.float64)
+    # Dias anteriores à primeira abertura de cada aba não dizem nada sobre ela
+    ativo = np.maximum.accumulate(pendentes > 0, axis=0)[_HISTORICO:-1]
+    return features[ativo], y[ativo]
+
+
+def prever_pendentes(modelo, datas, pendentes, horizonte=HORIZONTE_PADRAO):
+    """
+    (datas_previstas, matriz horizonte × abas) avançando a série um dia por vez,
+    com a previsão de cada dia alimentando as features do seguinte
+    """
+    historico = pendentes[-(_HISTORICO + 1):].astype(np.float64)
+    datas_previstas = pd.date_range(datas[-1] + pd.Timedelta(days=1), periods=horizonte, freq='D')
+    previstos = np.empty((horizonte, pendentes.shape[1]))
+    for passo, data in enumerate(datas_previstas):
+        dia_semana = np.full(len(historico), data.weekday())
+        X = montar_features_backlog(historico, dia_semana)[-1]
+        previstos[passo] = np.maximum(historico[-1] + modelo.predict(X), 0)
+        historico = np.vstack([historico[1:], previstos[passo]])
+    return datas_previstas, previstos
+
+
+def tabela_previsoes(contexto, datas_previstas, previstos):
+    """
+    Previsões em formato longo (grupo, colaborador, data, pendentes); as linhas
+    com colaborador None são os totais do grupo
+    """
+    dias, abas = previstos.shape
+    colaboradores = pd.DataFrame({
+        'grupo': np.tile([grupo for grupo, _, _ in contexto.abas], dias),
+        'colaborador': np.tile([colaborador for _, colaborador, _ in contexto.abas], dias),
+        'data': np.repeat(datas_previstas.strftime('%Y-%m-%d'), abas),
+        'pendentes': previstos.ravel()
+    })
+    grupos = colaboradores.groupby(['grupo', 'data'], sort=False)['pendentes'].sum().reset_index()
+    grupos.insert(1, 'colaborador', None)
+    return pd.concat([grupos, colaboradores], ignore_index=True)
+
+
+class PrevisoesBacklog:
+    """Tabela previsoes_backlog do banco do dashboard, com a versão dos dados de cada previsão"""
+
+    def __init__(self, caminho_db):
+        self.caminho_db = str(caminho_db)
+
+    def conectar(self):
+        return sqlite3.connect(self.caminho_db)
+
+    def criar_tabelas(self, conn):
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS previsoes_backlog (
+            versao TEXT NOT NULL,
+            gerado_em TEXT NOT NULL,
+            grupo TEXT NOT NULL,
+            colaborador TEXT,
+            data DATE NOT NULL,
+            pendentes REAL NOT NULL
+        )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_previsoes_backlog ON previsoes_backlog (grupo, colaborador, data)')
+
+    def versao(self):
+        """(versao, gerado_em) da previsão gravada, ou None"""
+        conn = self.conectar()
+        try:
+            self.criar_tabelas(conn)
+            return conn.execute('SELECT versao, gerado_em FROM previsoes_backlog LIMIT 1').fetchone()
+        finally:
+            conn.close()
+
+    def gravar(self, versao, previsoes):
+        """Substitui a previsão gravada em uma única transação"""
+        gerado_em = datetime.now().isoformat(timespec='seconds')
+        conn = self.conectar()
+        try:
+            with conn:
+                self.criar_tabelas(conn)
+                conn.execute('DELETE FROM previsoes_backlog')
+                conn.executemany(
+                    'INSERT INTO previsoes_backlog (versao, gerado_em, grupo, colaborador, data, pendentes) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [
+                        (versao, gerado_em, grupo, colaborador, data, float(pendentes))
+                        for grupo, colaborador, data, pendentes in previsoes.itertuples(index=False)
+                    ]
+                )
+        finally:
+            conn.close()
+        return gerado_em
+
+    def ler(self, grupo=None, colaborador=None):
+        """
+        {'versao', 'gerado_em', 'previsoes': [...]} com os totais dos grupos ou,
+        com `colaborador`, as previsões dele; None se nada foi gravado
+        """
+        consulta = 'SELECT versao, gerado_em, grupo, colaborador, data, pendentes FROM previsoes_backlog WHERE '
+        parametros = []
+        if colaborador is None:
+            consulta += 'colaborador IS NULL'
+        else:
+            consulta += 'colaborador = ?'
+            parametros.append(colaborador)
+        if grupo is not None:
+            consulta += ' AND grupo = ?'
+            parametros.append(grupo)
+
+        conn = self.conectar()
+        try:
+            linhas = conn.execute(consulta + ' ORDER BY grupo, colaborador, data', parametros).fetchall()
+        except sqlite3.OperationalError:
+            # Banco sem a tabela: nenhuma previsão gerada ainda
+            return None
+        finally:
+            conn.close()
+        if not linhas:
+            return None
+        return {
+            'versao': linhas[0][0],
+            'gerado_em': linhas[0][1],
+            'previsoes': [
+                {'grupo': grupo, 'colaborador': nome, 'data': data, 'pendentes': round(pendentes, 2)}
+                for _, _, grupo, nome, data, pendentes in linhas
+            ]
+        }
+
+
+def gerar_previsao_backlog(contexto, caminho_db, parametros, horizonte=HORIZONTE_PADRAO,
+                           status_pendentes=STATUS_PENDENTES):
+    """
+    Previsão dos próximos `horizonte` dias gravada em `caminho_db`. Se a versão
+    dos dados (séries, parâmetros e horizonte) for a mesma da gravada, nada é
+    treinado. Retorna {'versao', 'gerado_em', 'reaproveitada', 'linhas'} ou
+    None quando não há histórico suficiente.
+    """
+    datas, pendentes = serie_pendentes(contexto, status_pendentes)
+    if len(datas) <= _HISTORICO + 1:
+        return None
+
+    abas = [(grupo, colaborador) for grupo, colaborador, _ in contexto.abas]
+    versao = fingerprint_treino(
+        pendentes, np.zeros(0),
+        f"{datas[0].date()}|{abas}|{sorted(status_pendentes)}|{horizonte}|{parametros!r}"
+    )
+
+    banco = PrevisoesBacklog(caminho_db)
+    gravada = banco.versao()
+    if gravada is not None and gravada[0] == versao:
+        return {'versao': versao, 'gerado_em': gravada[1], 'reaproveitada': True, 'linhas': None}
+
+    X, y = montar_treino_backlog(datas, pendentes)
+    if len(X) == 0:
+        return None
+    modelo = GradientBoostingRegressor(**parametros).fit(X, y)
+
+    previsoes = tabela_previsoes(contexto, *prever_pendentes(modelo, datas, pendentes, horizonte))
+    gerado_em = banco.gravar(versao, previsoes)
+    return {'versao': versao, 'gerado_em': gerado_em, 'reaproveitada': False, 'linhas': len(previsoes)}
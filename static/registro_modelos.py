@@ -0,0 +1,68 @@
+"""
+Registro persistente dos modelos treinados.
+
+Cada modelo é gravado com joblib em um arquivo cujo nome traz a impressão
+digital dos dados de treino. Uma nova execução com os mesmos dados carrega o
+modelo do disco em vez de treinar de novo; com dados diferentes, o último
+modelo registrado continua disponível enquanto o novo é treinado.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+
+from log_analise import log
+
+
+def fingerprint_treino(X, y, parametros=''):
+    """Impressão digital das matrizes de treino, dos parâmetros e da versão do scikit-learn"""
+    sha = hashlib.sha256(f"{sklearn.__version__}|{parametros}|{X.shape}".encode('utf-8'))
+    sha.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return sha.hexdigest()
+
+
+class RegistroModelos:
+    """Modelos gravados em `diretorio` como <nome>-<fingerprint>.joblib"""
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+
+    def _caminho(self, nome, fingerprint):
+        return self.diretorio / f"{nome}-{fingerprint[:24]}.joblib"
+
+    def carregar(self, nome, fingerprint):
+        """Modelo registrado para estes dados de treino, ou None"""
+        caminho = self._caminho(nome, fingerprint)
+        if not caminho.exists():
+            return None
+        return self._ler(caminho)
+
+    def ultimo(self, nome):
+        """Modelo registrado mais recentemente com este nome, qualquer que seja o fingerprint"""
+        arquivos = sorted(self.diretorio.glob(f"{nome}-*.joblib"), key=lambda arquivo: arquivo.stat().st_mtime)
+        return self._ler(arquivos[-1]) if arquivos else None
+
+    def salvar(self, nome, fingerprint, modelo, manter=2):
+        """Grava o modelo e remove as versões antigas além das `manter` mais recentes"""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        caminho = self._caminho(nome, fingerprint)
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        joblib.dump(modelo, temporario)
+        os.replace(temporario, caminho)
+
+        antigos = sorted(self.diretorio.glob(f"{nome}-*.joblib"), key=lambda arquivo: arquivo.stat().st_mtime)
+        for arquivo in antigos[:-manter]:
+            arquivo.unlink()
+        return caminho
+
+    @staticmethod
+    def _ler(caminho):
+        try:
+            return joblib.load(caminho)
+        except Exception as e:
+            log.warning("Modelo %s ilegível: %s", caminho.name, e)
+            return None
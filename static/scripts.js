@@ -106,7 +106,12 @@ function initializeWebSockets() {
     };
     metricsWs.onmessage = (event) => {
         const data = JSON.parse(event.data);
-        updateMetrics(data);
+        if (data.tipo === 'dados_atualizados') {
+            // Uma importação gravou dados novos: recarregar o dashboard
+            refreshData();
+        } else {
+            updateMetrics(data);
+        }
     };
     metricsWs.onclose = () => {
         console.log('Metrics WebSocket closed. Reconnecting...');
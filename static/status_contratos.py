@@ -0,0 +1,82 @@
+"""
+Vocabulário único de status dos contratos.
+
+Cada status tem um código inteiro pequeno (0 é reservado para status fora do
+vocabulário) e um nome em inglês usado no banco do dashboard. A normalização é
+feita sobre os valores distintos da coluna e o resultado é um Categorical, de
+modo que filtros e agrupamentos por status operam sobre inteiros.
+"""
+import numpy as np
+import pandas as pd
+
+# A ordem define o código de cada status (1..n)
+STATUS_CONTRATOS = [
+    'VERIFICADO', 'ANÁLISE', 'PENDENTE', 'PRIORIDADE',
+    'PRIORIDADE TOTAL', 'APROVADO', 'APREENDIDO', 'CANCELADO',
+    'QUITADO', 'OUTROS ACORDOS', 'M.ENCAMINHADA'
+]
+
+CODIGO_STATUS_OUTROS = 0
+CODIGOS_STATUS = {status: codigo for codigo, status in enumerate(STATUS_CONTRATOS, start=1)}
+
+# Grafias alternativas encontradas nas planilhas
+SINONIMOS_STATUS = {
+    'ANALISE': 'ANÁLISE'
+}
+
+# Nome gravado em contracts.status, indexado pelo código
+NOMES_STATUS_BANCO = [
+    'other',
+    'verified', 'analysis', 'pending', 'priority',
+    'high_priority', 'approved', 'seized', 'cancelled',
+    'paid', 'other_agreements', 'forwarded'
+]
+CODIGOS_STATUS_BANCO = {nome: codigo for codigo, nome in enumerate(NOMES_STATUS_BANCO)}
+
+
+def normalizar_status(serie, padrao=None):
+    """
+    Normaliza a coluna de status (maiúsculas, sem espaços, sinônimos) e retorna
+    uma Series categórica. As categorias são o vocabulário seguido dos valores
+    desconhecidos encontrados, que são preservados como vieram.
+    """
+    if padrao is not None:
+        serie = serie.fillna(padrao)
+
+    # As operações de texto rodam apenas sobre os valores distintos
+    codigos, distintos = pd.factorize(serie)
+    normalizados = [str(valor).upper().strip() for valor in distintos]
+    normalizados = [SINONIMOS_STATUS.get(valor, valor) for valor in normalizados]
+
+    extras = sorted(set(normalizados) - set(CODIGOS_STATUS))
+    categorias = pd.Index(STATUS_CONTRATOS + extras)
+    mapa = np.append(categorias.get_indexer(normalizados), -1)
+
+    return pd.Series(
+        pd.Categorical.from_codes(mapa[codigos], categories=categorias),
+        index=serie.index,
+        name=serie.name
+    )
+
+
+def codigos_status(serie):
+    """Converte uma Series de status em códigos int16 (0 para desconhecidos ou vazios)"""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = normalizar_status(serie)
+    categorias = serie.cat.categories
+    mapa = np.array(
+        [CODIGOS_STATUS.get(status, CODIGO_STATUS_OUTROS) for status in categorias] + [CODIGO_STATUS_OUTROS],
+        dtype=np.int16
+    )
+    return mapa[serie.cat.codes.to_numpy()]
+
+
+def nomes_status_banco(codigos):
+    """Nomes em inglês correspondentes aos códigos"""
+    return np.asarray(NOMES_STATUS_BANCO, dtype=object)[codigos]
+
+
+def contar_status(serie):
+    """Contagem de status presentes (sem as categorias vazias)"""
+    contagem = serie.value_counts()
+    return contagem[contagem > 0].to_dict()
@@ -0,0 +1,203 @@
+"""
+Tarefas de importação em segundo plano.
+
+A análise completa e a exportação para SQLite rodam em um processo separado,
+que envia eventos de progresso por uma fila. O servidor acompanha a fila sem
+bloquear o event loop e repassa cada evento aos clientes conectados. Enquanto
+uma importação está em andamento, novos pedidos recebem a mesma tarefa; pedidos
+de reexecução (arquivos alterados durante a importação) se juntam em uma única
+tarefa agendada, iniciada quando a atual termina.
+
+Estados de uma tarefa: agendada, executando, concluida e falhou.
+
+O processo de importação grava o manifesto e o cache das abas; quem lê esse
+cache no servidor (a prévia) usa `trava_cache`, que a importação mantém do
+início ao fim do processo.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+import uuid
+from datetime import datetime
+
+# Eventos que encerram a tarefa
+EVENTOS_FINAIS = ('concluido', 'erro')
+
+
+def executar_importacao(fila):
+    """Ponto de entrada do processo de importação"""
+    from analisar_dados_v5 import AnalisadorInteligente
+    from log_analise import configurar_log, descarregar_log
+
+    def notificar(evento):
+        fila.put(evento)
+
+    # Sem as tabelas do console: só o resumo das etapas, no nível de ANALISE_LOG_NIVEL
+    configurar_log(os.getenv('ANALISE_LOG_NIVEL', 'INFO'))
+    try:
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        # O servidor lê o banco; o relatório TXT não é necessário
+        analisador.gerar_txt = False
+        analisador.callback_progresso = notificar
+        # O modelo registrado é o que o servidor usa em /api/predict
+        analisador.treinar_modelo = True
+        if not analisador.executar_analise_completa():
+            notificar({'tipo': 'erro', 'mensagem': 'Falha durante a análise'})
+            return
+        if not analisador._executar_etapa('exportar_sqlite', analisador.exportar_para_sqlite):
+            notificar({'tipo': 'erro', 'mensagem': 'Falha ao exportar para SQLite'})
+            return
+        notificar({'tipo': 'concluido', 'mensagem': 'Dados atualizados com sucesso'})
+    except Exception as e:
+        traceback.print_exc()
+        notificar({'tipo': 'erro', 'mensagem': str(e)})
+    finally:
+        descarregar_log(fechar=True)
+
+
+class TarefaImportacao:
+    """Estado de uma importação e os eventos recebidos até o momento"""
+
+    def __init__(self, motivo=None):
+        self.id = uuid.uuid4().hex
+        self.processo = None
+        self.motivo = motivo
+        self.estado = 'agendada'
+        self.iniciada_em = None
+        self.finalizada_em = None
+        self.eventos = []
+
+    def executar(self):
+        self.estado = 'executando'
+        self.iniciada_em = datetime.now()
+
+    @property
+    def em_execucao(self):
+        return self.estado == 'executando'
+
+    def resumo(self):
+        return {
+            'tarefa_id': self.id,
+            'estado': self.estado,
+            'motivo': self.motivo,
+            'iniciada_em': self.iniciada_em.isoformat() if self.iniciada_em else None,
+            'finalizada_em': self.finalizada_em.isoformat() if self.finalizada_em else None,
+            'ultimo_evento': self.eventos[-1] if self.eventos else None,
+            'eventos': len(self.eventos)
+        }
+
+
+class GerenciadorImportacao:
+    """
+    Inicia no máximo uma importação por vez. `publicar` é uma corrotina que
+    recebe cada evento (por exemplo, o broadcast do websocket_manager); `alvo`
+    é a função executada no processo, que recebe a fila de eventos.
+    """
+
+    def __init__(self, publicar=None, alvo=executar_importacao, historico=20, contexto=None):
+        self.publicar = publicar
+        self.alvo = alvo
+        self.historico = historico
+        self.tarefas = {}
+        self.tarefa_atual = None
+        self.tarefa_agendada = None
+        # spawn evita herdar o estado do servidor (event loop, conexões abertas)
+        self._contexto = contexto or multiprocessing.get_context('spawn')
+        self.trava_cache = threading.Lock()
+
+    def iniciar(self, motivo=None, reexecutar_se_ocupado=False):
+        """
+        Retorna (tarefa, nova); se já houver uma importação em andamento, ela é
+        reaproveitada. Com `reexecutar_se_ocupado`, retorna a tarefa agendada para
+        quando a atual terminar (usado quando os arquivos mudaram depois que a
+        importação atual já os leu); pedidos seguintes se juntam a ela.
+        """
+        if self.tarefa_atual is not None and self.tarefa_atual.em_execucao:
+            if not reexecutar_se_ocupado:
+                return self.tarefa_atual, False
+            if self.tarefa_agendada is None:
+                self.tarefa_agendada = self._registrar_tarefa(TarefaImportacao(motivo=motivo))
+            elif motivo and motivo not in (self.tarefa_agendada.motivo or '').split('; '):
+                self.tarefa_agendada.motivo = '; '.join(filter(None, [self.tarefa_agendada.motivo, motivo]))
+            return self.tarefa_agendada, False
+
+        tarefa = self._registrar_tarefa(TarefaImportacao(motivo=motivo))
+        self._executar(tarefa)
+        return tarefa, True
+
+    def _registrar_tarefa(self, tarefa):
+        self.tarefas[tarefa.id] = tarefa
+        for antiga in list(self.tarefas)[:-self.historico]:
+            del self.tarefas[antiga]
+        return tarefa
+
+    def _executar(self, tarefa):
+        tarefa.executar()
+        self.tarefa_atual = tarefa
+        asyncio.get_running_loop().create_task(self._acompanhar(tarefa))
+
+    def obter(self, tarefa_id):
+        return self.tarefas.get(tarefa_id)
+
+    async def _acompanhar(self, tarefa):
+        """Inicia o processo e publica seus eventos até a tarefa terminar"""
+        loop = asyncio.get_running_loop()
+        # Espera uma leitura do cache em andamento (prévia) terminar
+        await loop.run_in_executor(None, self.trava_cache.acquire)
+        try:
+            fila = self._contexto.Queue()
+            # Não pode ser daemon: a leitura das planilhas cria seus próprios processos
+            tarefa.processo = self._contexto.Process(target=self.alvo, args=(fila,), daemon=False)
+            tarefa.processo.start()
+            await self._aguardar_eventos(tarefa, fila)
+            await loop.run_in_executor(None, tarefa.processo.join)
+        except Exception as e:
+            if tarefa.em_execucao:
+                tarefa.estado = 'falhou'
+                tarefa.finalizada_em = datetime.now()
+                await self._registrar(tarefa, {'tipo': 'erro', 'mensagem': str(e)})
+        finally:
+            self.trava_cache.release()
+
+        if self.tarefa_agendada is not None:
+            agendada, self.tarefa_agendada = self.tarefa_agendada, None
+            self._executar(agendada)
+
+    async def _aguardar_eventos(self, tarefa, fila):
+        """Publica os eventos da fila até o evento final ou o fim do processo"""
+        loop = asyncio.get_running_loop()
+        await self._registrar(tarefa, {'tipo': 'iniciado', 'motivo': tarefa.motivo})
+
+        while True:
+            try:
+                evento = await loop.run_in_executor(None, fila.get, True, 1.0)
+            except queue.Empty:
+                if not tarefa.processo.is_alive():
+                    evento = {
+                        'tipo': 'erro',
+                        'mensagem': f'Processo de importação encerrado (código {tarefa.processo.exitcode})'
+                    }
+                else:
+                    continue
+
+            # O estado muda antes do evento final, para que um novo pedido feito
+            # ao recebê-lo já inicie outra importação
+            if evento['tipo'] in EVENTOS_FINAIS:
+                tarefa.estado = 'concluida' if evento['tipo'] == 'concluido' else 'falhou'
+                tarefa.finalizada_em = datetime.now()
+            await self._registrar(tarefa, evento)
+            if not tarefa.em_execucao:
+                break
+
+    async def _registrar(self, tarefa, evento):
+        evento = {'tarefa_id': tarefa.id, 'momento': datetime.now().isoformat(), **evento}
+        tarefa.eventos.append(evento)
+        if self.publicar is not None:
+            try:
+                await self.publicar(evento)
+            except Exception as e:
+                print(f"Aviso: falha ao publicar evento da importação: {str(e)}")
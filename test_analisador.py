@@ -2,11 +2,60 @@ import unittest
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from analisar_dados_v5 import AnalisadorInteligente
+from analisar_dados_v5 import AnalisadorInteligente, RelatorioDatabase
+from leitura_colunar import ler_colunas, ler_colunas_em_blocos, formatar_cabecalho_xlrd
+from status_contratos import normalizar_status, codigos_status
+from motor_metricas import calcular_metricas_colaboradores
+from contexto_analise import ContextoAnalise
+from agregados_incrementais import AgregadosIncrementais
+from features_predicao import montar_features, montar_features_contexto
+from registro_modelos import RegistroModelos, fingerprint_treino
+from predicao_lotes import AgrupadorPredicoes
+from executor_etapas import ExecutorEtapas, escrever_saida_etapa
+from compactacao_tipos import compactar_dataframe, memoria_bytes
+from dashboard_json import gravar_dashboard_json, montar_dados_dashboard
+from previsao_backlog import PrevisoesBacklog, gerar_previsao_backlog, serie_pendentes
+from consultas_em_blocos import contar_blocos, descrever_medida, medir_consulta, resumo_historico
+from previa_amostral import amostrar_abas, estimar_previa
+import observador_diretorios
+from observador_diretorios import ObservadorDiretorios
+from tarefas_importacao import GerenciadorImportacao
+import multiprocessing
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
 import os
 import sqlite3
 import requests
 import time
+import zipfile
+from datetime import datetime
+import openpyxl
+from unittest import mock
+
+def gravar_planilhas_sinteticas(diretorio, linhas_extras=0):
+    """Grava julio.xlsx e leandro.xlsx com três colaboradores cada e uma aba sem dados"""
+    status = ['APROVADO', ' pendente ', 'ANALISE', None, 'QUITADO', 'OUTRO']
+    for n, arquivo in enumerate(('julio.xlsx', 'leandro.xlsx')):
+        pasta = openpyxl.Workbook()
+        pasta.active.title = 'LEIA-ME'
+        pasta.active.append(['x'])
+        for colaborador in ('ANA', 'BRUNO', 'CARLA'):
+            aba = pasta.create_sheet(f'{colaborador}{n}')
+            aba.append(['CONTRATO', 'SITUAÇÃO', 'DATA', 'TEMPO_PROCESSAMENTO'])
+            for i in range(7 * (n + 1) + len(colaborador) + linhas_extras):
+                aba.append([f'{colaborador}-{i}', status[i % len(status)], datetime(2024, 1, 1 + i % 28), i / 2])
+        pasta.save(Path(diretorio) / arquivo)
+
+def analisador_sintetico(diretorio):
+    """Analisador em lote que lê as planilhas de gravar_planilhas_sinteticas"""
+    analisador = AnalisadorInteligente()
+    analisador.interativo = False
+    analisador.diretorios = [Path(diretorio)]
+    analisador.arquivos = {'julio': 'julio.xlsx', 'leandro': 'leandro.xlsx'}
+    return analisador
 
 class TestAnalisadorInteligente(unittest.TestCase):
     @classmethod
@@ -224,6 +273,763 @@ class TestAnalisadorInteligente(unittest.TestCase):
         except sqlite3.Error as e:
             self.fail(f"Erro ao acessar banco de dados: {str(e)}")
 
+    def test_09_carregar_dados_paralelo(self):
+        """Testa se a leitura em vários processos gera o mesmo resultado da serial"""
+        print("\nTestando carregamento paralelo...")
+        with tempfile.TemporaryDirectory() as diretorio:
+            diretorio = Path(diretorio)
+            gravar_planilhas_sinteticas(diretorio)
+
+            def carregar(paralela):
+                analisador = analisador_sintetico(diretorio)
+                analisador.ingestao_incremental = False
+                analisador.ingestao_paralela = paralela
+                analisador.processos_ingestao = 2
+                eventos = []
+                analisador.callback_progresso = eventos.append
+                with mock.patch.object(
+                    AnalisadorInteligente, '_ler_arquivos_em_paralelo', autospec=True,
+                    side_effect=AnalisadorInteligente._ler_arquivos_em_paralelo
+                ) as leitura_paralela:
+                    dados = analisador.carregar_dados()
+                self.assertEqual(leitura_paralela.called, paralela)
+                return dados, eventos
+
+            dados_serial, eventos_serial = carregar(False)
+            dados_paralelo, eventos_paralelo = carregar(True)
+
+        # Os processos de leitura não enviam eventos; o principal envia um por aba
+        def por_aba(eventos):
+            abas = [e for e in eventos if e['tipo'] == 'aba_processada']
+            self.assertTrue(all('linhas_por_segundo' in e and 'segundos' in e for e in abas))
+            return sorted((e['arquivo'], e['aba'], e['linhas']) for e in abas)
+        self.assertEqual(len(por_aba(eventos_serial)), 8)
+        self.assertEqual(por_aba(eventos_paralelo), por_aba(eventos_serial))
+        por_arquivo = {e['arquivo']: e for e in eventos_paralelo if e['tipo'] == 'arquivo_processado'}
+        self.assertEqual(sorted(por_arquivo), ['julio.xlsx', 'leandro.xlsx'])
+        self.assertEqual(
+            por_arquivo['julio.xlsx']['linhas'],
+            sum(m['total_registros'] for m in dados_paralelo['julio']['metricas'].values())
+        )
+
+        self.assertEqual(list(dados_serial), ['julio', 'leandro'])
+        self.assertEqual(list(dados_paralelo), list(dados_serial))
+        for grupo in dados_serial:
+            with self.subTest(grupo=grupo):
+                colaboradores = dados_serial[grupo]['colaboradores']
+                self.assertEqual(len(colaboradores), 3)
+                self.assertEqual(list(dados_paralelo[grupo]['colaboradores']), list(colaboradores))
+                for colaborador, df in colaboradores.items():
+                    self.assertFalse(df.empty)
+                    pd.testing.assert_frame_equal(dados_paralelo[grupo]['colaboradores'][colaborador], df)
+                # A memória medida depende de como as strings chegaram ao processo principal
+                sem_memoria = lambda metricas: {
+                    aba: {k: v for k, v in m.items() if k != 'memoria'} for aba, m in metricas.items()
+                }
+                self.assertEqual(sem_memoria(dados_paralelo[grupo]['metricas']), sem_memoria(dados_serial[grupo]['metricas']))
+                self.assertTrue(all(m['total_registros'] > 0 for m in dados_serial[grupo]['metricas'].values()))
+
+    def test_10_carregar_dados_incremental(self):
+        """Testa se a leitura a partir do cache é igual à leitura completa"""
+        print("\nTestando carregamento incremental...")
+        analisador = AnalisadorInteligente()
+        analisador.carregar_dados()
+        dados_cache = analisador.carregar_dados()
+
+        analisador.ingestao_incremental = False
+        dados_completos = analisador.carregar_dados()
+
+        for grupo, dados in dados_completos.items():
+            for colaborador, df in dados['colaboradores'].items():
+                with self.subTest(grupo=grupo, colaborador=colaborador):
+                    pd.testing.assert_frame_equal(df, dados_cache[grupo]['colaboradores'][colaborador])
+                    self.assertEqual(
+                        dados['metricas'][colaborador]['status_counts'],
+                        dados_cache[grupo]['metricas'][colaborador]['status_counts']
+                    )
+
+class TestLeituraColunar(unittest.TestCase):
+    def test_equivalente_ao_dataframe_de_listas(self):
+        """Testa se a leitura em blocos gera o mesmo DataFrame da lista de listas"""
+        linhas = [
+            ('CONTRATO', 'SITUAÇÃO', None, 'VALOR'),
+            ('A-1', 'APROVADO', None, 10),
+            ('A-2', None, 'x', 2.5),
+            ('A-3', 'PENDENTE'),
+        ]
+        esperado = pd.DataFrame(
+            [list(l) + [None] * (4 - len(l)) for l in linhas[1:]],
+            columns=['CONTRATO', 'SITUAÇÃO', 'Col2', 'VALOR']
+        )
+        df = ler_colunas(iter(linhas), tamanho_bloco=2)
+        pd.testing.assert_frame_equal(df, esperado)
+
+    def test_blocos_equivalentes_a_leitura_inteira(self):
+        """Testa se os blocos concatenados reproduzem a leitura da aba inteira"""
+        linhas = [('CONTRATO', 'SITUAÇÃO')] + [(f'A-{i}', 'APROVADO' if i % 3 else None) for i in range(10)]
+        blocos = list(ler_colunas_em_blocos(iter(linhas), linhas_por_bloco=4))
+        self.assertEqual([len(bloco) for bloco in blocos], [4, 4, 2])
+        pd.testing.assert_frame_equal(pd.concat(blocos, ignore_index=True), ler_colunas(iter(linhas)))
+
+    def test_aba_em_blocos_igual_a_aba_inteira(self):
+        """Testa métricas e tipos iguais entre a leitura em blocos e a da aba inteira"""
+        linhas = [('CONTRATO', 'SITUAÇÃO', 'TEMPO_PROCESSAMENTO')] + [
+            (f'A-{i}', 'APROVADO' if i % 3 else 'PENDENTE', None if i < 5 else i) for i in range(12)
+        ]
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        analisador.linhas_por_bloco = 5
+        inteira, metricas_inteira = analisador.processar_aba('ANA', ler_colunas(iter(linhas)))
+        em_blocos, metricas_blocos = analisador.processar_aba_em_blocos('ANA', iter(linhas))
+        pd.testing.assert_frame_equal(em_blocos, inteira)
+        self.assertEqual(metricas_blocos, metricas_inteira)
+        self.assertIsNone(analisador.processar_aba_em_blocos('ANA', iter(linhas), manter_dataframes=False)[0])
+
+    def test_cabecalhos_vazios_por_motor(self):
+        """Testa ColN para cabeçalhos vazios no openpyxl e o texto original no xlrd"""
+        openpyxl_linhas = [('CONTRATO', None, 0, 'SITUAÇÃO'), ('A-1', 'x', 1, 'APROVADO')]
+        xlrd_linhas = [('CONTRATO', '', 0.0, ' SITUAÇÃO '), ('A-1', 'x', 1.0, 'APROVADO')]
+        self.assertEqual(list(ler_colunas(iter(openpyxl_linhas)).columns), ['CONTRATO', 'Col1', 'Col2', 'SITUAÇÃO'])
+        df = ler_colunas(iter(xlrd_linhas), formatar=formatar_cabecalho_xlrd)
+        self.assertEqual(list(df.columns), ['CONTRATO', '', '0.0', 'SITUAÇÃO'])
+        blocos = ler_colunas_em_blocos(iter(xlrd_linhas), 1, formatar=formatar_cabecalho_xlrd)
+        self.assertEqual(list(next(blocos).columns), list(df.columns))
+
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        normalizado, metricas = analisador.processar_aba('ANA', df)
+        self.assertEqual(metricas['total_registros'], 1)
+        self.assertEqual(len(normalizado.columns), len(set(normalizado.columns)))
+
+    def test_aba_vazia(self):
+        """Testa a leitura de uma aba sem linhas"""
+        self.assertTrue(ler_colunas(iter([])).empty)
+
+class TestStatusContratos(unittest.TestCase):
+    def test_normalizacao_e_codigos(self):
+        """Testa sinônimos, valores desconhecidos e códigos inteiros"""
+        serie = pd.Series([' aprovado', 'ANALISE', None, 'Outro', 'APROVADO'])
+        status = normalizar_status(serie, padrao='PENDENTE')
+        self.assertEqual(
+            status.astype(str).tolist(),
+            ['APROVADO', 'ANÁLISE', 'PENDENTE', 'OUTRO', 'APROVADO']
+        )
+        self.assertEqual(codigos_status(status).tolist(), [6, 2, 3, 0, 6])
+
+class TestMotorMetricas(unittest.TestCase):
+    def test_metricas_por_colaborador(self):
+        """Testa contagens, tempo médio dos aprovados e abas sem coluna de tempo"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'APROVADO', 'PENDENTE', 'X'])),
+            'TEMPO_PROCESSAMENTO': [2.0, 4.0, 9.0, 1.0],
+            'DIA': pd.to_datetime('today').date()
+        })
+        dados = {
+            'julio': {'colaboradores': {'ANA': df, 'BIA': df.drop(columns=['TEMPO_PROCESSAMENTO'])}, 'metricas': {}},
+            'leandro': {'colaboradores': {'ANA': df.iloc[:0]}, 'metricas': {}}
+        }
+        resultado = calcular_metricas_colaboradores(dados, horas_trabalho=8)
+        self.assertEqual(resultado['colaborador'].tolist(), ['ANA', 'BIA'])
+        self.assertEqual(resultado['aprovados'].tolist(), [2, 2])
+        self.assertEqual(resultado['pendentes'].tolist(), [1, 1])
+        self.assertEqual(resultado['tempo_medio_dias'].tolist(), [3.0, 0.0])
+        self.assertEqual(resultado['taxa_prioritarios'].tolist(), [50.0, 50.0])
+
+class TestContextoAnalise(unittest.TestCase):
+    def test_colunas_derivadas(self):
+        """Testa fatias por aba, colunas derivadas memorizadas e abas intactas"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'PENDENTE'])),
+            'DIA': ['2024-01-05', '2024-01-06'],
+            'HORA': ['2024-01-05 09:30', '2024-01-06 14:00'],
+            'DATA_RESOLUCAO': ['2024-01-07', 'inválida']
+        })
+        dados = {'julio': {'colaboradores': {'ANA': df.copy(), 'BIA': df.drop(columns=['HORA'])}, 'metricas': {}}}
+        contexto = ContextoAnalise(dados, ['APROVADO'])
+        fatia = contexto.fatia('julio', 'BIA')
+        self.assertEqual((fatia.start, fatia.stop), (2, 4))
+        self.assertEqual(contexto.prioritario.tolist(), [True, False, True, False])
+        self.assertEqual(contexto.dia_semana.tolist(), ['Friday', 'Saturday'] * 2)
+        self.assertEqual(contexto.hora[:2].tolist(), [9, 14])
+        self.assertTrue(contexto.hora[fatia].isna().all())
+        self.assertEqual(contexto.data_resolucao.notna().tolist(), [True, False, True, False])
+        self.assertIs(contexto.dia, contexto.dia)
+        self.assertEqual(list(dados['julio']['colaboradores']['ANA'].columns), list(df.columns))
+
+        with self.assertLogs('analise', 'WARNING') as aviso:
+            coluna = contexto._concatenar(lambda aba: aba['INEXISTENTE'], 'float64')
+        self.assertTrue(coluna.isna().all())
+        self.assertIn('ANA (julio)', aviso.output[0])
+
+class TestAgregadosIncrementais(unittest.TestCase):
+    def test_variacoes_por_dia(self):
+        """Testa que só as diferenças são gravadas e que abas removidas saem dos totais"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            agregados = AgregadosIncrementais(Path(diretorio) / 'agregados.db')
+            ana = {'APROVADO': (3, 6.0, 3), 'PENDENTE': (2, 0.0, 0)}
+            bia = {'PENDENTE': (1, 0.0, 0)}
+            alterados = agregados.aplicar('2024-01-01', ['julio'], {('julio', 'ANA'): ana, ('julio', 'BIA'): bia})
+            self.assertEqual(alterados, {('julio', 'ANA'), ('julio', 'BIA')})
+            self.assertEqual(agregados.aplicar('2024-01-02', ['julio'], {('julio', 'ANA'): ana, ('julio', 'BIA'): bia}), set())
+
+            ana = {'APROVADO': (4, 9.0, 4), 'PENDENTE': (1, 0.0, 0)}
+            alterados = agregados.aplicar('2024-01-02', ['julio'], {('julio', 'ANA'): ana})
+            self.assertEqual(alterados, {('julio', 'ANA'), ('julio', 'BIA')})
+
+            totais = agregados.totais()
+            self.assertEqual(list(totais), [('julio', 'ANA')])
+            self.assertEqual(totais[('julio', 'ANA')]['status_counts'], {'APROVADO': 4, 'PENDENTE': 1})
+            self.assertEqual(totais[('julio', 'ANA')]['soma_tempo'], 9.0)
+
+            diarios = agregados.diarios('2024-01-02').set_index(['colaborador', 'status'])['quantidade']
+            self.assertEqual(diarios.to_dict(), {('ANA', 'APROVADO'): 1, ('ANA', 'PENDENTE'): -1, ('BIA', 'PENDENTE'): -1})
+
+class TestFeaturesPredicao(unittest.TestCase):
+    def test_matriz_e_alvo(self):
+        """Testa valores padrão das colunas ausentes e a equivalência com o contexto"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'PENDENTE'])),
+            'TEMPO_PROCESSAMENTO': [1.5, np.nan],
+            'HORA': pd.to_datetime(['2024-01-05 09:30', None]),
+            'DIA': ['2024-01-05', '2024-01-06']
+        })
+        X, y = montar_features(df, ['APROVADO'])
+        np.testing.assert_array_equal(X, [[1.5, 9, 4], [0, 12, 5]])
+        self.assertEqual(y.tolist(), [1, 0])
+        np.testing.assert_array_equal(montar_features(df[['STATUS']]), [[0, 12, 0], [0, 12, 0]])
+
+        dados = {'julio': {'colaboradores': {'ANA': df, 'BIA': df[['STATUS', 'DIA']]}, 'metricas': {}}}
+        X_contexto, y_contexto = montar_features_contexto(ContextoAnalise(dados, ['APROVADO']))
+        X_bia = montar_features(df[['STATUS', 'DIA']])
+        np.testing.assert_array_equal(X_contexto, np.vstack([X, X_bia]))
+        self.assertEqual(y_contexto.tolist(), [1, 0, 1, 0])
+
+    def test_celulas_vazias_ou_invalidas(self):
+        """Testa que células vazias ou inválidas recebem os padrões e o modelo treina"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'PENDENTE', 'APROVADO', 'PENDENTE'])),
+            'TEMPO_PROCESSAMENTO': [2, '', 'abc', None],
+            'HORA': ['2024-01-05 09:30', '', 'xx', None],
+            'HORA_CONCLUSAO': ['2024-01-05 18:00'] * 4,
+            'DIA': ['2024-01-05', None, 'inválido', '2024-01-06']
+        })
+        X, y = montar_features(df, ['APROVADO'])
+        np.testing.assert_array_equal(X, [[2, 9, 4], [0, 12, 0], [0, 12, 0], [0, 12, 5]])
+        dados = {'julio': {'colaboradores': {'ANA': df}, 'metricas': {}}}
+        X_contexto, _ = montar_features_contexto(ContextoAnalise(dados, ['APROVADO']))
+        np.testing.assert_array_equal(X_contexto, X)
+
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        analisador.parametros_predicao = {'n_estimators': 5, 'random_state': 0}
+        with tempfile.TemporaryDirectory() as diretorio:
+            analisador.diretorio_modelos = diretorio
+            dados['julio']['colaboradores']['ANA'] = pd.concat([df] * 5, ignore_index=True)
+            self.assertIsNotNone(analisador.treinar_modelo_predicao(dados))
+
+class TestRegistroModelos(unittest.TestCase):
+    def test_fingerprint_e_versoes(self):
+        """Testa o carregamento pelo fingerprint e o descarte das versões antigas"""
+        X, y = np.arange(6, dtype=float).reshape(3, 2), np.array([0, 1, 0])
+        fingerprint = fingerprint_treino(X, y, 'rf')
+        self.assertEqual(fingerprint, fingerprint_treino(X.copy(), y.copy(), 'rf'))
+        self.assertNotEqual(fingerprint, fingerprint_treino(X, y, 'rf-2'))
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            registro = RegistroModelos(diretorio)
+            self.assertIsNone(registro.carregar('predicao', fingerprint))
+            for versao in range(3):
+                registro.salvar('predicao', f"{versao}{fingerprint}", {'versao': versao})
+                time.sleep(0.01)
+            self.assertEqual(registro.carregar('predicao', f"2{fingerprint}"), {'versao': 2})
+            self.assertIsNone(registro.carregar('predicao', f"0{fingerprint}"))
+            self.assertEqual(registro.ultimo('predicao'), {'versao': 2})
+
+            registro._caminho('predicao', f"2{fingerprint}").write_bytes(b'corrompido')
+            with self.assertLogs('analise', 'WARNING') as aviso:
+                self.assertIsNone(registro.carregar('predicao', f"2{fingerprint}"))
+            self.assertIn('ilegível', aviso.output[0])
+
+class TestAgrupadorPredicoes(unittest.TestCase):
+    def test_pedidos_simultaneos_em_um_lote(self):
+        """Testa que pedidos simultâneos são pontuados juntos e recebem as próprias linhas"""
+        chamadas = []
+
+        def prever_lote(X):
+            chamadas.append(len(X))
+            return X[:, 0] * 10
+
+        async def executar():
+            agrupador = AgrupadorPredicoes(prever_lote, tamanho_lote=100, espera=0.01)
+            pedidos = [np.array([[i, 0, 0]] * (i + 1), dtype=float) for i in range(3)]
+            return await asyncio.gather(*[agrupador.prever(X) for X in pedidos])
+
+        resultados = asyncio.run(executar())
+        self.assertEqual(chamadas, [6])
+        for i, (probabilidades, lote) in enumerate(resultados):
+            self.assertEqual(probabilidades.tolist(), [i * 10.0] * (i + 1))
+            self.assertEqual((lote['tamanho_lote'], lote['requisicoes_lote']), (6, 3))
+
+class TestExecutorEtapas(unittest.TestCase):
+    def test_dependencias_e_cache(self):
+        """Testa a ordem das dependências e o reaproveitamento das etapas com cache"""
+        chamadas = []
+
+        def dobrar(df):
+            chamadas.append('dobro')
+            return df * 2
+
+        def somar(dobro, df):
+            chamadas.append('soma')
+            return int((dobro + df).to_numpy().sum())
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            def executar(df):
+                executor = ExecutorEtapas(diretorio, max_workers=2)
+                executor.adicionar('soma', somar, ['dobro', 'df'], cache=True)
+                executor.adicionar('dobro', dobrar, ['df'])
+                return executor.executar({'df': df}), executor
+
+            resultados, _ = executar(pd.DataFrame({'a': [1, 2]}))
+            self.assertEqual(resultados['soma'], 9)
+            resultados, executor = executar(pd.DataFrame({'a': [1, 2]}))
+            self.assertEqual(resultados['soma'], 9)
+            self.assertEqual({r['etapa']: r['origem'] for r in executor.relatorio}, {'soma': 'cache', 'dobro': 'executada'})
+            resultados, _ = executar(pd.DataFrame({'a': [1, 3]}))
+            self.assertEqual(resultados['soma'], 12)
+            self.assertEqual(chamadas, ['dobro', 'soma', 'dobro', 'dobro', 'soma'])
+
+    def test_dependencias_no_cache_e_saida_por_etapa(self):
+        """Testa que o código dos módulos usados invalida o cache e que a saída sai na ordem declarada"""
+        def versao_1():
+            return 1
+
+        def versao_2():
+            return 2
+
+        def lenta(df):
+            time.sleep(0.05)
+            escrever_saida_etapa('lenta')
+            return len(df)
+
+        def rapida(df):
+            escrever_saida_etapa('rapida')
+            return len(df)
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            def executar(dependencia):
+                saida = []
+                executor = ExecutorEtapas(diretorio, max_workers=2, escrever=saida.append)
+                executor.adicionar('lenta', lenta, ['df'], cache=True, dependencias=[dependencia])
+                executor.adicionar('rapida', rapida, ['df'])
+                executor.executar({'df': pd.DataFrame({'a': [1, 2]})})
+                return {r['etapa']: r['origem'] for r in executor.relatorio}['lenta'], saida
+
+            self.assertEqual(executar(versao_1), ('executada', ['lenta', 'rapida']))
+            self.assertEqual(executar(versao_1), ('cache', ['rapida']))
+            self.assertEqual(executar(versao_2)[0], 'executada')
+        self.assertFalse(escrever_saida_etapa('fora de uma etapa'))
+
+class TestObservadorDiretorios(unittest.TestCase):
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = Path(diretorio.name)
+        self.caminho = (self.diretorio / 'dados.xlsx').resolve()
+        self.alterados = []
+
+    def observador(self, **opcoes):
+        return ObservadorDiretorios([self.diretorio], ['dados.xlsx', 'outro.xlsx'], self.alterados.append, **opcoes)
+
+    def gravar_planilha(self, conteudo='a'):
+        with zipfile.ZipFile(self.caminho, 'w') as pacote:
+            pacote.writestr('xl/workbook.xml', conteudo)
+
+    def test_espera_e_pacote_incompleto(self):
+        """Testa que eventos repetidos viram uma chamada e que .xlsx incompleto espera"""
+        observador = self.observador(espera=60, usar_inotify=False)
+        self.caminho.write_bytes(b'PK parcial')
+        for _ in range(3):
+            observador.marcar(self.caminho)
+        observador.marcar(self.diretorio / 'ignorado.xlsx')
+        observador._verificar_pendentes()
+        self.assertEqual(list(observador._pendentes), [self.caminho])
+
+        # Estável, mas ainda não é um zip completo
+        observador.espera = 0
+        observador._verificar_pendentes()
+        observador._verificar_pendentes()
+        self.assertEqual(self.alterados, [])
+
+        self.gravar_planilha()
+        observador._verificar_pendentes()
+        self.assertEqual(self.alterados, [])
+        observador._verificar_pendentes()
+        observador._verificar_pendentes()
+        self.assertEqual(self.alterados, [self.caminho])
+
+    def test_polling_sem_watchdog(self):
+        """Testa o polling quando o watchdog não está instalado"""
+        self.gravar_planilha('inicial')
+        with mock.patch.object(observador_diretorios, 'Observer', None):
+            observador = self.observador(espera=0.1, intervalo_polling=0.1)
+        self.assertEqual(observador.modo, 'polling')
+        with contextlib.redirect_stdout(io.StringIO()) as saida:
+            observador.iniciar()
+        try:
+            self.assertIn('watchdog não instalado', saida.getvalue())
+            time.sleep(0.3)
+            # Arquivos existentes ao iniciar não disparam a ingestão
+            self.assertEqual(self.alterados, [])
+            self.gravar_planilha('alterada')
+            limite = time.monotonic() + 5
+            while not self.alterados and time.monotonic() < limite:
+                time.sleep(0.05)
+        finally:
+            observador.parar()
+        self.assertEqual(self.alterados, [self.caminho])
+
+def _importacao_ok(fila):
+    fila.put({'tipo': 'aba_processada'})
+    time.sleep(0.5)
+    fila.put({'tipo': 'concluido'})
+
+def _importacao_erro(fila):
+    fila.put({'tipo': 'erro', 'mensagem': 'falha simulada'})
+
+def _importacao_encerrada(fila):
+    os._exit(3)
+
+class TestTarefasImportacao(unittest.TestCase):
+    def executar(self, alvo, cenario):
+        """Roda `cenario(gerenciador)` em um event loop com processos de `alvo`"""
+        publicados = []
+
+        async def publicar(evento):
+            publicados.append(evento)
+
+        async def rodar():
+            gerenciador = GerenciadorImportacao(publicar, alvo=alvo, contexto=multiprocessing.get_context('fork'))
+            resultado = await cenario(gerenciador)
+            limite = time.monotonic() + 10
+            while any(t.estado in ('agendada', 'executando') for t in gerenciador.tarefas.values()):
+                self.assertLess(time.monotonic(), limite)
+                await asyncio.sleep(0.05)
+            return gerenciador, resultado
+
+        gerenciador, resultado = asyncio.run(rodar())
+        return gerenciador, resultado, publicados
+
+    def test_estados_e_pedido_repetido(self):
+        """Testa executando -> concluida e que um segundo pedido recebe a mesma tarefa"""
+        async def cenario(gerenciador):
+            primeira, nova = gerenciador.iniciar()
+            segunda, repetida = gerenciador.iniciar()
+            return primeira, nova, segunda, repetida, primeira.estado
+
+        gerenciador, (primeira, nova, segunda, repetida, estado), publicados = self.executar(_importacao_ok, cenario)
+        self.assertTrue(nova)
+        self.assertFalse(repetida)
+        self.assertIs(segunda, primeira)
+        self.assertEqual(estado, 'executando')
+        self.assertEqual(primeira.estado, 'concluida')
+        self.assertIsNotNone(primeira.finalizada_em)
+        self.assertEqual([e['tipo'] for e in primeira.eventos], ['iniciado', 'aba_processada', 'concluido'])
+        self.assertEqual(publicados, primeira.eventos)
+        self.assertEqual(list(gerenciador.tarefas), [primeira.id])
+
+    def test_reexecucao_unica(self):
+        """Testa que alterações durante a importação agendam uma única reexecução"""
+        async def cenario(gerenciador):
+            atual, _ = gerenciador.iniciar('inicial')
+            agendada, nova = gerenciador.iniciar('a.xlsx', reexecutar_se_ocupado=True)
+            mesma, _ = gerenciador.iniciar('b.xlsx', reexecutar_se_ocupado=True)
+            gerenciador.iniciar('a.xlsx', reexecutar_se_ocupado=True)
+            return atual, agendada, nova, mesma, agendada.resumo()
+
+        gerenciador, (atual, agendada, nova, mesma, resumo), _ = self.executar(_importacao_ok, cenario)
+        self.assertFalse(nova)
+        self.assertIs(mesma, agendada)
+        self.assertIsNot(agendada, atual)
+        self.assertEqual(resumo['estado'], 'agendada')
+        self.assertIsNone(resumo['iniciada_em'])
+        self.assertEqual(agendada.motivo, 'a.xlsx; b.xlsx')
+        self.assertEqual([t.estado for t in gerenciador.tarefas.values()], ['concluida', 'concluida'])
+        self.assertGreaterEqual(agendada.iniciada_em, atual.finalizada_em)
+        self.assertIs(gerenciador.tarefa_atual, agendada)
+        self.assertIsNone(gerenciador.tarefa_agendada)
+
+    def test_falhas(self):
+        """Testa o estado falhou para evento de erro e para processo encerrado"""
+        async def cenario(gerenciador):
+            return gerenciador.iniciar()[0]
+
+        for alvo, mensagem in ((_importacao_erro, 'falha simulada'), (_importacao_encerrada, 'código 3')):
+            _, tarefa, _ = self.executar(alvo, cenario)
+            self.assertEqual(tarefa.estado, 'falhou')
+            self.assertEqual(tarefa.eventos[-1]['tipo'], 'erro')
+            self.assertIn(mensagem, tarefa.eventos[-1]['mensagem'])
+
+    def test_trava_do_cache(self):
+        """Testa que a importação espera a trava do cache e a mantém até terminar"""
+        async def cenario(gerenciador):
+            gerenciador.trava_cache.acquire()
+            tarefa, _ = gerenciador.iniciar()
+            await asyncio.sleep(0.3)
+            esperando = (tarefa.estado, tarefa.processo)
+            gerenciador.trava_cache.release()
+            await asyncio.sleep(0.3)
+            return esperando, gerenciador.trava_cache.locked()
+
+        gerenciador, (esperando, travada), _ = self.executar(_importacao_ok, cenario)
+        self.assertEqual(esperando, ('executando', None))
+        self.assertTrue(travada)
+        self.assertFalse(gerenciador.trava_cache.locked())
+        self.assertEqual(gerenciador.tarefa_atual.estado, 'concluida')
+
+class TestCanalMetricas(unittest.TestCase):
+    def test_aviso_de_dados_atualizados(self):
+        """Testa que um dashboard conectado em /ws/metrics é avisado ao fim da importação"""
+        from fastapi.testclient import TestClient
+        import importlib.util
+        with mock.patch.dict(os.environ, {'OBSERVAR_DIRETORIOS': '0'}):
+            spec = importlib.util.spec_from_file_location('servidor', Path(__file__).parent / 'static' / 'app.py')
+            servidor = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(servidor)
+
+        gerenciador = GerenciadorImportacao(
+            servidor.publicar_progresso, alvo=_importacao_ok, contexto=multiprocessing.get_context('fork')
+        )
+        with mock.patch.object(servidor, 'gerenciador_importacao', gerenciador), \
+                mock.patch.object(servidor.analisador_predicao, 'carregar_modelo_predicao'):
+            with TestClient(servidor.app) as cliente, cliente.websocket_connect('/ws/metrics') as dashboard:
+                tarefa_id = cliente.post('/atualizar').json()['tarefa_id']
+                # O canal também recebe pings do gerenciador de WebSockets
+                for _ in range(10):
+                    evento = dashboard.receive_json()
+                    if evento.get('tipo') == 'dados_atualizados':
+                        break
+        self.assertEqual(evento['tipo'], 'dados_atualizados')
+        self.assertEqual(evento['tarefa_id'], tarefa_id)
+        self.assertEqual(gerenciador.obter(tarefa_id).estado, 'concluida')
+
+class TestModoLote(unittest.TestCase):
+    def test_relatorios_sem_saida_no_console(self):
+        """Testa que em lote os relatórios só retornam os resultados"""
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        metricas = analisador.montar_metricas(4, {'APROVADO': 3, 'PENDENTE': 1})
+        dados_grupos = {'julio': {'colaboradores': {}, 'metricas': {'ANA': metricas}}}
+
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            diario = analisador.gerar_relatorio_diario(dados_grupos)
+            geral = analisador.gerar_relatorio_geral(dados_grupos)
+            produtividade = analisador.gerar_relatorio_produtividade_diaria(dados_grupos)
+        self.assertEqual(saida.getvalue(), '')
+        self.assertEqual(diario['julio']['ANA']['status']['APROVADO'], 3)
+        self.assertEqual(geral['total'], 4)
+        self.assertEqual(geral['grupos']['julio']['status']['PENDENTE'], 1)
+        self.assertEqual(produtividade['julio']['ANA']['eficiencia'], 75.0)
+
+class TestExportacaoSqlite(unittest.TestCase):
+    def test_exportar_metricas(self):
+        """Testa a exportação direta das métricas, incluindo QUITADO e status fora das colunas"""
+        metricas = {'julio': {'ANA': {'total_registros': 6, 'status_counts': {'APROVADO': 2, 'QUITADO': 3, 'OUTRO': 1}}}}
+        with tempfile.TemporaryDirectory() as diretorio:
+            db = RelatorioDatabase(Path(diretorio) / 'dashboard.db')
+            self.assertTrue(db.exportar_metricas(metricas))
+            self.assertTrue(db.exportar_metricas(metricas))
+            conn = sqlite3.connect(db.db_path)
+            linhas = conn.execute('SELECT aprovado, quitado, total FROM relatorio_geral').fetchall()
+            eficiencia = conn.execute('SELECT eficiencia FROM metricas_produtividade').fetchone()[0]
+            conn.close()
+        self.assertEqual(linhas, [(2, 3, 6)])
+        self.assertAlmostEqual(eficiencia, 2 / 6 * 100)
+
+class TestDashboardJson(unittest.TestCase):
+    def test_payload_e_artefato(self):
+        """Testa o payload do dashboard e o JSON gravado"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'APROVADO', 'PENDENTE'])),
+            'DATA_RESOLUCAO': ['2024-01-07', '2024-01-07', '2024-01-05']
+        })
+        dados = {'julio': {'colaboradores': {'ANA': df}, 'metricas': {}},
+                 'leandro': {'colaboradores': {'BIA': df.iloc[2:]}, 'metricas': {}}}
+        payload = montar_dados_dashboard(ContextoAnalise(dados, ['APROVADO']))
+        self.assertEqual(payload['resumo_status'], {'APROVADO': 2, 'PENDENTE': 2})
+        self.assertEqual(payload['datas_disponiveis'], ['2024-01-05', '2024-01-07'])
+        self.assertEqual(payload['grupos'], ['julio', 'leandro'])
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = gravar_dashboard_json(payload, Path(diretorio) / 'dashboard.json')
+            with open(caminho, encoding='utf-8') as f:
+                artefato = json.load(f)
+        self.assertEqual(artefato['dados_diarios'][0],
+                         {'data': '2024-01-05', 'colaborador': 'ANA', 'grupo': 'julio', 'status': 'PENDENTE', 'quantidade': 1})
+        self.assertEqual(len(artefato['dados_diarios']), 3)
+        self.assertEqual(artefato['colaboradores'], ['ANA', 'BIA'])
+
+class TestPrevisaoBacklog(unittest.TestCase):
+    def test_serie_e_previsao(self):
+        """Testa a fila de pendentes reconstruída e a previsão gravada por versão dos dados"""
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO', 'PENDENTE', 'APROVADO'])),
+            'DATA': ['2024-01-01', '2024-01-02', '2024-01-03'],
+            'DATA_CONCLUSAO': ['2024-01-03', '2024-01-02', None]
+        })
+        contexto = ContextoAnalise({'julio': {'colaboradores': {'ANA': df}, 'metricas': {}}}, ['APROVADO'])
+        datas, pendentes = serie_pendentes(contexto)
+        self.assertEqual(len(datas), 3)
+        self.assertEqual(pendentes[:, 0].tolist(), [1, 2, 2])
+
+        # 60 dias de aberturas com resolução três dias depois, em dois colaboradores
+        aberturas = pd.date_range('2024-01-01', periods=60).repeat(2)
+        df = pd.DataFrame({
+            'STATUS': normalizar_status(pd.Series(['APROVADO'] * len(aberturas))),
+            'DATA': aberturas,
+            'DATA_CONCLUSAO': aberturas + pd.Timedelta(days=3)
+        })
+        contexto = ContextoAnalise({'julio': {'colaboradores': {'ANA': df, 'BIA': df.iloc[::2]}, 'metricas': {}}},
+                                   ['APROVADO'])
+        parametros = {'n_estimators': 20, 'random_state': 42}
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = Path(diretorio) / 'dashboard.db'
+            self.assertIsNone(PrevisoesBacklog(caminho).ler())
+            resultado = gerar_previsao_backlog(contexto, caminho, parametros, horizonte=5)
+            self.assertFalse(resultado['reaproveitada'])
+            self.assertEqual(resultado['linhas'], 5 * 3)
+            self.assertTrue(gerar_previsao_backlog(contexto, caminho, parametros, horizonte=5)['reaproveitada'])
+            grupo = PrevisoesBacklog(caminho).ler(grupo='julio')
+            ana = PrevisoesBacklog(caminho).ler(colaborador='ANA')
+        self.assertEqual(len(grupo['previsoes']), 5)
+        self.assertEqual(ana['previsoes'][0]['data'], '2024-03-04')
+        self.assertTrue(all(previsao['pendentes'] >= 0 for previsao in ana['previsoes']))
+
+class TestConsultasEmBlocos(unittest.TestCase):
+    def test_resumo_historico(self):
+        """Testa os totais do histórico lidos em blocos de uma linha"""
+        metricas = {'julio': {
+            'ANA': {'total_registros': 4, 'status_counts': {'APROVADO': 1, 'PENDENTE': 3}},
+            'BIA': {'total_registros': 2, 'status_counts': {'APROVADO': 2}}
+        }}
+        with tempfile.TemporaryDirectory() as diretorio:
+            db = RelatorioDatabase(Path(diretorio) / 'dashboard.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                db.exportar_metricas(metricas, '2024-01-01')
+                db.exportar_metricas(metricas, '2024-01-02')
+            conn = sqlite3.connect(db.db_path)
+            resumo = resumo_historico(conn, RelatorioDatabase.COLUNAS_STATUS.values(), tamanho_bloco=1,
+                                      medir_memoria=True)
+            periodo = resumo_historico(conn, ['aprovado'], inicio='2024-01-02')
+            # Medida de uma leitura em blocos feita fora do resumo (exportação)
+            consultas = {}
+            with medir_consulta(consultas, 'exportar') as medida:
+                exportado = pd.concat(contar_blocos(pd.read_sql_query('SELECT * FROM relatorio_geral', conn, chunksize=3), medida))
+            conn.close()
+
+        ana = resumo['colaboradores'].set_index('colaborador').loc['ANA']
+        self.assertEqual((ana['aprovado'], ana['pendente'], ana['total'], ana['dias']), (2, 6, 8, 2))
+        self.assertAlmostEqual(ana['eficiencia'], 25.0)
+        self.assertEqual(resumo['status']['aprovado'], 6)
+        self.assertEqual(resumo['grupos'].to_dict('records'), [{'nome': 'julio', 'total_colaboradores': 2, 'total': 12}])
+        self.assertEqual(resumo['consultas']['relatorio_geral']['blocos'], 4)
+        self.assertIsNotNone(resumo['consultas']['relatorio_geral']['pico_mb'])
+        self.assertEqual(periodo['status'], {'aprovado': 3})
+        self.assertEqual((len(exportado), medida['linhas'], medida['blocos']), (4, 4, 2))
+        self.assertIsNotNone(medida['pico_mb'])
+        self.assertIn('4 linhas em 2 blocos | pico', descrever_medida('exportar', medida))
+
+class TestPreviaAmostral(unittest.TestCase):
+    def test_estimativas_da_amostra(self):
+        """Testa o tamanho da amostra por aba, os intervalos e a marcação de aproximado"""
+        gerador = np.random.default_rng(0)
+        dias = pd.date_range('2024-01-01', periods=20).date
+        def aba(n):
+            return pd.DataFrame({
+                'STATUS': normalizar_status(pd.Series(gerador.choice(['APROVADO', 'PENDENTE', 'QUITADO'], n))),
+                'DIA': gerador.choice(dias, n)
+            })
+        dados = {'julio': {'colaboradores': {'ANA': aba(400), 'BIA': aba(20), 'CAIO': aba(0)}, 'metricas': {}}}
+        amostra, tamanhos = amostrar_abas(dados, fracao=0.1, minimo=30, semente=1)
+        colaboradores = amostra['julio']['colaboradores']
+        self.assertEqual({nome: len(df) for nome, df in colaboradores.items()}, {'ANA': 40, 'BIA': 20})
+        self.assertEqual(tamanhos.tolist(), [400, 20])
+
+        previa = estimar_previa(amostra, tamanhos, horas_trabalho=8)
+        self.assertTrue(previa['aproximado'])
+        self.assertEqual(previa['amostra']['registros_total'], 420)
+        reais = pd.concat(dados['julio']['colaboradores'].values())['STATUS'].value_counts()
+        for status in ['APROVADO', 'PENDENTE', 'QUITADO']:
+            estimativa = previa['status'][status]
+            self.assertLessEqual(estimativa['minimo'], reais[status])
+            self.assertGreaterEqual(estimativa['maximo'], reais[status])
+        # A aba amostrada por inteiro não tem incerteza
+        bia = next(linha for linha in previa['ranking'] if linha['colaborador'] == 'BIA')
+        self.assertEqual(bia['score_minimo'], bia['score_maximo'])
+
+    def test_dados_do_cache(self):
+        """Testa que a prévia lê só o cache, sem gravar, e recusa arquivos alterados"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            gravar_planilhas_sinteticas(diretorio)
+            analisador = analisador_sintetico(diretorio)
+            analisador.agregados_incrementais = False
+            self.assertIsNone(analisador.carregar_dados_do_cache())
+            self.assertFalse((Path(diretorio) / '.cache_analise').exists())
+
+            completos = analisador.carregar_dados()
+            manifesto = Path(diretorio) / '.cache_analise' / 'manifesto.json'
+            gravado_em = manifesto.stat().st_mtime_ns
+            do_cache = analisador.carregar_dados_do_cache()
+            self.assertEqual(manifesto.stat().st_mtime_ns, gravado_em)
+            self.assertEqual(list(do_cache), ['julio', 'leandro'])
+            for grupo, dados in completos.items():
+                self.assertEqual(list(do_cache[grupo]['colaboradores']), list(dados['colaboradores']))
+                for colaborador, df in dados['colaboradores'].items():
+                    pd.testing.assert_frame_equal(do_cache[grupo]['colaboradores'][colaborador], df)
+            previa = analisador.gerar_previa(do_cache)
+            self.assertEqual(previa['amostra']['registros_total'],
+                             sum(len(df) for dados in completos.values() for df in dados['colaboradores'].values()))
+
+            gravar_planilhas_sinteticas(diretorio, linhas_extras=1)
+            self.assertIsNone(analisador.carregar_dados_do_cache())
+
+class TestCompactacaoTipos(unittest.TestCase):
+    def test_tipos_compactos_sem_perda(self):
+        """Testa a escolha dos tipos e a preservação dos valores"""
+        from datetime import date
+        df = pd.DataFrame({
+            'TIPO': ['A', 'B', 'A', 'A'],
+            'CONTRATO': ['C1', 'C2', 'C3', 'C4'],
+            'DIA': [date(2024, 1, 5)] * 4,
+            'QTD': np.array([1, 2, 3, 4], dtype=np.int64),
+            'MEIO': [0.5, 1.5, np.nan, 2.0],
+            'TEMPO': [0.1, 0.2, 0.3, 0.4],
+            'MISTO': ['x', date(2024, 1, 5), 'x', None]
+        })
+        compacto = compactar_dataframe(df)
+        tipos = {coluna: str(tipo) for coluna, tipo in compacto.dtypes.items()}
+        self.assertEqual(tipos, {
+            'TIPO': 'category', 'CONTRATO': 'object', 'DIA': 'datetime64[ns]', 'QTD': 'int32',
+            'MEIO': 'float32', 'TEMPO': 'float64', 'MISTO': 'object'
+        })
+        self.assertIs(compacto['MISTO'][0], compacto['MISTO'][2])
+        self.assertEqual(compacto['MEIO'].astype(float).tolist()[:2], [0.5, 1.5])
+        self.assertEqual(compacto['DIA'].dt.date.tolist(), df['DIA'].tolist())
+        grande = pd.concat([df] * 50, ignore_index=True)
+        self.assertLess(memoria_bytes(compactar_dataframe(grande)), memoria_bytes(grande))
+
+    def test_cabecalhos_repetidos(self):
+        """Testa que abas com cabeçalhos iguais após a normalização continuam sendo processadas"""
+        df = pd.DataFrame([['Aprovado', 'a', 'b'], ['Pendente', 'c', 'd']], columns=['Situação', 'Obs', 'OBS'])
+        analisador = AnalisadorInteligente()
+        analisador.interativo = False
+        compacto, metricas = analisador.processar_aba('ANA', df)
+        self.assertEqual(compacto.columns.tolist(), ['STATUS', 'OBS', 'OBS', 'DIA'])
+        self.assertEqual(compacto.iloc[:, 2].tolist(), ['b', 'd'])
+        self.assertEqual(metricas['total_registros'], 2)
+        self.assertIn('memoria', metricas)
+
 if __name__ == '__main__':
     # Configurar o formato de saída dos testes
     unittest.main(verbosity=2) 
\ No newline at end of file
@@ -5,7 +5,14 @@ from sqlalchemy.orm import sessionmaker
 from datetime import datetime, timedelta
 
 from app import app, get_db
-from models import Base, Contract, DailyMetric, Alert
+from models import Base, Contract, DailyMetric, Alert, init_db
+from anomaly_detection import detect_anomalies
+from import_excel import import_files
+import pandas as pd
+import os
+import subprocess
+import sys
+from sqlalchemy import text
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -184,5 +191,171 @@ def test_alert_lifecycle(db_session):
     data = response.json()
     assert len(data["alerts"]) == 0
 
+def test_anomaly_detection(db_session):
+    # Produtividade estável por 30 dias e uma queda brusca no último
+    contract = Contract(
+        contract_number="TEST004",
+        collaborator="Test User",
+        status="pending",
+        created_at=datetime.utcnow()
+    )
+    db_session.add(contract)
+    db_session.commit()
+
+    start = datetime(2024, 1, 1)
+    for day in range(30):
+        db_session.add(DailyMetric(
+            contract_id=contract.id,
+            date=start + timedelta(days=day),
+            productivity=0.2 if day == 29 else 0.8 + 0.01 * (day % 3),
+            efficiency=0.7 + 0.01 * (day % 2),
+            resolution_rate=0.6 + 0.01 * (day % 4)
+        ))
+    db_session.commit()
+
+    result = detect_anomalies(db_session)
+    assert result["alertas_inseridos"] == 1
+    alert = db_session.query(Alert).one()
+    assert alert.contract_id == contract.id
+    assert alert.type == "critical"
+    assert alert.message.startswith("Produtividade abaixo do esperado para Test User em 30/01/2024")
+
+    # O alerta aberto não é repetido
+    assert detect_anomalies(db_session)["alertas_inseridos"] == 0
+    assert db_session.query(Alert).count() == 1
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+def test_import_excel_bulk_insert(db_session, tmp_path):
+    # Cinco linhas em blocos de duas; a aba sem as colunas esperadas é ignorada
+    write_workbook(tmp_path / "dados.xlsx", {
+        "ANA": pd.DataFrame({
+            "SITUAÇÃO": ["APROVADO", "pendente", "ANALISE", "XYZ", "QUITADO"],
+            "RESOLUÇÃO": [1, 2, None, 4, 5]
+        }),
+        "RESUMO": pd.DataFrame({"TOTAL": [5]})
+    })
+
+    counts = import_files(db_session, [("dados.xlsx", "JULIO"), ("ausente.xlsx", "LEANDRO")],
+                          data_dir=tmp_path, mode="reload", chunk_size=2)
+    assert counts == {"inserted": 5, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    contracts = db_session.query(Contract).order_by(Contract.contract_number).all()
+    assert [c.contract_number for c in contracts] == [f"JULIO-ANA-{i}" for i in range(5)]
+    assert [c.status for c in contracts] == ["approved", "pending", "analysis", "other", "paid"]
+    assert [c.status_code for c in contracts] == [6, 3, 2, 0, 9]
+    assert [c.resolution_time for c in contracts] == [1.0, 2.0, None, 4.0, 5.0]
+    assert {c.collaborator for c in contracts} == {"ANA"}
+    # Uma métrica diária por contrato inserido
+    assert sorted(m.contract_id for m in db_session.query(DailyMetric)) == sorted(c.id for c in contracts)
+
+    # O modo 'reload' apaga o que existia antes de reimportar
+    assert import_files(db_session, [("dados.xlsx", "JULIO")], data_dir=tmp_path, mode="reload")["inserted"] == 5
+    assert db_session.query(Contract).count() == 5
+    assert db_session.query(DailyMetric).count() == 5
+
+def test_import_excel_upsert(db_session, tmp_path):
+    sheet = pd.DataFrame({"SITUAÇÃO": ["APROVADO", "PENDENTE", "QUITADO", "ANÁLISE"], "RESOLUÇÃO": [1, 2, 3, 4]})
+    write_workbook(tmp_path / "dados.xlsx", {"ANA": sheet, "ANA_B": sheet})
+    files = [("dados.xlsx", "JULIO")]
+
+    assert import_files(db_session, files, data_dir=tmp_path, mode="upsert")["inserted"] == 8
+    # Reimportar a mesma planilha não altera nada
+    assert import_files(db_session, files, data_dir=tmp_path, mode="upsert") == \
+        {"inserted": 0, "updated": 0, "unchanged": 8, "deleted": 0}
+    assert db_session.query(DailyMetric).count() == 8
+
+    # Uma linha alterada e a última removida de ANA
+    write_workbook(tmp_path / "dados.xlsx", {
+        "ANA": pd.DataFrame({"SITUAÇÃO": ["APROVADO", "CANCELADO", "QUITADO"], "RESOLUÇÃO": [1, 2, 3]}),
+        "ANA_B": sheet
+    })
+    assert import_files(db_session, files, data_dir=tmp_path, mode="upsert") == \
+        {"inserted": 0, "updated": 1, "unchanged": 6, "deleted": 0}
+    db_session.expire_all()
+    changed = db_session.query(Contract).filter_by(contract_number="JULIO-ANA-1").one()
+    assert (changed.status, changed.status_code) == ("cancelled", 8)
+    # Por padrão o contrato ausente da planilha é mantido
+    assert db_session.query(Contract).count() == 8
+
+    missing = db_session.query(Contract).filter_by(contract_number="JULIO-ANA-3").one()
+    db_session.add(Alert(contract_id=missing.id, type="warning", message="Teste"))
+    db_session.commit()
+    assert import_files(db_session, files, data_dir=tmp_path, mode="upsert", missing="delete") == \
+        {"inserted": 0, "updated": 0, "unchanged": 7, "deleted": 1}
+    numbers = {c.contract_number for c in db_session.query(Contract)}
+    assert "JULIO-ANA-3" not in numbers
+    # Só a aba importada é verificada; os contratos de ANA_B continuam gravados
+    assert {f"JULIO-ANA_B-{i}" for i in range(4)} <= numbers
+    assert db_session.query(DailyMetric).count() == 7
+    assert db_session.query(Alert).count() == 0
+
+def test_status_code_migration_backfill(tmp_path):
+    # Banco anterior à coluna status_code, importado com a mesma planilha
+    url = f"sqlite:///{tmp_path / 'antigo.db'}"
+    sheet = pd.DataFrame({"SITUAÇÃO": ["APROVADO", "PENDENTE", "XYZ"], "RESOLUÇÃO": [1, 2, 3]})
+    write_workbook(tmp_path / "dados.xlsx", {"ANA": sheet})
+    old_engine = create_engine(url)
+    with old_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE contracts (id INTEGER PRIMARY KEY, contract_number VARCHAR UNIQUE, collaborator VARCHAR, "
+            "status VARCHAR, resolution_time FLOAT, created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO contracts (contract_number, collaborator, status, resolution_time) VALUES "
+            "('JULIO-ANA-0', 'ANA', 'approved', 1), ('JULIO-ANA-1', 'ANA', 'pending', 2), "
+            "('JULIO-ANA-2', 'ANA', 'other', 3)"
+        ))
+    old_engine.dispose()
+
+    migrated = init_db(url)
+    with migrated.connect() as conn:
+        codes = conn.execute(text("SELECT status_code FROM contracts ORDER BY contract_number")).scalars().all()
+    assert codes == [6, 3, 0]
+
+    session = sessionmaker(bind=migrated)()
+    try:
+        counts = import_files(session, [("dados.xlsx", "JULIO")], data_dir=tmp_path, mode="upsert")
+    finally:
+        session.close()
+        migrated.dispose()
+    assert counts == {"inserted": 0, "updated": 0, "unchanged": 3, "deleted": 0}
+
+def test_health_check_invalid_status_codes(db_session, monkeypatch):
+    from health_check import HealthCheck
+
+    for number, status, code in [("JULIO-A-0", "approved", 6), ("JULIO-A-1", "other", 0),
+                                 ("LEANDRO-A-0", "pending", None), ("LEANDRO-A-1", "pending", 99)]:
+        db_session.add(Contract(contract_number=number, collaborator="A", status=status, status_code=code))
+    db_session.commit()
+
+    monkeypatch.setenv("DB_PATH", "test.db")
+    checker = HealthCheck()
+    try:
+        assert checker.check_data_integrity()
+    finally:
+        checker.session.close()
+    assert "Found 2 contracts with invalid status" in checker.warnings
+
+def test_status_vocabulary_import_outside_repo_root(tmp_path):
+    # Os módulos da raiz encontram static/status_contratos.py sem depender do diretório atual
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        "import sys, models, import_excel, health_check\n"
+        "import status_contratos\n"
+        "assert 'static.status_contratos' not in sys.modules\n"
+        "assert import_excel.codigos_status is status_contratos.codigos_status\n"
+        "print(status_contratos.__file__)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": root, "DB_PATH": str(tmp_path / "vazio.db")}
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith(os.path.join("static", "status_contratos.py"))
+
 if __name__ == "__main__":
     pytest.main(["-v"]) 
\ No newline at end of file